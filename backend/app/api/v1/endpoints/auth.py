@@ -8,7 +8,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.database import get_db
 from app.core.security import (
-    verify_password, 
+    verify_password_async, 
     create_access_token, 
     get_current_active_user
 )
@@ -56,7 +56,7 @@ async def login(
     """Login user"""
     # Get user by email
     user = await get_user_by_email(db, email=form_data.username)
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -89,7 +89,7 @@ async def login_json(user_login: UserLogin, db: AsyncSession = Depends(get_db)):
     """Login user with JSON payload"""
     # Get user by email
     user = await get_user_by_email(db, email=user_login.email)
-    if not user or not verify_password(user_login.password, user.hashed_password):
+    if not user or not await verify_password_async(user_login.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password"
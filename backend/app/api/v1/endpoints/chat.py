@@ -0,0 +1,65 @@
+"""
+AI chat endpoints
+"""
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, AsyncIterator, Dict, Tuple
+import json
+
+from app.core.database import get_db
+from app.core.security import get_current_active_user
+from app.crud import chat as crud_chat
+from app.models.user import User
+from app.schemas.chat import ChatRequest
+from app.services.ai_service import ai_service
+from app.services.chat_memory import chat_memory
+
+router = APIRouter()
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Encode one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def _sse_stream(events: AsyncIterator[Tuple[str, Dict[str, Any]]]) -> AsyncIterator[str]:
+    async for event, data in events:
+        yield format_sse(event, data)
+
+
+@router.post("/stream")
+async def stream_chat(
+    request: ChatRequest,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Chat with the AI advisor, streaming the reply as server-sent events
+    (token, related_data, done, error).
+    
+    With session_id the session's summary and recent history are sent as
+    context and the exchange is saved to it.
+    """
+    if request.session_id is None:
+        events = ai_service.stream_chat_with_advisor(request.message, request.context)
+    else:
+        session = await crud_chat.get_session(db, request.session_id)
+        if session is None or session.user_id != current_user.id:
+            raise HTTPException(status_code=404, detail="Chat session not found")
+        
+        summary, history = await chat_memory.load(db, session)
+        events = chat_memory.record_stream(
+            session.id,
+            request.message,
+            ai_service.stream_chat_with_advisor(request.message, request.context, history, summary)
+        )
+    
+    return StreamingResponse(
+        _sse_stream(events),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # Don't let nginx buffer the stream
+        }
+    )
\ No newline at end of file
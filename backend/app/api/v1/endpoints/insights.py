@@ -0,0 +1,28 @@
+"""
+AI insight and recommendation endpoints
+"""
+from fastapi import APIRouter, Depends
+from datetime import datetime
+
+from app.core.security import get_current_active_user
+from app.models.user import User
+from app.schemas.chat import BatchRecommendationRequest, BatchRecommendationResponse
+from app.services.ai_service import ai_service
+
+router = APIRouter()
+
+
+@router.post("/recommendations/batch", response_model=BatchRecommendationResponse)
+async def get_batch_recommendations(
+    request: BatchRecommendationRequest,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get recommendations for a watchlist or every holding in one request"""
+    recommendations = await ai_service.get_batch_recommendations(
+        request.symbols,
+        {
+            "risk_tolerance": current_user.risk_tolerance,
+            "investment_experience": current_user.investment_experience
+        }
+    )
+    return BatchRecommendationResponse(recommendations=recommendations, generated_at=datetime.now())
\ No newline at end of file
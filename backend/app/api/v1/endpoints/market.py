@@ -1,7 +1,7 @@
 """
 Market data endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
 from typing import List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -10,6 +10,7 @@ from app.core.security import get_current_active_user
 from app.models.user import User
 from app.schemas.market import MarketDataResponse, MarketOverview, StockQuote
 from app.services.market_data import market_data_service
+from app.services.history_encoding import FORMAT_MEDIA_TYPES, encode_history, negotiate_media_type
 from app.core.exceptions import ExternalAPIError
 
 router = APIRouter()
@@ -113,12 +114,24 @@ async def get_multiple_quotes(
 @router.get("/historical/{symbol}")
 async def get_historical_data(
     symbol: str,
+    response: Response,
     period: str = Query("1y", description="Time period (1d, 5d, 1mo, 3mo, 6mo, 1y, 2y, 5y, 10y, ytd, max)"),
+    format: Optional[str] = Query(None, pattern="^(records|columns|arrow|parquet|f32)$", description="Response layout: records, columns, or binary arrow/parquet/f32 (defaults to records unless Accept asks for a binary type)"),
+    accept: Optional[str] = Header(None),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get historical price data for a symbol"""
+    # The body depends on Accept, so shared caches must key on it
+    headers = {"Vary": "Accept"}
     try:
-        data = await market_data_service.get_historical_data(symbol.upper(), period)
+        media_type = FORMAT_MEDIA_TYPES.get(format) if format else negotiate_media_type(accept)
+        
+        if media_type:
+            hist = await market_data_service.get_historical_frame(symbol.upper(), period)
+            return Response(content=encode_history(hist, media_type), media_type=media_type, headers=headers)
+        
+        data = await market_data_service.get_historical_data(symbol.upper(), period, format or "records")
+        response.headers.update(headers)
         return data
     except ExternalAPIError as e:
         raise HTTPException(status_code=502, detail=str(e))
@@ -127,11 +140,12 @@ async def get_historical_data(
 @router.get("/search")
 async def search_symbols(
     query: str = Query(..., description="Search query"),
+    limit: int = Query(10, ge=1, le=50, description="Maximum number of results"),
     current_user: User = Depends(get_current_active_user)
 ):
     """Search for stock symbols"""
     try:
-        results = await market_data_service.search_symbols(query)
+        results = await market_data_service.search_symbols(query, limit)
         return {"results": results}
     except Exception as e:
         raise HTTPException(status_code=500, detail="Search failed")
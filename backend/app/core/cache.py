@@ -0,0 +1,398 @@
+"""
+Caching utilities: in-process LRU with TTL, an optional Redis tier and
+request coalescing
+"""
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import json
+import logging
+import time
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """Bounded in-process cache storing values with their write timestamp"""
+    
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self.evictions = 0
+        self._data: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+    
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """Get (value, stored_at) for key and mark it recently used"""
+        entry = self._data.get(key)
+        if entry is not None:
+            self._data.move_to_end(key)
+        return entry
+    
+    def set(self, key: str, value: Any, stored_at: Optional[float] = None):
+        """Store value, evicting the least recently used entry when full"""
+        self._data[key] = (value, stored_at if stored_at is not None else time.time())
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+    
+    def delete(self, key: str):
+        """Remove key if present"""
+        self._data.pop(key, None)
+    
+    def clear(self):
+        """Remove all entries"""
+        self._data.clear()
+    
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class InMemoryRedis:
+    """Minimal async stand-in for the redis client (tests and local development)"""
+    
+    def __init__(self):
+        self._data: Dict[str, Tuple[Any, Optional[float]]] = {}
+    
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.time():
+            del self._data[key]
+            return None
+        return value
+    
+    async def mget(self, keys: List[str]) -> List[Optional[Any]]:
+        return [await self.get(key) for key in keys]
+    
+    async def set(self, key: str, value: Any, ex: Optional[int] = None):
+        self._data[key] = (value, time.time() + ex if ex else None)
+    
+    async def delete(self, key: str):
+        self._data.pop(key, None)
+    
+    async def close(self):
+        self._data.clear()
+
+
+def create_redis_client() -> Optional[Any]:
+    """Create the shared-cache client selected by settings.CACHE_BACKEND"""
+    backend = settings.CACHE_BACKEND
+    
+    if backend == "redis":
+        try:
+            import redis.asyncio as aioredis
+        except ImportError:
+            logger.warning("redis package not installed, falling back to in-process cache only")
+            return None
+        return aioredis.from_url(settings.REDIS_URL)
+    
+    if backend == "memory":
+        return InMemoryRedis()
+    
+    return None
+
+
+class TieredCache:
+    """
+    Two-tier TTL cache (local LRU + optional Redis) with stale-while-revalidate.
+    
+    Entries younger than ttl_seconds are served as hits. Entries older than
+    that but within stale_seconds more are served immediately while a single
+    background refresh per key replaces them.
+    """
+    
+    def __init__(
+        self,
+        namespace: str,
+        ttl_seconds: float,
+        stale_seconds: float = 0,
+        max_size: int = 1024,
+        redis_client: Optional[Any] = None,
+        encode: Callable[[Any], str] = json.dumps,
+        decode: Callable[[str], Any] = json.loads
+    ):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.local = LRUCache(max_size)
+        self.redis = redis_client
+        self.encode = encode
+        self.decode = decode
+        
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self._refreshing: Dict[str, asyncio.Task] = {}
+    
+    def _redis_key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+    
+    def _decode_remote(self, raw: Any) -> Tuple[Any, float]:
+        if isinstance(raw, bytes):
+            raw = raw.decode()
+        payload = json.loads(raw)
+        return self.decode(payload["value"]), payload["stored_at"]
+    
+    async def _get_remote(self, key: str) -> Optional[Tuple[Any, float]]:
+        if self.redis is None:
+            return None
+        try:
+            raw = await self.redis.get(self._redis_key(key))
+            if raw is None:
+                return None
+            return self._decode_remote(raw)
+        except Exception as e:
+            logger.warning(f"Cache read failed for {key}: {str(e)}")
+            return None
+    
+    async def _get_remote_many(self, keys: List[str]) -> Dict[str, Tuple[Any, float]]:
+        """Read several keys from the shared tier in one MGET"""
+        if self.redis is None or not keys:
+            return {}
+        try:
+            raws = await self.redis.mget([self._redis_key(key) for key in keys])
+        except Exception as e:
+            logger.warning(f"Cache read failed for {len(keys)} keys: {str(e)}")
+            return {}
+        
+        entries = {}
+        for key, raw in zip(keys, raws):
+            if raw is None:
+                continue
+            try:
+                entries[key] = self._decode_remote(raw)
+            except Exception as e:
+                logger.warning(f"Cache read failed for {key}: {str(e)}")
+        return entries
+    
+    async def _set_remote(self, key: str, value: Any, stored_at: float):
+        if self.redis is None:
+            return
+        try:
+            payload = json.dumps({"value": self.encode(value), "stored_at": stored_at})
+            expiry = int(self.ttl_seconds + self.stale_seconds) or None
+            await self.redis.set(self._redis_key(key), payload, ex=expiry)
+        except Exception as e:
+            logger.warning(f"Cache write failed for {key}: {str(e)}")
+    
+    async def get_entry(self, key: str) -> Optional[Tuple[Any, float]]:
+        """Look up (value, stored_at) in the local tier, then the shared tier"""
+        entry = self.local.get(key)
+        if entry is None:
+            entry = await self._get_remote(key)
+            if entry is not None:
+                self.local.set(key, entry[0], entry[1])
+        return entry
+    
+    async def get_entries(self, keys: List[str]) -> Dict[str, Tuple[Any, float]]:
+        """get_entry for several keys, with one shared-tier round trip for the local misses"""
+        entries = {}
+        remote_keys = []
+        for key in keys:
+            entry = self.local.get(key)
+            if entry is None:
+                remote_keys.append(key)
+            else:
+                entries[key] = entry
+        
+        for key, entry in (await self._get_remote_many(remote_keys)).items():
+            self.local.set(key, entry[0], entry[1])
+            entries[key] = entry
+        return entries
+    
+    async def set(self, key: str, value: Any):
+        """Write value to both tiers"""
+        stored_at = time.time()
+        self.local.set(key, value, stored_at)
+        await self._set_remote(key, value, stored_at)
+    
+    async def invalidate(self, key: str):
+        """Drop key from both tiers"""
+        self.local.delete(key)
+        if self.redis is not None:
+            try:
+                await self.redis.delete(self._redis_key(key))
+            except Exception as e:
+                logger.warning(f"Cache delete failed for {key}: {str(e)}")
+    
+    async def get(
+        self,
+        key: str,
+        refresh: Optional[Callable[[], Awaitable[Any]]] = None
+    ) -> Optional[Any]:
+        """
+        Return the cached value for key, or None on a miss.
+        
+        Stale entries are returned as-is and, if refresh is given,
+        revalidated in the background with it.
+        """
+        entry = await self.get_entry(key)
+        
+        if entry is not None:
+            value, stored_at = entry
+            age = time.time() - stored_at
+            
+            if age <= self.ttl_seconds:
+                self.hits += 1
+                return value
+            
+            if age <= self.ttl_seconds + self.stale_seconds:
+                self.stale_hits += 1
+                if refresh is not None:
+                    self.schedule_refresh(key, refresh)
+                return value
+        
+        self.misses += 1
+        return None
+    
+    async def get_many(
+        self,
+        keys: List[str],
+        refresh_many: Optional[Callable[[List[str]], Awaitable[Dict[str, Any]]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Batch get: {key: value} for the keys cached (missing keys are left out).
+        
+        Stale entries are returned as-is and, if refresh_many is given,
+        revalidated together in one background call to it.
+        """
+        now = time.time()
+        found = {}
+        stale = []
+        for key, (value, stored_at) in (await self.get_entries(keys)).items():
+            age = now - stored_at
+            if age <= self.ttl_seconds:
+                self.hits += 1
+            elif age <= self.ttl_seconds + self.stale_seconds:
+                self.stale_hits += 1
+                stale.append(key)
+            else:
+                continue
+            found[key] = value
+        self.misses += len(keys) - len(found)
+        
+        if stale and refresh_many is not None:
+            self.schedule_refresh_many(stale, refresh_many)
+        return found
+    
+    async def get_or_fetch(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """Return cached value for key, fetching (or revalidating) as needed"""
+        value = await self.get(key, fetch)
+        if value is not None:
+            return value
+        
+        value = await fetch()
+        await self.set(key, value)
+        return value
+    
+    async def close(self):
+        """Cancel pending refreshes and close the shared tier connection"""
+        for task in set(self._refreshing.values()):
+            task.cancel()
+        if self.redis is not None:
+            await self.redis.close()
+    
+    def schedule_refresh(self, key: str, fetch: Callable[[], Awaitable[Any]]):
+        """Revalidate key in the background unless a refresh is already running"""
+        if key in self._refreshing:
+            return
+        self._refreshing[key] = asyncio.create_task(self._refresh(key, fetch))
+    
+    def schedule_refresh_many(self, keys: List[str], fetch: Callable[[List[str]], Awaitable[Dict[str, Any]]]):
+        """Revalidate keys with one background fetch, skipping those already being refreshed"""
+        keys = [key for key in keys if key not in self._refreshing]
+        if not keys:
+            return
+        task = asyncio.create_task(self._refresh_many(keys, fetch))
+        for key in keys:
+            self._refreshing[key] = task
+    
+    async def _refresh(self, key: str, fetch: Callable[[], Awaitable[Any]]):
+        try:
+            value = await fetch()
+            await self.set(key, value)
+            self.refreshes += 1
+        except Exception as e:
+            self.refresh_errors += 1
+            logger.warning(f"Background refresh failed for {key}: {str(e)}")
+        finally:
+            self._refreshing.pop(key, None)
+    
+    async def _refresh_many(self, keys: List[str], fetch: Callable[[List[str]], Awaitable[Dict[str, Any]]]):
+        try:
+            values = await fetch(keys)
+            for key, value in values.items():
+                await self.set(key, value)
+            self.refreshes += len(values)
+            self.refresh_errors += len(set(keys) - set(values))
+        except Exception as e:
+            self.refresh_errors += len(keys)
+            logger.warning(f"Background refresh failed for {len(keys)} keys: {str(e)}")
+        finally:
+            for key in keys:
+                self._refreshing.pop(key, None)
+    
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """Cache counters"""
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "size": len(self.local),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.local.evictions,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "hit_rate": (self.hits + self.stale_hits) / lookups if lookups else 0.0
+        }
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key into one in-flight task.
+    
+    The first caller for a key starts the work; callers arriving before it
+    finishes await the same task instead of starting their own.
+    """
+    
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+        self._inflight: Dict[str, asyncio.Task] = {}
+    
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn for key, or join the call already in flight"""
+        task = self._inflight.get(key)
+        
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        else:
+            self.coalesced += 1
+        
+        # Shield so one caller being cancelled doesn't cancel the shared work
+        return await asyncio.shield(task)
+    
+    def _done(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved if every caller went away
+    
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """Coalescing counters"""
+        return {
+            "in_flight": len(self._inflight),
+            "calls": self.calls,
+            "coalesced": self.coalesced
+        }
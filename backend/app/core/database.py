@@ -1,9 +1,15 @@
 """
 Database configuration and session management
 """
+import threading
+import time
+from typing import Any, Dict
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.pool import NullPool
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.core.config import settings
 
 # Convert PostgreSQL URL to async version
@@ -11,13 +17,105 @@ database_url = settings.DATABASE_URL
 if database_url.startswith("postgresql://"):
     database_url = database_url.replace("postgresql://", "postgresql+asyncpg://", 1)
 
+
+class PoolMetrics:
+    """Counters for connection pool checkouts and wait times"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkins = 0
+        self.connections_created = 0
+        self.timeouts = 0
+        self.connect_errors = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+    
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+    
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+    
+    def record_connect_error(self):
+        with self._lock:
+            self.connect_errors += 1
+    
+    def record_connection_created(self):
+        with self._lock:
+            self.connections_created += 1
+    
+    def record_checkin(self):
+        with self._lock:
+            self.checkins += 1
+
+
+pool_metrics = PoolMetrics()
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited for a connection"""
+    
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except PoolTimeoutError:
+            pool_metrics.record_timeout()
+            raise
+        except Exception:
+            # Auth, DNS, refused connections: the database failed, not the pool
+            pool_metrics.record_connect_error()
+            raise
+        pool_metrics.record_wait(time.perf_counter() - start)
+        return connection
+
+
 # Create async engine
 engine = create_async_engine(
     database_url,
-    poolclass=NullPool,
+    poolclass=InstrumentedPool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
     echo=settings.DEBUG,
 )
 
+
+@event.listens_for(engine.sync_engine.pool, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    pool_metrics.record_connection_created()
+
+
+@event.listens_for(engine.sync_engine.pool, "checkin")
+def _on_checkin(dbapi_connection, connection_record):
+    pool_metrics.record_checkin()
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Current pool occupancy plus checkout/wait counters"""
+    pool = engine.sync_engine.pool
+    checkouts = pool_metrics.checkouts
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "checkouts": checkouts,
+        "checkins": pool_metrics.checkins,
+        "connections_created": pool_metrics.connections_created,
+        "timeouts": pool_metrics.timeouts,
+        "connect_errors": pool_metrics.connect_errors,
+        "avg_wait_ms": (pool_metrics.total_wait / checkouts * 1000) if checkouts else 0.0,
+        "max_wait_ms": pool_metrics.max_wait * 1000
+    }
+
+
 # Create async session factory
 AsyncSessionLocal = async_sessionmaker(
     engine,
@@ -0,0 +1,91 @@
+"""
+Shared outbound HTTP client
+"""
+from types import SimpleNamespace
+from typing import Any, Dict, Optional
+
+import aiohttp
+
+from app.core.config import settings
+
+
+class HTTPClient:
+    """
+    Application-lifetime aiohttp session with pooled keep-alive connections.
+    
+    Started and closed from main.lifespan; services use .session for all
+    outbound requests so DNS, TCP and TLS setup is paid once per connection
+    rather than once per call.
+    """
+    
+    def __init__(self):
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.requests = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+    
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        trace_config = aiohttp.TraceConfig()
+        
+        async def on_request_start(session, context: SimpleNamespace, params):
+            self.requests += 1
+        
+        async def on_connection_create_end(session, context: SimpleNamespace, params):
+            self.connections_created += 1
+        
+        async def on_connection_reuseconn(session, context: SimpleNamespace, params):
+            self.connections_reused += 1
+        
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        return trace_config
+    
+    def _create_session(self) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=settings.HTTP_POOL_LIMIT,
+            limit_per_host=settings.HTTP_POOL_LIMIT_PER_HOST,
+            keepalive_timeout=settings.HTTP_KEEPALIVE_SECONDS,
+            ttl_dns_cache=300
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(
+                total=settings.HTTP_TIMEOUT_SECONDS,
+                connect=settings.HTTP_CONNECT_TIMEOUT_SECONDS
+            ),
+            trace_configs=[self._trace_config()]
+        )
+    
+    async def start(self):
+        """Create the pooled session"""
+        if self._session is None or self._session.closed:
+            self._session = self._create_session()
+    
+    async def close(self):
+        """Close the session and its pooled connections"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+    
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """The shared session (created on first use if the lifespan didn't start it)"""
+        if self._session is None or self._session.closed:
+            self._session = self._create_session()
+        return self._session
+    
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """Request and connection reuse counters"""
+        acquired = self.connections_created + self.connections_reused
+        return {
+            "requests": self.requests,
+            "connections_created": self.connections_created,
+            "connections_reused": self.connections_reused,
+            "reuse_rate": self.connections_reused / acquired if acquired else 0.0
+        }
+
+
+# Global instance
+http_client = HTTPClient()
@@ -0,0 +1,196 @@
+"""
+Idempotent schema upgrades for databases created by an older release
+"""
+from typing import Callable, List, Tuple
+import logging
+
+from sqlalchemy import Column, Index, bindparam, delete, insert, inspect, select, text, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.models.chat import ChatMessage, ChatSession
+from app.models.market import MarketData, NewsArticle, NewsArticleSymbol
+from app.models.portfolio import Holding, Portfolio
+from app.services.news_service import url_hash
+
+logger = logging.getLogger(__name__)
+
+# pg_advisory_xact_lock key, so only one worker upgrades the schema at a time
+MIGRATION_LOCK_KEY = 0x636f676e  # "cogn"
+
+# Rows per statement when backfilling
+BACKFILL_BATCH_SIZE = 1000
+
+# (name, step) in the order they were introduced
+MIGRATIONS: List[Tuple[str, Callable[[Connection], bool]]] = []
+
+
+def migration(name: str):
+    """Register a schema upgrade step; it returns whether it changed anything"""
+    def register(step: Callable[[Connection], bool]) -> Callable[[Connection], bool]:
+        MIGRATIONS.append((name, step))
+        return step
+    return register
+
+
+def _has_column(conn: Connection, table: str, column: str) -> bool:
+    return any(info['name'] == column for info in inspect(conn).get_columns(table))
+
+
+def _add_column(conn: Connection, column: Column) -> bool:
+    """ALTER TABLE ... ADD COLUMN for a model column missing from its table"""
+    table = column.table.name
+    if _has_column(conn, table, column.name):
+        return False
+    
+    column_type = column.type.compile(dialect=conn.dialect)
+    conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {column.name} {column_type}'))
+    return True
+
+
+def _create_index(conn: Connection, index: Index) -> bool:
+    """Create a model index missing from the database"""
+    existing = {info['name'] for info in inspect(conn).get_indexes(index.table.name)}
+    if index.name in existing:
+        return False
+    index.create(conn)
+    return True
+
+
+def _column_index(column: Column) -> Index:
+    """The index=True/unique=True index SQLAlchemy declares for a single column"""
+    return next(
+        index for index in column.table.indexes
+        if [indexed.name for indexed in index.columns] == [column.name]
+    )
+
+
+@migration("portfolio_positions_count")
+def _portfolio_positions_count(conn: Connection) -> bool:
+    """portfolios.positions_count (stored totals) and the holdings.portfolio_id index"""
+    added = _add_column(conn, Portfolio.__table__.c.positions_count)
+    if added:
+        conn.execute(text(
+            'UPDATE portfolios SET positions_count = '
+            '(SELECT count(*) FROM holdings WHERE holdings.portfolio_id = portfolios.id)'
+        ))
+    indexed = _create_index(conn, _column_index(Holding.__table__.c.portfolio_id))
+    return added or indexed
+
+
+@migration("news_article_url_hash")
+def _news_article_url_hash(conn: Connection) -> bool:
+    """
+    news_articles.url_hash (deduplication key) and image_url, plus the
+    news_article_symbols rows for articles stored before that table existed.
+    
+    url_hash is backfilled from the stored URLs; articles whose normalized
+    URL repeats an earlier one are deleted so the unique index can be built.
+    """
+    articles = NewsArticle.__table__
+    upgrading = _add_column(conn, articles.c.url_hash)
+    added_image_url = _add_column(conn, articles.c.image_url)
+    
+    rows = conn.execute(
+        select(articles.c.id, articles.c.url, articles.c.related_symbols, articles.c.published_at)
+        .where(articles.c.url_hash.is_(None))
+        .order_by(articles.c.id)
+    ).all()
+    
+    if rows:
+        seen = set(conn.execute(select(articles.c.url_hash).where(articles.c.url_hash.is_not(None))).scalars())
+        hashes, duplicates, kept = [], [], []
+        for row in rows:
+            key = url_hash(row.url)
+            if key in seen:
+                duplicates.append(row.id)
+                continue
+            seen.add(key)
+            hashes.append({'b_id': row.id, 'b_hash': key})
+            kept.append(row)
+        
+        for start in range(0, len(duplicates), BACKFILL_BATCH_SIZE):
+            batch = duplicates[start:start + BACKFILL_BATCH_SIZE]
+            conn.execute(delete(NewsArticleSymbol.__table__).where(NewsArticleSymbol.__table__.c.article_id.in_(batch)))
+            conn.execute(delete(articles).where(articles.c.id.in_(batch)))
+        if hashes:
+            conn.execute(
+                update(articles).where(articles.c.id == bindparam('b_id')).values(url_hash=bindparam('b_hash')),
+                hashes
+            )
+        
+        if upgrading:
+            symbol_rows = [
+                {'article_id': row.id, 'symbol': symbol, 'published_at': row.published_at}
+                for row in kept
+                for symbol in dict.fromkeys(row.related_symbols or [])
+            ]
+            for start in range(0, len(symbol_rows), BACKFILL_BATCH_SIZE):
+                conn.execute(
+                    insert(NewsArticleSymbol.__table__), symbol_rows[start:start + BACKFILL_BATCH_SIZE]
+                )
+        logger.info(f"Backfilled url_hash for {len(hashes)} articles, dropped {len(duplicates)} duplicates")
+    
+    if upgrading and conn.dialect.name == 'postgresql':
+        conn.execute(text('ALTER TABLE news_articles ALTER COLUMN url_hash SET NOT NULL'))
+    
+    indexed = _create_index(conn, _column_index(articles.c.url_hash))
+    indexed = _create_index(conn, _column_index(articles.c.published_at)) or indexed
+    return upgrading or added_image_url or bool(rows) or indexed
+
+
+@migration("chat_session_summary")
+def _chat_session_summary(conn: Connection) -> bool:
+    """chat_sessions.summary / summarized_message_id (rolling summary) and the chat_messages.session_id index"""
+    sessions = ChatSession.__table__
+    added_summary = _add_column(conn, sessions.c.summary)
+    added_message_id = _add_column(conn, sessions.c.summarized_message_id)
+    indexed = _create_index(conn, _column_index(ChatMessage.__table__.c.session_id))
+    return added_summary or added_message_id or indexed
+
+
+@migration("market_data_unique_symbol")
+def _market_data_unique_symbol(conn: Connection) -> bool:
+    """
+    Make market_data.symbol unique for the refresher's upsert, keeping the
+    most recently inserted row of each symbol
+    """
+    index = _column_index(MarketData.__table__.c.symbol)
+    existing = {info['name']: info for info in inspect(conn).get_indexes('market_data')}
+    if existing.get(index.name, {}).get('unique'):
+        return False
+    
+    conn.execute(text(
+        'DELETE FROM market_data WHERE id NOT IN (SELECT max(id) FROM market_data GROUP BY symbol)'
+    ))
+    if index.name in existing:
+        conn.execute(text(f'DROP INDEX {index.name}'))
+    index.create(conn)
+    return True
+
+
+def run_migrations(conn: Connection) -> List[str]:
+    """Apply every step against the live schema, returning the names of those that changed it"""
+    applied = []
+    for name, step in MIGRATIONS:
+        if step(conn):
+            applied.append(name)
+    return applied
+
+
+async def upgrade_schema(engine: AsyncEngine) -> List[str]:
+    """
+    Bring tables created by an older release up to the current models.
+    
+    create_all only creates missing tables, so columns and indexes added to
+    existing tables are applied here, after it. Each step checks the live
+    schema first, so running them again is a no-op.
+    """
+    async with engine.begin() as conn:
+        if conn.dialect.name == 'postgresql':
+            await conn.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': MIGRATION_LOCK_KEY})
+        applied = await conn.run_sync(run_migrations)
+    
+    for name in applied:
+        logger.info(f"Applied schema upgrade {name}")
+    return applied
\ No newline at end of file
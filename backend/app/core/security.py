@@ -2,24 +2,45 @@
 Security utilities for authentication and authorization
 """
 from datetime import datetime, timedelta
-from typing import Optional, Union
+from typing import Any, Dict, Optional, Union
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import inspect
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 
+from app.core.cache import TieredCache
 from app.core.config import settings
+from app.core.workers import WorkerPool
 from app.core.database import get_db
 from app.models.user import User
-from app.crud.user import get_user_by_email
+from app.crud import user as crud_user
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt takes ~250ms of CPU per call, so async handlers run it here
+password_pool = WorkerPool(
+    name="password-hash",
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+    use_processes=settings.PASSWORD_HASH_USE_PROCESSES
+)
+
 # JWT token scheme
 security = HTTPBearer()
 
+# Authenticated user snapshots keyed by token subject (email). Local to the
+# process: crud.user invalidates entries it changes here, and the short TTL
+# bounds staleness for changes made by other workers.
+user_cache = TieredCache(
+    namespace="user",
+    ttl_seconds=settings.USER_CACHE_TTL_SECONDS,
+    max_size=settings.USER_CACHE_MAX_SIZE
+)
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
@@ -31,6 +52,16 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the password worker pool"""
+    return await password_pool.run(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password on the password worker pool"""
+    return await password_pool.run(get_password_hash, password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT access token"""
     to_encode = data.copy()
@@ -53,6 +84,23 @@ def verify_token(token: str) -> Optional[dict]:
         return None
 
 
+def _snapshot_user(user: User) -> Dict[str, Any]:
+    """Copy the column values of a loaded user"""
+    return {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs}
+
+
+def _user_from_snapshot(snapshot: Dict[str, Any]) -> User:
+    """Build a detached User (as if loaded and the session closed) from a snapshot"""
+    user = User(**snapshot)
+    make_transient_to_detached(user)
+    return user
+
+
+async def invalidate_cached_user(email: str):
+    """Drop a cached user so the next request reloads it"""
+    await user_cache.invalidate(email)
+
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: AsyncSession = Depends(get_db)
@@ -76,10 +124,15 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
     
-    user = await get_user_by_email(db, email=email)
+    snapshot = await user_cache.get(email)
+    if snapshot is not None:
+        return _user_from_snapshot(snapshot)
+    
+    user = await crud_user.get_user_by_email(db, email=email)
     if user is None:
         raise credentials_exception
     
+    await user_cache.set(email, _snapshot_user(user))
     return user
 
 
@@ -0,0 +1,80 @@
+"""
+Bounded worker pools for CPU-bound work that must stay off the event loop
+"""
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict
+import asyncio
+import multiprocessing
+import time
+
+from app.core.exceptions import RateLimitError
+
+
+class WorkerPool:
+    """
+    Executor wrapper with bounded queueing and queue-depth counters.
+    
+    At most max_workers calls run at once; up to max_queue more may wait.
+    Beyond that, run() fails fast with RateLimitError instead of letting the
+    backlog (and every caller's latency) grow without bound.
+    """
+    
+    def __init__(self, name: str, max_workers: int, max_queue: int = 0, use_processes: bool = False):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        
+        if use_processes:
+            # spawn, not fork: the server process already runs threads
+            self._executor: Executor = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        
+        self.in_flight = 0
+        self.peak_queue_depth = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+    
+    @property
+    def queue_depth(self) -> int:
+        """Calls submitted but still waiting for a worker"""
+        return max(self.in_flight - self.max_workers, 0)
+    
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run func on the pool and await its result"""
+        if self.max_queue and self.queue_depth >= self.max_queue:
+            self.rejected += 1
+            raise RateLimitError(f"{self.name} is overloaded, try again shortly")
+        
+        self.in_flight += 1
+        self.peak_queue_depth = max(self.peak_queue_depth, self.queue_depth)
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            self.total_seconds += time.perf_counter() - start
+    
+    def shutdown(self):
+        """Stop accepting work and release workers"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+    
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """Pool counters"""
+        return {
+            "workers": self.max_workers,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "peak_queue_depth": self.peak_queue_depth,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_latency_ms": (self.total_seconds / self.completed * 1000) if self.completed else 0.0
+        }
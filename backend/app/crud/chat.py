@@ -0,0 +1,67 @@
+"""
+Chat session CRUD operations
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update
+from typing import Any, Dict, List, Optional
+
+from app.models.chat import ChatMessage, ChatSession
+
+
+async def get_session(db: AsyncSession, session_id: int) -> Optional[ChatSession]:
+    """Get chat session by ID"""
+    result = await db.execute(
+        select(ChatSession).where(ChatSession.id == session_id)
+    )
+    return result.scalar_one_or_none()
+
+
+async def get_messages_after(
+    db: AsyncSession,
+    session_id: int,
+    after_id: Optional[int] = None
+) -> List[ChatMessage]:
+    """Messages of a session newer than after_id (all when None), oldest first"""
+    query = select(ChatMessage).where(ChatMessage.session_id == session_id)
+    if after_id is not None:
+        query = query.where(ChatMessage.id > after_id)
+    
+    result = await db.execute(query.order_by(ChatMessage.id))
+    return result.scalars().all()
+
+
+async def create_messages(db: AsyncSession, session_id: int, messages: List[Dict[str, Any]]) -> List[ChatMessage]:
+    """Append messages (ChatMessage column dicts) to a session in one transaction"""
+    db_messages = [ChatMessage(session_id=session_id, **message) for message in messages]
+    db.add_all(db_messages)
+    await db.commit()
+    return db_messages
+
+
+async def update_session_summary(
+    db: AsyncSession,
+    session_id: int,
+    summary: str,
+    summarized_message_id: int,
+    expected_message_id: Optional[int] = None
+) -> bool:
+    """
+    Store a new rolling summary.
+    
+    Only applies if the session's summarized_message_id still equals
+    expected_message_id, so two concurrent compactions can't overwrite
+    each other. Returns whether the summary was stored.
+    """
+    condition = (
+        ChatSession.summarized_message_id.is_(None)
+        if expected_message_id is None
+        else ChatSession.summarized_message_id == expected_message_id
+    )
+    result = await db.execute(
+        update(ChatSession)
+        .where(ChatSession.id == session_id)
+        .where(condition)
+        .values(summary=summary, summarized_message_id=summarized_message_id)
+    )
+    await db.commit()
+    return result.rowcount > 0
\ No newline at end of file
@@ -0,0 +1,46 @@
+"""
+Market data CRUD operations
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from typing import Any, Dict, List
+
+from app.crud.news import UPSERT_INSERTS
+from app.models.market import MarketData
+
+
+async def upsert_market_data(db: AsyncSession, rows: List[Dict[str, Any]]):
+    """
+    Insert or update market_data rows (MarketData column dicts) by symbol.
+    
+    Uses INSERT ... ON CONFLICT (symbol) DO UPDATE where the dialect has it,
+    so concurrent writers can't create duplicate rows for a symbol.
+    """
+    if not rows:
+        return
+    
+    make_insert = UPSERT_INSERTS.get(db.bind.dialect.name)
+    if make_insert is not None:
+        statement = make_insert(MarketData)
+        columns = [column for column in rows[0] if column != 'symbol']
+        await db.execute(
+            statement.on_conflict_do_update(
+                index_elements=['symbol'],
+                set_={column: statement.excluded[column] for column in columns}
+            ),
+            rows
+        )
+    else:
+        result = await db.execute(
+            select(MarketData).where(MarketData.symbol.in_([row['symbol'] for row in rows]))
+        )
+        existing = {row.symbol: row for row in result.scalars().all()}
+        for values in rows:
+            row = existing.get(values['symbol'])
+            if row is None:
+                db.add(MarketData(**values))
+            else:
+                for column, value in values.items():
+                    setattr(row, column, value)
+    
+    await db.commit()
\ No newline at end of file
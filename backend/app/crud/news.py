@@ -0,0 +1,137 @@
+"""
+News article CRUD operations
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from typing import Any, Dict, List, Optional, Set
+from datetime import datetime
+
+from app.models.market import NewsArticle, NewsArticleSymbol
+
+# Dialects with INSERT ... ON CONFLICT DO NOTHING
+UPSERT_INSERTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert
+}
+
+
+async def get_existing_url_hashes(db: AsyncSession, url_hashes: List[str]) -> Set[str]:
+    """Return the subset of url_hashes already stored"""
+    if not url_hashes:
+        return set()
+    result = await db.execute(
+        select(NewsArticle.url_hash).where(NewsArticle.url_hash.in_(url_hashes))
+    )
+    return set(result.scalars().all())
+
+
+async def create_articles(db: AsyncSession, articles: List[Dict[str, Any]]) -> int:
+    """
+    Insert articles and their related symbols in one transaction.
+    
+    Each dict holds NewsArticle columns plus 'related_symbols'. Articles
+    whose url_hash is already stored (e.g. inserted concurrently by another
+    worker) are skipped. Returns the number of articles inserted.
+    """
+    if not articles:
+        return 0
+    
+    make_insert = UPSERT_INSERTS.get(db.bind.dialect.name)
+    if make_insert is not None:
+        statement = make_insert(NewsArticle).on_conflict_do_nothing(index_elements=['url_hash'])
+    else:
+        statement = insert(NewsArticle)
+    
+    result = await db.execute(
+        statement.returning(NewsArticle.id, NewsArticle.url_hash),
+        articles
+    )
+    inserted = {url_hash: article_id for article_id, url_hash in result.all()}
+    
+    symbol_rows = [
+        {
+            'article_id': inserted[article['url_hash']],
+            'symbol': symbol,
+            'published_at': article['published_at']
+        }
+        for article in articles
+        if article['url_hash'] in inserted
+        for symbol in article.get('related_symbols') or []
+    ]
+    if symbol_rows:
+        await db.execute(insert(NewsArticleSymbol), symbol_rows)
+    
+    await db.commit()
+    return len(inserted)
+
+
+async def get_articles(
+    db: AsyncSession,
+    since: datetime,
+    symbol: Optional[str] = None,
+    limit: Optional[int] = None
+) -> List[NewsArticle]:
+    """Get articles published since a time, newest first, optionally for one symbol"""
+    if symbol:
+        query = (
+            select(NewsArticle)
+            .join(NewsArticleSymbol, NewsArticleSymbol.article_id == NewsArticle.id)
+            .where(NewsArticleSymbol.symbol == symbol)
+            .where(NewsArticleSymbol.published_at >= since)
+            .order_by(NewsArticleSymbol.published_at.desc())
+        )
+    else:
+        query = (
+            select(NewsArticle)
+            .where(NewsArticle.published_at >= since)
+            .order_by(NewsArticle.published_at.desc())
+        )
+    
+    if limit:
+        query = query.limit(limit)
+    
+    result = await db.execute(query)
+    return result.scalars().all()
+
+
+async def get_symbol_sentiment_counts(
+    db: AsyncSession,
+    since: datetime,
+    symbols: List[str]
+) -> Dict[str, Dict[str, int]]:
+    """Article count per sentiment label for each symbol since a time (symbols without news are absent)"""
+    if not symbols:
+        return {}
+    result = await db.execute(
+        select(NewsArticleSymbol.symbol, NewsArticle.sentiment, func.count())
+        .join(NewsArticle, NewsArticle.id == NewsArticleSymbol.article_id)
+        .where(NewsArticleSymbol.symbol.in_(symbols))
+        .where(NewsArticleSymbol.published_at >= since)
+        .group_by(NewsArticleSymbol.symbol, NewsArticle.sentiment)
+    )
+    
+    counts: Dict[str, Dict[str, int]] = {}
+    for symbol, sentiment, count in result.all():
+        counts.setdefault(symbol, {})[sentiment or 'neutral'] = count
+    return counts
+
+
+async def get_sentiment_breakdown(
+    db: AsyncSession,
+    since: datetime,
+    category: Optional[str] = None
+) -> Dict[str, Dict[str, float]]:
+    """Article count and mean score per sentiment label since a time (optionally for one category)"""
+    query = (
+        select(NewsArticle.sentiment, func.count(), func.avg(NewsArticle.sentiment_score))
+        .where(NewsArticle.published_at >= since)
+        .where(NewsArticle.sentiment.is_not(None))
+    )
+    if category is not None:
+        query = query.where(NewsArticle.category == category)
+    result = await db.execute(query.group_by(NewsArticle.sentiment))
+    return {
+        sentiment: {'count': count, 'avg_score': float(avg_score or 0.0)}
+        for sentiment, count, avg_score in result.all()
+    }
\ No newline at end of file
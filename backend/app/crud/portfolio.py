@@ -2,13 +2,81 @@
 Portfolio CRUD operations
 """
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, func, update, bindparam, case
 from sqlalchemy.orm import selectinload
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
+import math
 
 from app.models.portfolio import Portfolio, Holding, Transaction
 from app.schemas.portfolio import PortfolioCreate, PortfolioUpdate, HoldingCreate, TransactionCreate
 
+# Portfolio columns maintained from its holdings
+TOTAL_COLUMNS = ('total_value', 'total_invested', 'total_gain_loss', 'total_gain_loss_percent', 'positions_count')
+
+
+def _gain_loss_percent(total_gain_loss, total_invested):
+    return case((total_invested > 0, total_gain_loss / total_invested * 100), else_=0.0)
+
+
+async def _apply_portfolio_delta(
+    db: AsyncSession,
+    portfolio_id: int,
+    value: float = 0.0,
+    invested: float = 0.0,
+    gain_loss: float = 0.0,
+    positions: int = 0
+):
+    """
+    Add deltas to a portfolio's stored totals in the caller's transaction.
+    
+    The arithmetic happens in SQL (total = total + delta), so concurrent
+    writers to the same portfolio don't overwrite each other.
+    """
+    portfolios = Portfolio.__table__
+    total_invested = func.coalesce(portfolios.c.total_invested, 0.0) + invested
+    total_gain_loss = func.coalesce(portfolios.c.total_gain_loss, 0.0) + gain_loss
+    
+    await db.execute(
+        update(portfolios)
+        .where(portfolios.c.id == portfolio_id)
+        .values(
+            total_value=func.coalesce(portfolios.c.total_value, 0.0) + value,
+            total_invested=total_invested,
+            total_gain_loss=total_gain_loss,
+            total_gain_loss_percent=_gain_loss_percent(total_gain_loss, total_invested),
+            positions_count=func.coalesce(portfolios.c.positions_count, 0) + positions
+        )
+    )
+
+
+async def _recompute_portfolio_totals(db: AsyncSession, condition) -> int:
+    """Rebuild stored totals from holdings for portfolios matching condition, in one UPDATE"""
+    portfolios = Portfolio.__table__
+    holdings = Holding.__table__
+    
+    def aggregate(expression):
+        return (
+            select(expression)
+            .where(holdings.c.portfolio_id == portfolios.c.id)
+            .scalar_subquery()
+        )
+    
+    total_invested = aggregate(func.coalesce(func.sum(holdings.c.shares * holdings.c.average_price), 0.0))
+    total_gain_loss = aggregate(func.coalesce(func.sum(holdings.c.gain_loss), 0.0))
+    
+    result = await db.execute(
+        update(portfolios)
+        .where(condition)
+        .values(
+            total_value=aggregate(func.coalesce(func.sum(holdings.c.total_value), 0.0)),
+            total_invested=total_invested,
+            total_gain_loss=total_gain_loss,
+            total_gain_loss_percent=_gain_loss_percent(total_gain_loss, total_invested),
+            positions_count=aggregate(func.count(holdings.c.id))
+        )
+    )
+    return max(result.rowcount, 0)
+
 
 async def get_portfolio(db: AsyncSession, portfolio_id: int) -> Optional[Portfolio]:
     """Get portfolio by ID"""
@@ -102,6 +170,13 @@ async def create_holding(db: AsyncSession, portfolio_id: int, holding: HoldingCr
         gain_loss_percent=0.0,
     )
     db.add(db_holding)
+    await _apply_portfolio_delta(
+        db,
+        portfolio_id,
+        value=db_holding.total_value,
+        invested=db_holding.total_value,
+        positions=1
+    )
     await db.commit()
     await db.refresh(db_holding)
     return db_holding
@@ -117,16 +192,76 @@ async def update_holding_price(db: AsyncSession, holding_id: int, current_price:
     if not db_holding:
         return None
     
+    previous_value = db_holding.total_value or 0.0
+    previous_gain_loss = db_holding.gain_loss or 0.0
+    
     db_holding.current_price = current_price
     db_holding.total_value = db_holding.shares * current_price
     db_holding.gain_loss = db_holding.total_value - (db_holding.shares * db_holding.average_price)
     db_holding.gain_loss_percent = (db_holding.gain_loss / (db_holding.shares * db_holding.average_price)) * 100
     
+    await _apply_portfolio_delta(
+        db,
+        db_holding.portfolio_id,
+        value=db_holding.total_value - previous_value,
+        gain_loss=db_holding.gain_loss - previous_gain_loss
+    )
     await db.commit()
     await db.refresh(db_holding)
     return db_holding
 
 
+async def revalue_holdings(db: AsyncSession, prices: Dict[str, float]) -> int:
+    """
+    Reprice every holding of the given symbols in one transaction.
+    
+    Runs a single UPDATE per symbol (sent as one executemany) that computes
+    current_price, total_value, gain_loss and gain_loss_percent in SQL, so
+    no holding rows are loaded, then rebuilds the stored totals of every
+    portfolio holding one of those symbols. Missing, zero or non-finite
+    prices are skipped. Returns the number of holdings updated.
+    """
+    params = [
+        {'b_symbol': symbol, 'b_price': float(price)}
+        for symbol, price in prices.items()
+        if price is not None and math.isfinite(price) and price > 0
+    ]
+    if not params:
+        return 0
+    
+    holdings = Holding.__table__
+    price = bindparam('b_price')
+    cost_basis = holdings.c.shares * holdings.c.average_price
+    gain_loss = holdings.c.shares * price - cost_basis
+    
+    statement = (
+        update(holdings)
+        .where(holdings.c.symbol == bindparam('b_symbol'))
+        .values(
+            current_price=price,
+            total_value=holdings.c.shares * price,
+            gain_loss=gain_loss,
+            gain_loss_percent=case((cost_basis != 0, gain_loss / cost_basis * 100), else_=0.0)
+        )
+    )
+    
+    await db.execute(statement, params)
+    
+    # rowcount isn't reported for executemany (asyncpg gives -1), so count the matched holdings
+    symbols = [param['b_symbol'] for param in params]
+    revalued = await db.scalar(
+        select(func.count()).select_from(holdings).where(holdings.c.symbol.in_(symbols))
+    )
+    await _recompute_portfolio_totals(
+        db,
+        Portfolio.__table__.c.id.in_(
+            select(holdings.c.portfolio_id).where(holdings.c.symbol.in_(symbols))
+        )
+    )
+    await db.commit()
+    return revalued or 0
+
+
 async def create_transaction(db: AsyncSession, holding_id: int, transaction: TransactionCreate) -> Transaction:
     """Create new transaction"""
     total_amount = transaction.shares * transaction.price + transaction.fees
@@ -147,30 +282,86 @@ async def create_transaction(db: AsyncSession, holding_id: int, transaction: Tra
 
 
 async def get_portfolio_summary(db: AsyncSession, portfolio_id: int) -> dict:
-    """Get portfolio summary statistics"""
+    """Get portfolio summary statistics from the stored totals"""
     result = await db.execute(
+        select(*(getattr(Portfolio, column) for column in TOTAL_COLUMNS))
+        .where(Portfolio.id == portfolio_id)
+    )
+    summary = result.first()
+    values = summary._asdict() if summary else {}
+    
+    return {
+        'total_value': values.get('total_value') or 0.0,
+        'total_invested': values.get('total_invested') or 0.0,
+        'total_gain_loss': values.get('total_gain_loss') or 0.0,
+        'total_gain_loss_percent': values.get('total_gain_loss_percent') or 0.0,
+        'positions_count': values.get('positions_count') or 0
+    }
+
+
+async def check_portfolio_totals(
+    db: AsyncSession,
+    portfolio_ids: Optional[List[int]] = None,
+    tolerance: float = 1e-6,
+    repair: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Compare stored portfolio totals with a fresh aggregate over holdings.
+    
+    Returns one entry per drifted portfolio with the stored and actual
+    values; floats are compared with relative and absolute tolerance. With
+    repair=True the drifted portfolios are rebuilt from their holdings.
+    """
+    holdings = Holding.__table__
+    actual = (
         select(
-            func.sum(Holding.total_value).label('total_value'),
-            func.sum(Holding.shares * Holding.average_price).label('total_invested'),
-            func.sum(Holding.gain_loss).label('total_gain_loss'),
-            func.count(Holding.id).label('positions_count')
+            holdings.c.portfolio_id,
+            func.sum(holdings.c.total_value).label('total_value'),
+            func.sum(holdings.c.shares * holdings.c.average_price).label('total_invested'),
+            func.sum(holdings.c.gain_loss).label('total_gain_loss'),
+            func.count(holdings.c.id).label('positions_count')
         )
-        .where(Holding.portfolio_id == portfolio_id)
+        .group_by(holdings.c.portfolio_id)
+        .subquery()
     )
     
-    summary = result.first()
+    query = (
+        select(
+            Portfolio.id,
+            *(getattr(Portfolio, column) for column in TOTAL_COLUMNS),
+            actual.c.total_value.label('actual_total_value'),
+            actual.c.total_invested.label('actual_total_invested'),
+            actual.c.total_gain_loss.label('actual_total_gain_loss'),
+            actual.c.positions_count.label('actual_positions_count')
+        )
+        .outerjoin(actual, actual.c.portfolio_id == Portfolio.id)
+    )
+    if portfolio_ids is not None:
+        query = query.where(Portfolio.id.in_(portfolio_ids))
     
-    total_value = summary.total_value or 0.0
-    total_invested = summary.total_invested or 0.0
-    total_gain_loss = summary.total_gain_loss or 0.0
-    positions_count = summary.positions_count or 0
+    drifted = []
+    for row in (await db.execute(query)).all():
+        total_invested = row.actual_total_invested or 0.0
+        total_gain_loss = row.actual_total_gain_loss or 0.0
+        expected = {
+            'total_value': row.actual_total_value or 0.0,
+            'total_invested': total_invested,
+            'total_gain_loss': total_gain_loss,
+            'total_gain_loss_percent': (total_gain_loss / total_invested * 100) if total_invested > 0 else 0.0,
+            'positions_count': row.actual_positions_count or 0
+        }
+        stored = {column: getattr(row, column) or 0 for column in TOTAL_COLUMNS}
+        
+        if any(
+            not math.isclose(stored[column], expected[column], rel_tol=tolerance, abs_tol=tolerance)
+            for column in TOTAL_COLUMNS
+        ):
+            drifted.append({'portfolio_id': row.id, 'stored': stored, 'actual': expected})
     
-    total_gain_loss_percent = (total_gain_loss / total_invested * 100) if total_invested > 0 else 0.0
+    if repair and drifted:
+        await _recompute_portfolio_totals(
+            db, Portfolio.__table__.c.id.in_([entry['portfolio_id'] for entry in drifted])
+        )
+        await db.commit()
     
-    return {
-        'total_value': total_value,
-        'total_invested': total_invested,
-        'total_gain_loss': total_gain_loss,
-        'total_gain_loss_percent': total_gain_loss_percent,
-        'positions_count': positions_count
-    }
\ No newline at end of file
+    return drifted
\ No newline at end of file
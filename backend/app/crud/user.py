@@ -8,7 +8,7 @@ from typing import Optional
 
 from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate
-from app.core.security import get_password_hash
+from app.core import security
 
 
 async def get_user(db: AsyncSession, user_id: int) -> Optional[User]:
@@ -29,7 +29,7 @@ async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
 
 async def create_user(db: AsyncSession, user: UserCreate) -> User:
     """Create new user"""
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await security.get_password_hash_async(user.password)
     db_user = User(
         email=user.email,
         hashed_password=hashed_password,
@@ -57,12 +57,17 @@ async def update_user(db: AsyncSession, user_id: int, user_update: UserUpdate) -
     if not db_user:
         return None
     
+    previous_email = db_user.email
     update_data = user_update.dict(exclude_unset=True)
     for field, value in update_data.items():
         setattr(db_user, field, value)
     
     await db.commit()
     await db.refresh(db_user)
+    
+    await security.invalidate_cached_user(previous_email)
+    if db_user.email != previous_email:
+        await security.invalidate_cached_user(db_user.email)
     return db_user
 
 
@@ -78,6 +83,7 @@ async def delete_user(db: AsyncSession, user_id: int) -> bool:
     
     await db.delete(db_user)
     await db.commit()
+    await security.invalidate_cached_user(db_user.email)
     return True
 
 
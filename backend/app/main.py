@@ -8,9 +8,21 @@ from contextlib import asynccontextmanager
 import logging
 
 from app.core.config import settings
-from app.core.database import engine, Base
+from app.core.database import engine, Base, AsyncSessionLocal, get_pool_stats
 from app.api.v1.api import api_router
 from app.core.exceptions import setup_exception_handlers
+from app.core.migrations import upgrade_schema
+from app.core.http import http_client
+from app.core.security import password_pool, user_cache
+from app.crud import portfolio as crud_portfolio
+from app.services.ai_service import ai_service
+from app.services.chat_memory import chat_memory
+from app.services.llm import llm_client
+from app.services.market_data import market_data_service
+from app.services.market_refresher import market_refresher
+from app.services.news_service import news_service
+from app.services.sentiment import sentiment_engine
+from app.services.symbol_search import symbol_index
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -26,11 +38,35 @@ async def lifespan(app: FastAPI):
     # Create database tables
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+    await upgrade_schema(engine)
+    
+    # Stored portfolio totals are maintained incrementally; rebuild any that
+    # drifted or predate them so the deltas start from the right base
+    try:
+        async with AsyncSessionLocal() as db:
+            repaired = await crud_portfolio.check_portfolio_totals(db, repair=True)
+        if repaired:
+            logger.info(f"Rebuilt stored totals for {len(repaired)} portfolios")
+    except Exception as e:
+        logger.error(f"Portfolio totals repair failed, serving stored totals as-is: {str(e)}")
+    
+    await http_client.start()
+    news_service.start_ingestion()
+    market_refresher.start()
     
     yield
     
     # Shutdown
     logger.info("Shutting down CogniWealth API...")
+    await market_refresher.stop()
+    await news_service.stop_ingestion()
+    await http_client.close()
+    await market_data_service.shutdown()
+    await chat_memory.close()
+    await llm_client.close()
+    password_pool.shutdown()
+    sentiment_engine.shutdown()
+    await engine.dispose()
 
 
 def create_application() -> FastAPI:
@@ -77,6 +113,23 @@ def create_application() -> FastAPI:
     async def health_check():
         return {"status": "healthy", "environment": settings.ENVIRONMENT}
     
+    @app.get("/metrics")
+    async def metrics():
+        return {
+            "market_data": market_data_service.get_stats(),
+            "market_refresher": market_refresher.stats,
+            "database": get_pool_stats(),
+            "user_cache": user_cache.stats,
+            "password_pool": password_pool.stats,
+            "sentiment": sentiment_engine.stats,
+            "news": news_service.get_stats(),
+            "symbol_search": symbol_index.stats,
+            "http_client": http_client.stats,
+            "ai": llm_client.stats,
+            "ai_context": ai_service.stats,
+            "chat_memory": chat_memory.stats
+        }
+    
     return app
 
 
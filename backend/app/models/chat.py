@@ -17,6 +17,10 @@ class ChatSession(Base):
     title = Column(String, nullable=True)
     is_active = Column(Boolean, default=True)
     
+    # Rolling summary of turns too old to send verbatim
+    summary = Column(Text, nullable=True)
+    summarized_message_id = Column(Integer, nullable=True)  # last message folded into summary
+    
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -30,7 +34,7 @@ class ChatMessage(Base):
     __tablename__ = "chat_messages"
     
     id = Column(Integer, primary_key=True, index=True)
-    session_id = Column(Integer, ForeignKey("chat_sessions.id"), nullable=False)
+    session_id = Column(Integer, ForeignKey("chat_sessions.id"), nullable=False, index=True)
     
     # Message details
     message_type = Column(String, nullable=False)  # user, ai
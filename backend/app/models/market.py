@@ -1,8 +1,9 @@
 """
 Market data and news models
 """
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, Boolean, JSON
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, Boolean, JSON, ForeignKey, Index
 from sqlalchemy.sql import func
+from sqlalchemy.orm import relationship
 from app.core.database import Base
 
 
@@ -12,7 +13,7 @@ class MarketData(Base):
     id = Column(Integer, primary_key=True, index=True)
     
     # Asset information
-    symbol = Column(String, nullable=False, index=True)
+    symbol = Column(String, nullable=False, unique=True, index=True)
     asset_type = Column(String, nullable=False)  # stock, etf, crypto, forex
     name = Column(String, nullable=False)
     
@@ -52,8 +53,10 @@ class NewsArticle(Base):
     summary = Column(Text, nullable=True)
     content = Column(Text, nullable=True)
     url = Column(String, nullable=False)
+    url_hash = Column(String(64), nullable=False, unique=True, index=True)  # SHA-256 of the normalized URL
     source = Column(String, nullable=False)
     author = Column(String, nullable=True)
+    image_url = Column(String, nullable=True)
     
     # Categorization
     category = Column(String, nullable=True)
@@ -65,11 +68,29 @@ class NewsArticle(Base):
     impact_level = Column(String, nullable=True)  # high, medium, low
     
     # Timestamps
-    published_at = Column(DateTime(timezone=True), nullable=False)
+    published_at = Column(DateTime(timezone=True), nullable=False, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Status
     is_processed = Column(Boolean, default=False)
+    
+    # Relationships
+    symbols = relationship("NewsArticleSymbol", back_populates="article", cascade="all, delete-orphan")
+
+
+class NewsArticleSymbol(Base):
+    """One row per (article, related symbol), so symbol news is an indexed lookup"""
+    __tablename__ = "news_article_symbols"
+    __table_args__ = (
+        Index("ix_news_article_symbols_symbol_published", "symbol", "published_at"),
+    )
+    
+    article_id = Column(Integer, ForeignKey("news_articles.id", ondelete="CASCADE"), primary_key=True)
+    symbol = Column(String, primary_key=True)
+    published_at = Column(DateTime(timezone=True), nullable=False)  # Copied from the article for the index
+    
+    # Relationships
+    article = relationship("NewsArticle", back_populates="symbols")
 
 
 class Notification(Base):
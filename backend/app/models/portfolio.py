@@ -20,6 +20,7 @@ class Portfolio(Base):
     total_invested = Column(Float, default=0.0)
     total_gain_loss = Column(Float, default=0.0)
     total_gain_loss_percent = Column(Float, default=0.0)
+    positions_count = Column(Integer, default=0)
     
     # Risk metrics
     risk_score = Column(Float, nullable=True)
@@ -42,7 +43,7 @@ class Holding(Base):
     __tablename__ = "holdings"
     
     id = Column(Integer, primary_key=True, index=True)
-    portfolio_id = Column(Integer, ForeignKey("portfolios.id"), nullable=False)
+    portfolio_id = Column(Integer, ForeignKey("portfolios.id"), nullable=False, index=True)
     
     # Asset information
     symbol = Column(String, nullable=False, index=True)
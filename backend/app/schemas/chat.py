@@ -1,10 +1,12 @@
 """
 Chat and AI schemas
 """
-from pydantic import BaseModel
+from pydantic import BaseModel, validator
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 
+from app.core.config import settings
+
 
 class ChatMessageBase(BaseModel):
     content: str
@@ -127,4 +129,32 @@ class InvestmentRecommendation(BaseModel):
     target_price: Optional[float] = None
     reasoning: str
     risk_level: str
-    time_horizon: str
\ No newline at end of file
+    time_horizon: str
+
+
+class BatchRecommendationRequest(BaseModel):
+    symbols: List[str]
+    
+    @validator('symbols')
+    def validate_symbols(cls, v):
+        if not v:
+            raise ValueError('At least one symbol is required')
+        if len(v) > settings.AI_BATCH_MAX_SYMBOLS:
+            raise ValueError(f'At most {settings.AI_BATCH_MAX_SYMBOLS} symbols per request')
+        return v
+
+
+class BatchRecommendationItem(BaseModel):
+    symbol: str
+    recommendation: Optional[str] = None  # buy, sell, hold
+    confidence: Optional[float] = None
+    reasoning: Optional[str] = None
+    risk_level: Optional[str] = None
+    time_horizon: Optional[str] = None
+    missing_context: List[str] = []
+    error: Optional[str] = None
+
+
+class BatchRecommendationResponse(BaseModel):
+    recommendations: List[BatchRecommendationItem]
+    generated_at: datetime
\ No newline at end of file
@@ -2,18 +2,31 @@
 AI service for financial advice and analysis
 """
 import openai
-from typing import Dict, List, Any, Optional
+from typing import Awaitable, AsyncIterator, Dict, List, Any, Optional, Tuple
+import asyncio
+import inspect
 import json
 import logging
+import time
 from datetime import datetime
 
 from app.core.config import settings
 from app.core.exceptions import ExternalAPIError
+from app.services.llm import (
+    REPLY_TOKEN_OVERHEAD, count_tokens, fit_history, llm_client, log_bucket, message_tokens, quantize
+)
 from app.services.market_data import market_data_service
 from app.services.news_service import news_service
+from app.services.portfolio_analytics import portfolio_analytics
+from app.services.symbol_extractor import symbol_extractor
 
 logger = logging.getLogger(__name__)
 
+# Quotes attached to a chat reply
+RELATED_QUOTES_LIMIT = 3
+
+RECOMMENDATION_ACTIONS = {"buy", "hold", "sell"}
+
 
 class AIService:
     """Service for AI-powered financial analysis and advice"""
@@ -23,64 +36,209 @@ class AIService:
         self.model = settings.DEFAULT_AI_MODEL
         self.max_tokens = settings.MAX_TOKENS
         self.temperature = settings.TEMPERATURE
+        
+        # Sent with every request, so tokenized once
+        self.system_prompt = inspect.cleandoc(self._get_system_prompt())
+        self.system_prompt_tokens = message_tokens({"role": "system", "content": self.system_prompt}, self.model)
+        
+        self.context_timeouts: Dict[str, int] = {}
+        self.context_errors: Dict[str, int] = {}
     
     async def chat_with_advisor(
         self, 
         message: str, 
         context: Optional[Dict[str, Any]] = None,
-        chat_history: Optional[List[Dict[str, str]]] = None
+        chat_history: Optional[List[Dict[str, str]]] = None,
+        summary: Optional[str] = None
     ) -> Dict[str, Any]:
         """Chat with AI financial advisor"""
+        # Quotes for symbols in the question load while the model answers
+        prefetch = self._prefetch_related_quotes(message)
         try:
-            # Build conversation context
-            messages = [
-                {
-                    "role": "system",
-                    "content": self._get_system_prompt()
-                }
-            ]
-            
-            # Add chat history if provided
-            if chat_history:
-                for msg in chat_history[-10:]:  # Last 10 messages for context
-                    messages.append({
-                        "role": msg["role"],
-                        "content": msg["content"]
-                    })
-            
-            # Add current user message
-            messages.append({
-                "role": "user",
-                "content": message
-            })
-            
             # Get AI response
-            response = await openai.ChatCompletion.acreate(
-                model=self.model,
-                messages=messages,
+            response = await llm_client.complete(
+                self._build_chat_messages(message, chat_history, summary),
                 max_tokens=self.max_tokens,
-                temperature=self.temperature
+                temperature=self.temperature,
+                model=self.model
             )
             
-            ai_message = response.choices[0].message.content
+            ai_message = response["content"]
             
             # Extract suggestions and related data
             suggestions = self._extract_suggestions(ai_message)
-            related_data = await self._get_related_data(message, ai_message)
+            related_data = await self._get_related_data(message, ai_message, prefetch)
             
             return {
                 "message": ai_message,
                 "suggestions": suggestions,
                 "related_data": related_data,
-                "tokens_used": response.usage.total_tokens,
+                "tokens_used": response["tokens_used"],
                 "model": self.model,
                 "confidence": self._calculate_confidence(ai_message)
             }
         
         except Exception as e:
+            if prefetch is not None:
+                prefetch.cancel()
             logger.error(f"Error in AI chat: {str(e)}")
             raise ExternalAPIError("AI service temporarily unavailable")
     
+    async def stream_chat_with_advisor(
+        self,
+        message: str,
+        context: Optional[Dict[str, Any]] = None,
+        chat_history: Optional[List[Dict[str, str]]] = None,
+        summary: Optional[str] = None
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Chat with AI financial advisor, yielding (event, data) pairs as the reply is generated.
+        
+        Events:
+            token: {"content": delta} for each chunk of the reply
+            related_data: {"quotes": [...]} once quotes for symbols in the
+                question are loaded (sent mid-stream if ready), then again
+                at the end if the reply mentions further symbols
+            done: the same fields chat_with_advisor returns, plus
+                time_to_first_token_ms and cached
+            error: {"detail": ...} if generation fails; the stream ends
+        """
+        started = time.perf_counter()
+        prefetch = self._prefetch_related_quotes(message)
+        sent_quotes = None
+        stream = llm_client.stream(
+            self._build_chat_messages(message, chat_history, summary),
+            max_tokens=self.max_tokens,
+            temperature=self.temperature,
+            model=self.model
+        )
+        
+        try:
+            async for delta in stream:
+                yield "token", {"content": delta}
+                if sent_quotes is None and prefetch is not None and prefetch.done():
+                    sent_quotes = self._prefetched_quotes(prefetch)
+                    if sent_quotes:
+                        yield "related_data", {"quotes": sent_quotes}
+            
+            ai_message = stream.content
+            related_data = await self._get_related_data(message, ai_message, prefetch)
+        except Exception as e:
+            logger.error(f"Error in AI chat stream: {str(e)}")
+            yield "error", {"detail": "AI service temporarily unavailable"}
+            return
+        finally:
+            # Client gone or generation failed
+            if prefetch is not None and not prefetch.done():
+                prefetch.cancel()
+        
+        if related_data.get("quotes", []) != (sent_quotes or []):
+            yield "related_data", related_data
+        
+        yield "done", {
+            "message": ai_message,
+            "suggestions": self._extract_suggestions(ai_message),
+            "related_data": related_data,
+            "tokens_used": stream.tokens_used,
+            "model": self.model,
+            "confidence": self._calculate_confidence(ai_message),
+            "cached": stream.cached,
+            "time_to_first_token_ms": (stream.time_to_first_token or 0.0) * 1000,
+            "total_time_ms": (time.perf_counter() - started) * 1000
+        }
+    
+    def _build_chat_messages(
+        self,
+        message: str,
+        chat_history: Optional[List[Dict[str, str]]] = None,
+        summary: Optional[str] = None
+    ) -> List[Dict[str, str]]:
+        """
+        System prompt, summary of earlier turns, recent history and the new
+        user message, within CHAT_CONTEXT_TOKEN_BUDGET.
+        
+        History (oldest first) is kept from the newest message backwards
+        while it fits; older messages are left out.
+        """
+        messages = [
+            {
+                "role": "system",
+                "content": self.system_prompt
+            }
+        ]
+        used = self.system_prompt_tokens + REPLY_TOKEN_OVERHEAD
+        
+        if summary:
+            messages.append(self._summary_message(summary))
+            used += message_tokens(messages[-1], self.model)
+        
+        user_message = {
+            "role": "user",
+            "content": message
+        }
+        used += message_tokens(user_message, self.model)
+        
+        # Add as much recent chat history as the budget allows
+        if chat_history:
+            _, recent = fit_history(chat_history, settings.CHAT_CONTEXT_TOKEN_BUDGET - used, self.model)
+            for msg in recent:
+                messages.append({
+                    "role": msg["role"],
+                    "content": msg["content"]
+                })
+        
+        messages.append(user_message)
+        return messages
+    
+    def _summary_message(self, summary: str) -> Dict[str, str]:
+        return {"role": "system", "content": f"Summary of the earlier conversation: {summary}"}
+    
+    def history_budget(self) -> int:
+        """
+        Tokens of history a chat request can always carry: the context
+        budget less the system prompt, a full-size summary and room for the
+        next user message
+        """
+        return (
+            settings.CHAT_CONTEXT_TOKEN_BUDGET
+            - self.system_prompt_tokens
+            - message_tokens(self._summary_message(""), self.model)
+            - settings.CHAT_SUMMARY_MAX_TOKENS
+            - settings.CHAT_MESSAGE_RESERVE_TOKENS
+            - REPLY_TOKEN_OVERHEAD
+        )
+    
+    async def summarize_history(self, summary: Optional[str], messages: List[Dict[str, str]]) -> str:
+        """Fold messages (oldest first) into the rolling conversation summary"""
+        turns = "\n".join(
+            f"{'User' if msg['role'] == 'user' else 'Advisor'}: {msg['content']}" for msg in messages
+        )
+        prompt = f"""
+        Summary so far:
+        {summary or "(none)"}
+        
+        New turns:
+        {turns}
+        
+        Rewrite the summary so it also covers the new turns. Keep the user's
+        goals, holdings, risk tolerance, and any symbols, figures or advice
+        discussed. Answer with the summary only.
+        """
+        
+        response = await llm_client.complete(
+            [
+                {
+                    "role": "system",
+                    "content": "You keep a concise running summary of a conversation between a user and a financial advisor."
+                },
+                {"role": "user", "content": inspect.cleandoc(prompt)}
+            ],
+            max_tokens=settings.CHAT_SUMMARY_MAX_TOKENS,
+            temperature=0.2,
+            model=self.model
+        )
+        return response["content"].strip()
+    
     def _get_system_prompt(self) -> str:
         """Get system prompt for AI financial advisor"""
         return """
@@ -125,17 +283,52 @@ class AIService:
         
         return suggestions[:4]  # Limit to 4 suggestions
     
-    async def _get_related_data(self, user_message: str, ai_message: str) -> Dict[str, Any]:
-        """Get related market data based on conversation"""
+    def _prefetch_related_quotes(self, user_message: str) -> Optional[asyncio.Task]:
+        """Start loading quotes for symbols in the user's message, or None if it names none"""
+        symbols = self._extract_symbols_from_text(user_message)[:RELATED_QUOTES_LIMIT]
+        if not symbols:
+            return None
+        return asyncio.create_task(market_data_service.get_multiple_quotes(symbols))
+    
+    def _prefetched_quotes(self, prefetch: Optional[asyncio.Task]) -> List[Dict[str, Any]]:
+        """Quotes from a finished prefetch ([] if it failed)"""
+        if prefetch is None or prefetch.cancelled():
+            return []
+        if prefetch.exception() is not None:
+            logger.error(f"Error fetching related quotes: {str(prefetch.exception())}")
+            return []
+        return prefetch.result()
+    
+    async def _get_related_data(
+        self,
+        user_message: str,
+        ai_message: str,
+        prefetch: Optional[asyncio.Task] = None
+    ) -> Dict[str, Any]:
+        """
+        Get related market data based on conversation.
+        
+        prefetch is the task from _prefetch_related_quotes; only symbols the
+        reply adds are fetched here.
+        """
         related_data = {}
         
         # Extract mentioned symbols
-        symbols = self._extract_symbols_from_text(user_message + " " + ai_message)
+        symbols = self._extract_symbols_from_text(user_message + " " + ai_message)[:RELATED_QUOTES_LIMIT]
         
         if symbols:
             try:
-                quotes = await market_data_service.get_multiple_quotes(symbols[:3])
-                related_data["quotes"] = quotes
+                quotes = {}
+                if prefetch is not None:
+                    await asyncio.wait([prefetch])
+                    quotes = {quote["symbol"]: quote for quote in self._prefetched_quotes(prefetch)}
+                
+                remaining = [symbol for symbol in symbols if symbol not in quotes]
+                if remaining:
+                    for quote in await market_data_service.get_multiple_quotes(remaining):
+                        quotes[quote["symbol"]] = quote
+                
+                related_data["quotes"] = [quotes[symbol] for symbol in symbols if symbol in quotes]
             except Exception as e:
                 logger.error(f"Error fetching related quotes: {str(e)}")
         
@@ -143,26 +336,7 @@ class AIService:
     
     def _extract_symbols_from_text(self, text: str) -> List[str]:
         """Extract stock symbols from text"""
-        # Simple symbol extraction
-        common_symbols = {
-            'apple': 'AAPL',
-            'microsoft': 'MSFT',
-            'google': 'GOOGL',
-            'amazon': 'AMZN',
-            'tesla': 'TSLA',
-            'nvidia': 'NVDA',
-            'meta': 'META',
-            'netflix': 'NFLX'
-        }
-        
-        text_lower = text.lower()
-        found_symbols = []
-        
-        for keyword, symbol in common_symbols.items():
-            if keyword in text_lower:
-                found_symbols.append(symbol)
-        
-        return list(set(found_symbols))
+        return symbol_extractor.extract(text)
     
     def _calculate_confidence(self, message: str) -> float:
         """Calculate confidence score for AI response"""
@@ -182,7 +356,9 @@ class AIService:
         """Analyze portfolio and provide AI insights"""
         try:
             # Prepare portfolio summary for AI
+            metrics = await portfolio_analytics.analyze(portfolio_data.get("holdings", []))
             portfolio_summary = self._prepare_portfolio_summary(portfolio_data)
+            portfolio_summary["risk_metrics"] = metrics
             
             prompt = f"""
             Analyze this investment portfolio and provide insights:
@@ -200,23 +376,24 @@ class AIService:
             Format your response as a structured analysis.
             """
             
-            response = await openai.ChatCompletion.acreate(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": self._get_system_prompt()},
+            response = await llm_client.complete(
+                [
+                    {"role": "system", "content": self.system_prompt},
                     {"role": "user", "content": prompt}
                 ],
                 max_tokens=self.max_tokens,
-                temperature=0.3  # Lower temperature for analysis
+                temperature=0.3,  # Lower temperature for analysis
+                model=self.model,
+                cache_context=self._portfolio_cache_context(portfolio_summary)
             )
             
-            analysis = response.choices[0].message.content
+            analysis = response["content"]
             
             return {
                 "analysis": analysis,
                 "recommendations": self._extract_recommendations(analysis),
-                "risk_score": self._calculate_portfolio_risk(portfolio_data),
-                "diversification_score": self._calculate_diversification(portfolio_data),
+                "risk_score": metrics["risk_score"],
+                "diversification_score": metrics["diversification_score"],
                 "generated_at": datetime.now()
             }
         
@@ -241,6 +418,25 @@ class AIService:
             ]
         }
     
+    def _portfolio_cache_context(self, portfolio_summary: Dict[str, Any]) -> Dict[str, Any]:
+        """Bucketed portfolio facts behind the analysis prompt (response cache key)"""
+        metrics = portfolio_summary.get("risk_metrics", {})
+        return {
+            "kind": "portfolio_analysis",
+            "total_value": log_bucket(portfolio_summary["total_value"], 0.01),
+            "total_gain_loss": log_bucket(abs(portfolio_summary["total_gain_loss"] or 0), 0.01),
+            "gain": (portfolio_summary["total_gain_loss"] or 0) >= 0,
+            "positions_count": portfolio_summary["positions_count"],
+            "top_holdings": [
+                [holding["symbol"], quantize(holding["percentage"], 1.0), quantize(holding["gain_loss_percent"], 1.0)]
+                for holding in portfolio_summary["top_holdings"]
+            ],
+            "risk_score": quantize(metrics.get("risk_score"), 0.1),
+            "diversification_score": quantize(metrics.get("diversification_score"), 1.0),
+            "volatility": quantize(metrics.get("volatility"), 0.01),
+            "beta": quantize(metrics.get("beta"), 0.05)
+        }
+    
     def _extract_recommendations(self, analysis: str) -> List[str]:
         """Extract specific recommendations from analysis"""
         # Simple extraction - in production, use more sophisticated NLP
@@ -253,73 +449,31 @@ class AIService:
         
         return recommendations[:5]  # Limit to 5 recommendations
     
-    def _calculate_portfolio_risk(self, portfolio_data: Dict[str, Any]) -> float:
-        """Calculate portfolio risk score (0-10)"""
-        # Simplified risk calculation
-        holdings = portfolio_data.get("holdings", [])
-        
-        if not holdings:
-            return 5.0
-        
-        # Factor in diversification
-        diversification_factor = min(len(holdings) / 10, 1.0)  # More holdings = lower risk
-        
-        # Factor in volatility (simplified)
-        volatility_factor = 0.5  # Default moderate volatility
-        
-        # Factor in sector concentration
-        sectors = set(holding.get("asset_type", "stock") for holding in holdings)
-        sector_factor = min(len(sectors) / 5, 1.0)
-        
-        # Calculate risk score (lower is better)
-        risk_score = 10 - (diversification_factor * 3 + sector_factor * 3 + (1 - volatility_factor) * 4)
-        
-        return max(min(risk_score, 10.0), 0.0)
-    
-    def _calculate_diversification(self, portfolio_data: Dict[str, Any]) -> float:
-        """Calculate diversification score (0-100)"""
-        holdings = portfolio_data.get("holdings", [])
-        
-        if not holdings:
-            return 0.0
-        
-        total_value = portfolio_data.get("total_value", 1)
-        
-        # Calculate concentration (Herfindahl index)
-        concentrations = []
-        for holding in holdings:
-            weight = holding["total_value"] / total_value
-            concentrations.append(weight ** 2)
-        
-        herfindahl_index = sum(concentrations)
-        
-        # Convert to diversification score (0-100)
-        # Perfect diversification (equal weights) gives score of 100
-        max_diversification = 1 / len(holdings)
-        diversification_score = (1 - (herfindahl_index - max_diversification) / (1 - max_diversification)) * 100
-        
-        return max(min(diversification_score, 100.0), 0.0)
-    
     async def get_investment_recommendation(self, symbol: str, user_profile: Dict[str, Any]) -> Dict[str, Any]:
         """Get AI investment recommendation for a specific symbol"""
         try:
-            # Get current market data
-            quote = await market_data_service.get_stock_quote(symbol)
+            # Get current market data and recent news concurrently
+            quote, news = await asyncio.gather(
+                self._with_deadline(
+                    "quote", market_data_service.get_stock_quote(symbol), settings.AI_CONTEXT_QUOTE_TIMEOUT_SECONDS
+                ),
+                self._with_deadline(
+                    "news", news_service.get_symbol_news(symbol, days=7), settings.AI_CONTEXT_NEWS_TIMEOUT_SECONDS
+                )
+            )
             
-            # Get recent news
-            news = await news_service.get_symbol_news(symbol, days=7)
+            missing_context = []
+            if quote is None:
+                quote = await market_data_service.get_cached_quote(symbol)
+                if quote is None:
+                    raise ExternalAPIError(f"No quote available for {symbol}")
+                missing_context.append("live_quote")
+            if news is None:
+                missing_context.append("news")
             
             # Prepare context for AI
-            context = {
-                "symbol": symbol,
-                "current_price": quote["price"],
-                "change_percent": quote["change_percent"],
-                "market_cap": quote.get("market_cap"),
-                "pe_ratio": quote.get("pe_ratio"),
-                "recent_news_sentiment": self._analyze_news_sentiment(news),
-                "user_risk_tolerance": user_profile.get("risk_tolerance", "moderate"),
-                "user_experience": user_profile.get("investment_experience", "beginner")
-            }
+            sentiment = self._analyze_news_sentiment(news) if news is not None else "unavailable"
+            context = self._recommendation_context(symbol, quote, sentiment, user_profile, missing_context)
             
             prompt = f"""
             Provide an investment recommendation for {symbol} based on:
@@ -337,41 +491,289 @@ class AIService:
             Provide a clear recommendation (Buy/Hold/Sell) with reasoning.
             """
             
-            response = await openai.ChatCompletion.acreate(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": self._get_system_prompt()},
+            response = await llm_client.complete(
+                [
+                    {"role": "system", "content": self.system_prompt},
                     {"role": "user", "content": prompt}
                 ],
                 max_tokens=self.max_tokens,
-                temperature=0.3
+                temperature=0.3,
+                model=self.model,
+                cache_context=self._recommendation_cache_context(context)
             )
             
-            recommendation_text = response.choices[0].message.content
-            
-            return {
-                "symbol": symbol,
-                "recommendation": self._extract_recommendation_action(recommendation_text),
-                "reasoning": recommendation_text,
-                "confidence": self._calculate_confidence(recommendation_text),
-                "risk_level": self._assess_risk_level(context),
-                "time_horizon": self._suggest_time_horizon(user_profile),
-                "generated_at": datetime.now()
-            }
+            return self._recommendation_result(context, response["content"], user_profile)
         
         except Exception as e:
             logger.error(f"Error getting recommendation for {symbol}: {str(e)}")
             raise ExternalAPIError(f"Failed to generate recommendation for {symbol}")
     
+    async def get_batch_recommendations(self, symbols: List[str], user_profile: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Get AI investment recommendations for many symbols, in input order.
+        
+        Quotes come from one bulk fetch and news sentiment from one query.
+        Symbols are then packed into as few completions as
+        AI_BATCH_TOKEN_BUDGET allows, with at most AI_BATCH_CONCURRENCY in
+        flight. A symbol that can't be scored gets {"symbol", "error"}
+        instead of failing the whole batch.
+        """
+        symbols = list(dict.fromkeys(symbol.strip().upper() for symbol in symbols if symbol.strip()))
+        
+        quotes, sentiment_counts = await asyncio.gather(
+            self._with_deadline(
+                "quote", market_data_service.get_multiple_quotes(symbols), self._batch_quote_deadline(len(symbols))
+            ),
+            self._with_deadline(
+                "news", news_service.get_symbols_sentiment_counts(symbols, days=7),
+                settings.AI_CONTEXT_NEWS_TIMEOUT_SECONDS
+            )
+        )
+        quotes = {quote["symbol"]: quote for quote in quotes or []}
+        
+        results: Dict[str, Dict[str, Any]] = {}
+        contexts = []
+        for symbol in symbols:
+            missing_context = []
+            quote = quotes.get(symbol)
+            if quote is None:
+                quote = await market_data_service.get_cached_quote(symbol)
+                if quote is None:
+                    results[symbol] = {"symbol": symbol, "error": f"No quote available for {symbol}"}
+                    continue
+                missing_context.append("live_quote")
+            
+            if sentiment_counts is None:
+                sentiment = "unavailable"
+                missing_context.append("news")
+            else:
+                counts = sentiment_counts.get(symbol, {})
+                sentiment = self._sentiment_from_counts(counts.get("positive", 0), counts.get("negative", 0))
+            
+            contexts.append(self._recommendation_context(symbol, quote, sentiment, user_profile, missing_context))
+        
+        semaphore = asyncio.Semaphore(settings.AI_BATCH_CONCURRENCY)
+        packed = await asyncio.gather(*(
+            self._recommend_packed(group, user_profile, semaphore)
+            for group in self._pack_recommendation_contexts(contexts, user_profile)
+        ))
+        for group_results in packed:
+            results.update(group_results)
+        
+        return [results[symbol] for symbol in symbols]
+    
+    def _recommendation_context(
+        self,
+        symbol: str,
+        quote: Dict[str, Any],
+        sentiment: str,
+        user_profile: Dict[str, Any],
+        missing_context: List[str]
+    ) -> Dict[str, Any]:
+        """Facts a recommendation prompt is built from"""
+        context = {
+            "symbol": symbol,
+            "current_price": quote["price"],
+            "change_percent": quote["change_percent"],
+            "market_cap": quote.get("market_cap"),
+            "pe_ratio": quote.get("pe_ratio"),
+            "recent_news_sentiment": sentiment,
+            "user_risk_tolerance": user_profile.get("risk_tolerance", "moderate"),
+            "user_experience": user_profile.get("investment_experience", "beginner")
+        }
+        if missing_context:
+            context["missing_data"] = missing_context
+        return context
+    
+    def _recommendation_result(
+        self,
+        context: Dict[str, Any],
+        recommendation_text: str,
+        user_profile: Dict[str, Any],
+        action: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Recommendation response for one symbol"""
+        return {
+            "symbol": context["symbol"],
+            "recommendation": action or self._extract_recommendation_action(recommendation_text),
+            "reasoning": recommendation_text,
+            "confidence": self._calculate_confidence(recommendation_text),
+            "risk_level": self._assess_risk_level(context),
+            "time_horizon": self._suggest_time_horizon(user_profile),
+            "missing_context": context.get("missing_data", []),
+            "generated_at": datetime.now()
+        }
+    
+    def _batch_line(self, context: Dict[str, Any]) -> str:
+        """One symbol's facts in a batch prompt (the user profile is stated once for all)"""
+        return json.dumps({
+            key: value for key, value in context.items()
+            if key not in ("user_risk_tolerance", "user_experience")
+        })
+    
+    def _batch_prompt(self, contexts: List[Dict[str, Any]], user_profile: Dict[str, Any]) -> str:
+        """Prompt asking for one recommendation per symbol as a JSON object"""
+        lines = "\n".join(self._batch_line(context) for context in contexts)
+        symbols = ", ".join(context["symbol"] for context in contexts)
+        
+        return f"""
+            Provide an investment recommendation for each symbol below.
+            
+            User's risk tolerance: {user_profile.get('risk_tolerance', 'moderate')}
+            User's experience level: {user_profile.get('investment_experience', 'beginner')}
+            
+            Current Data (one symbol per line):
+{lines}
+            
+            Symbols: {symbols}
+            
+            Consider valuation, recent performance and news sentiment. Respond
+            with only a JSON object mapping each symbol to
+            {{"recommendation": "buy" | "hold" | "sell", "reasoning": "<two or three sentences>"}}.
+            """
+    
+    def _pack_recommendation_contexts(
+        self,
+        contexts: List[Dict[str, Any]],
+        user_profile: Dict[str, Any]
+    ) -> List[List[Dict[str, Any]]]:
+        """Split contexts into groups whose packed prompt plus replies fit AI_BATCH_TOKEN_BUDGET"""
+        overhead = (
+            self.system_prompt_tokens + REPLY_TOKEN_OVERHEAD
+            + message_tokens({"role": "user", "content": self._batch_prompt([], user_profile)}, self.model)
+        )
+        
+        groups: List[List[Dict[str, Any]]] = []
+        group: List[Dict[str, Any]] = []
+        used = overhead
+        for context in contexts:
+            # Its data line, its name in the symbol list, and its reply
+            cost = (
+                count_tokens(self._batch_line(context), self.model) + count_tokens(context["symbol"], self.model) + 1
+                + settings.AI_BATCH_OUTPUT_TOKENS_PER_SYMBOL
+            )
+            if group and used + cost > settings.AI_BATCH_TOKEN_BUDGET:
+                groups.append(group)
+                group, used = [], overhead
+            group.append(context)
+            used += cost
+        
+        if group:
+            groups.append(group)
+        return groups
+    
+    async def _recommend_packed(
+        self,
+        contexts: List[Dict[str, Any]],
+        user_profile: Dict[str, Any],
+        semaphore: asyncio.Semaphore
+    ) -> Dict[str, Dict[str, Any]]:
+        """Recommendations for a group of symbols from one completion"""
+        symbols = [context["symbol"] for context in contexts]
+        try:
+            async with semaphore:
+                response = await llm_client.complete(
+                    [
+                        {"role": "system", "content": self.system_prompt},
+                        {"role": "user", "content": self._batch_prompt(contexts, user_profile)}
+                    ],
+                    max_tokens=len(contexts) * settings.AI_BATCH_OUTPUT_TOKENS_PER_SYMBOL,
+                    temperature=0.3,
+                    model=self.model,
+                    cache_context={
+                        "kind": "batch_recommendation",
+                        "symbols": [self._recommendation_cache_context(context) for context in contexts]
+                    }
+                )
+        except Exception as e:
+            logger.error(f"Error getting recommendations for {', '.join(symbols)}: {str(e)}")
+            return {symbol: {"symbol": symbol, "error": f"Failed to generate recommendation for {symbol}"} for symbol in symbols}
+        
+        replies = self._parse_batch_response(response["content"], symbols)
+        results = {}
+        for context in contexts:
+            reply = replies.get(context["symbol"])
+            if reply is None:
+                results[context["symbol"]] = {
+                    "symbol": context["symbol"],
+                    "error": f"No recommendation returned for {context['symbol']}"
+                }
+                continue
+            action = reply["recommendation"] if reply["recommendation"] in RECOMMENDATION_ACTIONS else None
+            results[context["symbol"]] = self._recommendation_result(context, reply["reasoning"], user_profile, action)
+        return results
+    
+    def _parse_batch_response(self, text: str, symbols: List[str]) -> Dict[str, Dict[str, str]]:
+        """Per-symbol {"recommendation", "reasoning"} from a batch reply; symbols missing from it are left out"""
+        start, end = text.find("{"), text.rfind("}")
+        try:
+            payload = json.loads(text[start:end + 1]) if start != -1 else {}
+        except ValueError:
+            logger.warning(f"Unparseable batch recommendation reply for {', '.join(symbols)}")
+            return {}
+        if not isinstance(payload, dict):
+            return {}
+        
+        replies = {}
+        for key, value in payload.items():
+            symbol = str(key).strip().upper()
+            if symbol not in symbols:
+                continue
+            if isinstance(value, dict):
+                replies[symbol] = {
+                    "recommendation": str(value.get("recommendation", "")).strip().lower(),
+                    "reasoning": str(value.get("reasoning", ""))
+                }
+            elif isinstance(value, str):
+                replies[symbol] = {"recommendation": "", "reasoning": value}
+        return replies
+    
+    def _recommendation_cache_context(self, context: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Bucketed facts behind a recommendation prompt (response cache key).
+        
+        Prices within 0.5% and daily moves within a quarter point share a
+        response; market cap is left out since it moves with the price.
+        """
+        return {
+            "kind": "recommendation",
+            "symbol": context["symbol"],
+            "price": log_bucket(context["current_price"]),
+            "change_percent": quantize(context["change_percent"], 0.25),
+            "pe_ratio": quantize(context["pe_ratio"], 0.5),
+            "sentiment": context["recent_news_sentiment"],
+            "risk_tolerance": context["user_risk_tolerance"],
+            "experience": context["user_experience"],
+            "missing_data": context.get("missing_data")
+        }
+    
+    def _batch_quote_deadline(self, count: int) -> float:
+        """Deadline for quoting count symbols: AI_BATCH_QUOTE_TIMEOUT_SECONDS per bulk chunk"""
+        chunks = max(-(-count // settings.MARKET_DATA_BATCH_SIZE), 1)
+        return settings.AI_BATCH_QUOTE_TIMEOUT_SECONDS * chunks
+    
+    async def _with_deadline(self, source: str, awaitable: Awaitable[Any], timeout: float) -> Optional[Any]:
+        """Await one context source, returning None if it fails or misses its deadline"""
+        try:
+            return await asyncio.wait_for(awaitable, timeout)
+        except asyncio.TimeoutError:
+            self.context_timeouts[source] = self.context_timeouts.get(source, 0) + 1
+            logger.warning(f"Context source {source} missed its {timeout}s deadline, continuing without it")
+        except Exception as e:
+            self.context_errors[source] = self.context_errors.get(source, 0) + 1
+            logger.warning(f"Context source {source} failed, continuing without it: {str(e)}")
+        return None
+    
     def _analyze_news_sentiment(self, news_articles: List[Dict[str, Any]]) -> str:
         """Analyze overall sentiment from news articles"""
         if not news_articles:
             return "neutral"
         
         sentiments = [article.get("sentiment", "neutral") for article in news_articles]
-        positive_count = sentiments.count("positive")
-        negative_count = sentiments.count("negative")
-        
+        return self._sentiment_from_counts(sentiments.count("positive"), sentiments.count("negative"))
+    
+    def _sentiment_from_counts(self, positive_count: int, negative_count: int) -> str:
+        """Overall sentiment from positive and negative article counts"""
         if positive_count > negative_count:
             return "positive"
         elif negative_count > positive_count:
@@ -393,8 +795,8 @@ class AIService:
     def _assess_risk_level(self, context: Dict[str, Any]) -> str:
         """Assess risk level based on context"""
         # Simplified risk assessment
-        pe_ratio = context.get("pe_ratio", 20)
-        change_percent = abs(context.get("change_percent", 0))
+        pe_ratio = context.get("pe_ratio") or 20
+        change_percent = abs(context.get("change_percent") or 0)
         
         if pe_ratio > 30 or change_percent > 5:
             return "high"
@@ -414,6 +816,14 @@ class AIService:
             return "long-term"
         else:
             return "medium-term"
+    
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """Context sources that timed out or failed, by source"""
+        return {
+            "context_timeouts": dict(self.context_timeouts),
+            "context_errors": dict(self.context_errors)
+        }
 
 
 # Global instance
@@ -0,0 +1,156 @@
+"""
+Persistent advisor chat history with a rolling summary of older turns
+"""
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+import asyncio
+import logging
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import SingleFlight
+from app.core.database import AsyncSessionLocal
+from app.crud import chat as crud_chat
+from app.models.chat import ChatSession
+from app.services.ai_service import ai_service
+from app.services.llm import fit_history, message_tokens
+
+logger = logging.getLogger(__name__)
+
+# ChatMessage.message_type -> chat completion role
+MESSAGE_ROLES = {"user": "user", "ai": "assistant"}
+
+# Compaction keeps this fraction of the history budget verbatim, so a
+# session runs several turns before it needs summarizing again
+COMPACTION_TARGET_RATIO = 0.5
+
+
+class ChatMemory:
+    """
+    Keeps chat sessions within the advisor's token budget.
+    
+    A session is its rolling summary plus the messages after
+    summarized_message_id. Once a reply takes the history past
+    ai_service.history_budget(), the oldest messages are folded into the
+    summary until about half the budget is left, with one LLM call over
+    just those messages, in the background, so a long
+    conversation costs a bounded prompt instead of its full transcript and
+    the summary is never rebuilt from scratch.
+    """
+    
+    def __init__(self):
+        self._compactions = SingleFlight()
+        self._tasks: Set[asyncio.Task] = set()
+        
+        self.compacted = 0
+        self.messages_summarized = 0
+        self.conflicts = 0
+        self.failures = 0
+    
+    async def load(self, db: AsyncSession, session: ChatSession) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+        """Session summary and the unsummarized history (oldest first, with message ids)"""
+        messages = await crud_chat.get_messages_after(db, session.id, session.summarized_message_id)
+        return session.summary, [
+            {"id": msg.id, "role": MESSAGE_ROLES.get(msg.message_type, "user"), "content": msg.content}
+            for msg in messages
+        ]
+    
+    async def record(self, session_id: int, user_message: str, reply: Dict[str, Any]):
+        """Store a user message and the advisor's reply, then compact the session in the background"""
+        async with AsyncSessionLocal() as db:
+            await crud_chat.create_messages(db, session_id, [
+                {"message_type": "user", "content": user_message},
+                {
+                    "message_type": "ai",
+                    "content": reply["message"],
+                    "model_used": reply.get("model"),
+                    "tokens_used": reply.get("tokens_used"),
+                    "confidence_score": str(reply["confidence"]) if reply.get("confidence") is not None else None,
+                    "context_data": reply.get("related_data") or None
+                }
+            ])
+        self.schedule_compaction(session_id)
+    
+    async def record_stream(
+        self,
+        session_id: int,
+        user_message: str,
+        events: AsyncIterator[Tuple[str, Dict[str, Any]]]
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Pass stream_chat_with_advisor events through, recording the exchange once it's done"""
+        async for event, data in events:
+            if event == "done":
+                try:
+                    await self.record(session_id, user_message, data)
+                except Exception as e:
+                    logger.error(f"Error saving chat session {session_id}: {str(e)}")
+            yield event, data
+    
+    def schedule_compaction(self, session_id: int):
+        """Compact a session in the background (joins a compaction already running for it)"""
+        task = asyncio.create_task(self._compactions.do(str(session_id), lambda: self.compact(session_id)))
+        self._tasks.add(task)
+        task.add_done_callback(self._compaction_done)
+    
+    def _compaction_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.failures += 1
+            logger.warning(f"Chat history compaction failed: {str(task.exception())}")
+    
+    async def compact(self, session_id: int) -> bool:
+        """
+        If the unsummarized history exceeds the history budget, fold its
+        oldest messages into the session summary so that about
+        COMPACTION_TARGET_RATIO of the budget remains. Returns whether a new
+        summary was stored.
+        """
+        async with AsyncSessionLocal() as db:
+            session = await crud_chat.get_session(db, session_id)
+            if session is None:
+                return False
+            summary, history = await self.load(db, session)
+            expected_message_id = session.summarized_message_id
+        
+        budget = ai_service.history_budget()
+        if sum(message_tokens(message, ai_service.model) for message in history) <= budget:
+            return False
+        
+        older, _ = fit_history(history, int(budget * COMPACTION_TARGET_RATIO), ai_service.model)
+        if not older:
+            return False
+        
+        new_summary = await ai_service.summarize_history(summary, older)
+        async with AsyncSessionLocal() as db:
+            stored = await crud_chat.update_session_summary(
+                db, session_id, new_summary, older[-1]["id"], expected_message_id
+            )
+        
+        if not stored:
+            # Another worker summarized the session first
+            self.conflicts += 1
+            return False
+        
+        self.compacted += 1
+        self.messages_summarized += len(older)
+        return True
+    
+    async def close(self):
+        """Cancel compactions still running"""
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+    
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """Compaction counters"""
+        return {
+            "compacted": self.compacted,
+            "messages_summarized": self.messages_summarized,
+            "conflicts": self.conflicts,
+            "failures": self.failures,
+            "in_flight": len(self._tasks)
+        }
+
+
+# Global instance
+chat_memory = ChatMemory()
\ No newline at end of file
@@ -0,0 +1,147 @@
+"""
+Binary encodings for historical OHLCV data (Arrow IPC, Parquet, packed float32)
+"""
+from typing import Dict, Optional
+import io
+import struct
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+PACKED_F32_MEDIA_TYPE = "application/x-ohlcv-f32"
+
+# format query parameter -> media type
+FORMAT_MEDIA_TYPES = {
+    "arrow": ARROW_MEDIA_TYPE,
+    "parquet": PARQUET_MEDIA_TYPE,
+    "f32": PACKED_F32_MEDIA_TYPE
+}
+
+MEDIA_TYPE_ALIASES = {
+    "application/x-parquet": PARQUET_MEDIA_TYPE,
+    "application/vnd.apache.arrow.file": ARROW_MEDIA_TYPE
+}
+
+# Accept entries that cover JSON, most specific first
+JSON_MEDIA_RANGES = ("application/json", "application/*", "*/*")
+
+PACKED_MAGIC = b"OHLC"
+PACKED_VERSION = 2  # 2: volume as uint64 (was float32)
+PACKED_HEADER = struct.Struct("<4sII")  # magic, version, row count
+
+
+def _parse_accept(accept: str) -> Dict[str, float]:
+    """Accept header -> {media type: q}, keeping the first q given for a type"""
+    qualities = {}
+    for part in accept.split(","):
+        media_type, *params = [piece.strip() for piece in part.split(";")]
+        media_type = media_type.lower()
+        if not media_type:
+            continue
+        media_type = MEDIA_TYPE_ALIASES.get(media_type, media_type)
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = min(max(float(value), 0.0), 1.0)
+                except ValueError:
+                    quality = 0.0
+        qualities.setdefault(media_type, quality)
+    return qualities
+
+
+def negotiate_media_type(accept: Optional[str]) -> Optional[str]:
+    """
+    Pick a binary media type from an Accept header, or None for JSON.
+    
+    Every acceptable type is ranked by q. JSON takes the q of
+    application/json, else of application/* or */* (so "*/*" alone means
+    JSON at q=1); a header that covers JSON with none of them only gets it
+    as the fallback. A binary type is returned only when it strictly
+    outranks JSON, with ties between binary types going to the first listed.
+    """
+    if not accept:
+        return None
+    
+    qualities = _parse_accept(accept)
+    binary = [
+        (-quality, position, media_type)
+        for position, (media_type, quality) in enumerate(qualities.items())
+        if media_type in FORMAT_MEDIA_TYPES.values() and quality > 0
+    ]
+    if not binary:
+        return None
+    
+    json_quality = next(
+        (qualities[media_type] for media_type in JSON_MEDIA_RANGES if media_type in qualities),
+        0.0
+    )
+    best_quality, _, best = min(binary)
+    return best if -best_quality > json_quality else None
+
+
+def to_arrow_table(hist: pd.DataFrame) -> pa.Table:
+    """Build an Arrow table straight from the history frame's columns"""
+    return pa.table({
+        "date": pa.array(hist.index),
+        "open": hist["Open"].to_numpy(),
+        "high": hist["High"].to_numpy(),
+        "low": hist["Low"].to_numpy(),
+        "close": hist["Close"].to_numpy(),
+        "volume": hist["Volume"].to_numpy()
+    })
+
+
+def encode_arrow(hist: pd.DataFrame) -> bytes:
+    """Encode history as an Arrow IPC stream"""
+    table = to_arrow_table(hist)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode_parquet(hist: pd.DataFrame) -> bytes:
+    """Encode history as a Parquet file"""
+    buffer = io.BytesIO()
+    pq.write_table(to_arrow_table(hist), buffer, compression="zstd")
+    return buffer.getvalue()
+
+
+def encode_packed_f32(hist: pd.DataFrame) -> bytes:
+    """
+    Encode history in the packed little-endian layout:
+        
+        header  "OHLC", uint32 version, uint32 row count
+        int64   bar start times, milliseconds since epoch (UTC)
+        float32 open, high, low, close (one array each)
+        uint64  volume (float32 loses whole shares above 2**24)
+    """
+    timestamps = hist.index.tz_convert("UTC") if hist.index.tz is not None else hist.index
+    millis = timestamps.as_unit("ms").asi8.astype("<i8")
+    prices = hist[["Open", "High", "Low", "Close"]].to_numpy(dtype="<f4")
+    volume = np.clip(np.nan_to_num(hist["Volume"].to_numpy(dtype="f8")), 0, None).round().astype("<u8")
+    
+    return b"".join([
+        PACKED_HEADER.pack(PACKED_MAGIC, PACKED_VERSION, len(hist)),
+        millis.tobytes(),
+        np.ascontiguousarray(prices.T).tobytes(),
+        volume.tobytes()
+    ])
+
+
+ENCODERS = {
+    ARROW_MEDIA_TYPE: encode_arrow,
+    PARQUET_MEDIA_TYPE: encode_parquet,
+    PACKED_F32_MEDIA_TYPE: encode_packed_f32
+}
+
+
+def encode_history(hist: pd.DataFrame, media_type: str) -> bytes:
+    """Encode history for one of the supported binary media types"""
+    return ENCODERS[media_type](hist)
@@ -0,0 +1,63 @@
+"""
+Listing universe (symbol, name, exchange) loaded from a local CSV or SQLite file
+"""
+from typing import Any, Dict, List
+import csv
+import logging
+import os
+import sqlite3
+
+logger = logging.getLogger(__name__)
+
+# Used when no listing file is configured
+BUILTIN_LISTINGS = [
+    {'symbol': 'AAPL', 'name': 'Apple Inc.', 'exchange': 'NASDAQ'},
+    {'symbol': 'MSFT', 'name': 'Microsoft Corporation', 'exchange': 'NASDAQ'},
+    {'symbol': 'GOOGL', 'name': 'Alphabet Inc.', 'exchange': 'NASDAQ'},
+    {'symbol': 'AMZN', 'name': 'Amazon.com Inc.', 'exchange': 'NASDAQ'},
+    {'symbol': 'TSLA', 'name': 'Tesla Inc.', 'exchange': 'NASDAQ'},
+    {'symbol': 'NVDA', 'name': 'NVIDIA Corporation', 'exchange': 'NASDAQ'},
+    {'symbol': 'META', 'name': 'Meta Platforms Inc.', 'exchange': 'NASDAQ'},
+    {'symbol': 'NFLX', 'name': 'Netflix Inc.', 'exchange': 'NASDAQ'}
+]
+
+SQLITE_SUFFIXES = ('.db', '.sqlite', '.sqlite3')
+
+
+def load_listings(path: str) -> List[Dict[str, Any]]:
+    """
+    Read listings from path.
+    
+    CSV files need 'symbol' and 'name' header columns and may have
+    'exchange'. SQLite files (.db/.sqlite) need a 'listings' table with the
+    same columns. Raises FileNotFoundError if path does not exist.
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    
+    if path.endswith(SQLITE_SUFFIXES):
+        with sqlite3.connect(f"file:{path}?mode=ro", uri=True) as conn:
+            conn.row_factory = sqlite3.Row
+            rows = [dict(row) for row in conn.execute("SELECT * FROM listings")]
+    else:
+        with open(path, newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+    
+    return [
+        {
+            'symbol': row['symbol'].strip().upper(),
+            'name': row['name'].strip(),
+            'exchange': (row.get('exchange') or '').strip() or None
+        }
+        for row in rows
+        if row.get('symbol') and row.get('name')
+    ]
+
+
+def load_listings_or_builtin(path: str) -> List[Dict[str, Any]]:
+    """Load listings from path, falling back to BUILTIN_LISTINGS if it is missing"""
+    try:
+        return load_listings(path)
+    except FileNotFoundError:
+        logger.warning(f"Listing file {path} not found, using built-in listings only")
+        return list(BUILTIN_LISTINGS)
\ No newline at end of file
@@ -0,0 +1,425 @@
+"""
+Chat completion client with a prompt-keyed response cache and a local stub
+backend
+"""
+from functools import lru_cache
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import re
+import time
+
+import openai
+
+from app.core.cache import SingleFlight, TieredCache, create_redis_client
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Chat format overhead: tokens per message, plus the reply's priming
+MESSAGE_TOKEN_OVERHEAD = 4
+REPLY_TOKEN_OVERHEAD = 3
+
+STUB_ACTIONS = ['Buy', 'Hold', 'Sell']
+
+DISCLAIMER = (
+    "This is educational information only. Please consult with qualified "
+    "financial advisors before making investment decisions."
+)
+
+
+def quantize(value: Optional[float], step: float) -> Optional[float]:
+    """Round value to a multiple of step (None stays None)"""
+    if value is None:
+        return None
+    return round(round(value / step) * step, 10)
+
+
+def log_bucket(value: Optional[float], tolerance: float = 0.005) -> Optional[int]:
+    """Bucket a positive value so values within about tolerance (relative) share a bucket"""
+    if value is None or value <= 0:
+        return None
+    return round(math.log(value) / math.log1p(tolerance))
+
+
+def _normalize_text(text: str) -> str:
+    return ' '.join(text.split())
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for English text (about four characters per token)"""
+    return max(1, len(text) // 4)
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    """tiktoken encoding for model, or None when tiktoken is not installed"""
+    try:
+        import tiktoken
+    except ImportError:
+        logger.warning("tiktoken not installed, estimating token counts from text length")
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Token count of text for model (tiktoken when available, else estimate_tokens)"""
+    encoding = _encoding(model or settings.DEFAULT_AI_MODEL)
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def message_tokens(message: Dict[str, str], model: Optional[str] = None) -> int:
+    """Tokens one chat message takes in a request, format overhead included"""
+    return count_tokens(message['content'], model) + MESSAGE_TOKEN_OVERHEAD
+
+
+def fit_history(
+    history: List[Dict[str, str]],
+    budget: int,
+    model: Optional[str] = None
+) -> Tuple[List[Dict[str, str]], List[Dict[str, str]]]:
+    """
+    Split history (oldest first) into (older, recent).
+    
+    recent is the longest run of latest messages whose tokens fit budget;
+    older is everything before it.
+    """
+    used = 0
+    start = len(history)
+    for index in range(len(history) - 1, -1, -1):
+        used += message_tokens(history[index], model)
+        if used > budget:
+            break
+        start = index
+    return history[:start], history[start:]
+
+
+def _usage_tokens(messages: List[Dict[str, str]], content: str, model: Optional[str] = None) -> int:
+    """Prompt plus completion tokens, counted locally for streams (which report no usage) and the stub"""
+    prompt = sum(message_tokens(message, model) for message in messages) + REPLY_TOKEN_OVERHEAD
+    return prompt + count_tokens(content, model)
+
+
+def prompt_key(
+    messages: List[Dict[str, str]],
+    model: str,
+    max_tokens: int,
+    temperature: float,
+    context: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    Cache key for a completion request.
+    
+    Without context the key covers the whitespace-normalized messages. With
+    context it covers that dict instead: callers pass the facts the prompt
+    was built from, bucketed, so requests that differ only by a few cents
+    in price share a response.
+    """
+    if context is not None:
+        payload: Dict[str, Any] = {'context': context}
+    else:
+        payload = {'messages': [[message['role'], _normalize_text(message['content'])] for message in messages]}
+    payload.update(model=model, max_tokens=max_tokens, temperature=temperature)
+    
+    encoded = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class StubLLM:
+    """Deterministic local stand-in for the chat completion API (tests, benchmarks, offline development)"""
+    
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+    
+    async def complete(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float
+    ) -> Dict[str, Any]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        
+        content = self._respond(messages)
+        return {'content': content, 'tokens_used': _usage_tokens(messages, content, model)}
+    
+    async def stream(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float
+    ) -> AsyncIterator[str]:
+        """Yield the response word by word, spreading the latency across words"""
+        words = self._respond(messages).split(' ')
+        for index, word in enumerate(words):
+            if self.latency:
+                await asyncio.sleep(self.latency / len(words))
+            yield word if index == 0 else ' ' + word
+    
+    def _respond(self, messages: List[Dict[str, str]]) -> str:
+        prompt = messages[-1]['content'] if messages else ''
+        digest = hashlib.sha256(prompt.encode('utf-8')).digest()
+        
+        # Batch prompts list their symbols and expect a JSON object back
+        batch = re.search(r"^\s*Symbols: (.+)$", prompt, re.MULTILINE)
+        if batch:
+            return json.dumps({
+                symbol: {
+                    'recommendation': STUB_ACTIONS[(digest[0] + index) % len(STUB_ACTIONS)].lower(),
+                    'reasoning': f"Stub reasoning for {symbol}. {DISCLAIMER}"
+                }
+                for index, symbol in enumerate(batch.group(1).split(', '))
+            })
+        
+        return (
+            f"Recommendation: {STUB_ACTIONS[digest[0] % len(STUB_ACTIONS)]}. "
+            "Keep the position sized to your risk tolerance and review diversification "
+            f"across sectors before making changes. {DISCLAIMER}"
+        )
+
+
+class CompletionStream:
+    """
+    Async iterator over a completion's text deltas.
+    
+    content, tokens_used (0 when cached; otherwise counted locally with
+    the model's tokenizer, since streams report no usage), cached and
+    time_to_first_token are set as it is consumed.
+    """
+    
+    def __init__(self, produce: Callable[["CompletionStream"], AsyncIterator[str]]):
+        self.content = ''
+        self.tokens_used = 0
+        self.cached = False
+        self.time_to_first_token: Optional[float] = None
+        self._deltas = produce(self)
+    
+    def __aiter__(self) -> AsyncIterator[str]:
+        return self._deltas
+
+
+class LLMClient:
+    """
+    Chat completions behind a response cache.
+    
+    Responses are cached under prompt_key for AI_RESPONSE_CACHE_TTL_SECONDS
+    (by default the quote cache TTL, so an answer never outlives the market
+    data it was based on). Identical requests arriving while a completion is
+    in flight share it. AI_PROVIDER=stub swaps the OpenAI backend for
+    StubLLM.
+    """
+    
+    def __init__(self):
+        self.provider = settings.AI_PROVIDER
+        self.stub = StubLLM(settings.AI_STUB_LATENCY_SECONDS) if self.provider == "stub" else None
+        
+        self.cache: Optional[TieredCache] = None
+        if settings.AI_RESPONSE_CACHE_ENABLED:
+            self.cache = TieredCache(
+                namespace="ai",
+                ttl_seconds=settings.AI_RESPONSE_CACHE_TTL_SECONDS or settings.CACHE_EXPIRY_MINUTES * 60,
+                max_size=settings.AI_RESPONSE_CACHE_MAX_SIZE,
+                redis_client=create_redis_client()
+            )
+        self._inflight = SingleFlight()
+        
+        self.requests = 0
+        self.completions = 0
+        self.tokens_used = 0
+        self.tokens_saved = 0
+        self.streams = 0
+        self.first_token_seconds_total = 0.0
+        self.first_token_seconds_max = 0.0
+    
+    async def complete(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        model: Optional[str] = None,
+        cache_context: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Return {'content', 'tokens_used', 'cached'} for a chat completion.
+        
+        tokens_used is what this call spent (0 when served from cache).
+        cache_context is passed to prompt_key.
+        """
+        model = model or settings.DEFAULT_AI_MODEL
+        self.requests += 1
+        
+        if self.cache is None:
+            result = await self._complete(model, messages, max_tokens, temperature)
+            return {**result, 'cached': False}
+        
+        key = prompt_key(messages, model, max_tokens, temperature, cache_context)
+        cached = await self.cache.get(key)
+        if cached is not None:
+            self.tokens_saved += cached['tokens_used']
+            return {'content': cached['content'], 'tokens_used': 0, 'cached': True}
+        
+        result = await self._inflight.do(
+            key, lambda: self._complete_and_cache(key, model, messages, max_tokens, temperature)
+        )
+        return {**result, 'cached': False}
+    
+    def stream(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        model: Optional[str] = None,
+        cache_context: Optional[Dict[str, Any]] = None
+    ) -> CompletionStream:
+        """
+        Stream a chat completion as text deltas.
+        
+        A cached response arrives as one delta. A stream that runs to the end
+        is cached like complete() would; one abandoned midway is not.
+        """
+        return CompletionStream(lambda stream: self._stream_deltas(
+            stream, model or settings.DEFAULT_AI_MODEL, messages, max_tokens, temperature, cache_context
+        ))
+    
+    async def _stream_deltas(
+        self,
+        stream: CompletionStream,
+        model: str,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        cache_context: Optional[Dict[str, Any]]
+    ) -> AsyncIterator[str]:
+        self.requests += 1
+        started = time.perf_counter()
+        
+        key = None
+        if self.cache is not None:
+            key = prompt_key(messages, model, max_tokens, temperature, cache_context)
+            cached = await self.cache.get(key)
+            if cached is not None:
+                self.tokens_saved += cached['tokens_used']
+                stream.cached = True
+                stream.content = cached['content']
+                self._record_first_token(stream, time.perf_counter() - started)
+                yield cached['content']
+                return
+        
+        if self.stub is not None:
+            deltas = self.stub.stream(model, messages, max_tokens, temperature)
+        else:
+            deltas = self._openai_stream(model, messages, max_tokens, temperature)
+        
+        parts = []
+        async for delta in deltas:
+            if not parts:
+                self._record_first_token(stream, time.perf_counter() - started)
+            parts.append(delta)
+            yield delta
+        
+        content = ''.join(parts)
+        result = {'content': content, 'tokens_used': _usage_tokens(messages, content, model)}
+        stream.content = result['content']
+        stream.tokens_used = result['tokens_used']
+        self.completions += 1
+        self.tokens_used += result['tokens_used']
+        if key is not None:
+            await self.cache.set(key, result)
+    
+    async def _openai_stream(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float
+    ) -> AsyncIterator[str]:
+        response = await openai.ChatCompletion.acreate(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            stream=True
+        )
+        async for chunk in response:
+            delta = chunk.choices[0].delta.get('content')
+            if delta:
+                yield delta
+    
+    def _record_first_token(self, stream: CompletionStream, seconds: float):
+        stream.time_to_first_token = seconds
+        self.streams += 1
+        self.first_token_seconds_total += seconds
+        self.first_token_seconds_max = max(self.first_token_seconds_max, seconds)
+    
+    async def _complete_and_cache(
+        self,
+        key: str,
+        model: str,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float
+    ) -> Dict[str, Any]:
+        result = await self._complete(model, messages, max_tokens, temperature)
+        await self.cache.set(key, result)
+        return result
+    
+    async def _complete(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float
+    ) -> Dict[str, Any]:
+        """Call the backend, uncached"""
+        if self.stub is not None:
+            result = await self.stub.complete(model, messages, max_tokens, temperature)
+        else:
+            response = await openai.ChatCompletion.acreate(
+                model=model,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature
+            )
+            result = {
+                'content': response.choices[0].message.content,
+                'tokens_used': response.usage.total_tokens
+            }
+        
+        self.completions += 1
+        self.tokens_used += result['tokens_used']
+        return result
+    
+    async def close(self):
+        """Close the cache's shared tier connection"""
+        if self.cache is not None:
+            await self.cache.close()
+    
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """Completion, token and cache counters"""
+        return {
+            "provider": self.provider,
+            "requests": self.requests,
+            "completions": self.completions,
+            "tokens_used": self.tokens_used,
+            "tokens_saved": self.tokens_saved,
+            "streams": self.streams,
+            "avg_time_to_first_token_ms": self.first_token_seconds_total / self.streams * 1000 if self.streams else 0.0,
+            "max_time_to_first_token_ms": self.first_token_seconds_max * 1000,
+            "cache": self.cache.stats if self.cache is not None else None,
+            "coalescing": self._inflight.stats
+        }
+
+
+# Global instance
+llm_client = LLMClient()
\ No newline at end of file
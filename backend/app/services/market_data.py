@@ -2,141 +2,467 @@
 Market data service for fetching real-time and historical data
 """
 import yfinance as yf
+import pandas as pd
+import numpy as np
 import asyncio
-import aiohttp
-from typing import List, Dict, Optional, Any
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, List, Dict, Optional, Any
 from datetime import datetime, timedelta
+import json
 import logging
+import time
 
+from app.core.cache import SingleFlight, TieredCache, create_redis_client
 from app.core.config import settings
 from app.core.exceptions import ExternalAPIError
+from app.services.ohlcv_store import BAR_COUNT_PERIODS, SUPPORTED_PERIODS, OHLCVStore, period_start
+from app.services.symbol_search import symbol_index
 
 logger = logging.getLogger(__name__)
 
 
+def _encode_quote(quote: Dict[str, Any]) -> str:
+    """Serialize a quote dict for the shared cache tier"""
+    return json.dumps({**quote, 'last_updated': quote['last_updated'].isoformat()})
+
+
+def _decode_quote(raw: str) -> Dict[str, Any]:
+    """Deserialize a quote dict from the shared cache tier"""
+    quote = json.loads(raw)
+    quote['last_updated'] = datetime.fromisoformat(quote['last_updated'])
+    return quote
+
+
+# Symbols the market overview endpoints always show
+INDEX_SYMBOLS = ['^GSPC', '^IXIC', '^DJI', '^RUT']  # S&P 500, NASDAQ, DOW, Russell 2000
+TRENDING_SYMBOLS = ['AAPL', 'MSFT', 'GOOGL', 'AMZN', 'TSLA', 'NVDA', 'META', 'NFLX']
+CRYPTO_SYMBOLS = ['BTC-USD', 'ETH-USD', 'ADA-USD', 'DOT-USD', 'LINK-USD']
+
+# Sector ETFs as proxies for sector performance
+SECTOR_ETFS = {
+    'XLK': 'Technology',
+    'XLF': 'Financial',
+    'XLV': 'Healthcare',
+    'XLE': 'Energy',
+    'XLI': 'Industrial',
+    'XLY': 'Consumer Discretionary',
+    'XLP': 'Consumer Staples',
+    'XLU': 'Utilities',
+    'XLB': 'Materials',
+    'XLRE': 'Real Estate',
+    'XLC': 'Communication Services'
+}
+
+# Response field name -> yfinance history column
+HISTORY_FIELDS = {
+    'open': 'Open',
+    'high': 'High',
+    'low': 'Low',
+    'close': 'Close',
+    'volume': 'Volume'
+}
+
+
+def _isoformat_index(index: pd.DatetimeIndex) -> np.ndarray:
+    """Vectorized equivalent of [ts.isoformat() for ts in index]"""
+    if index.tz is None:
+        return np.datetime_as_string(index.values, unit='s')
+    
+    local = index.tz_localize(None)
+    utc = index.tz_convert('UTC').tz_localize(None)
+    text = np.datetime_as_string(local.values, unit='s')
+    
+    # UTC offsets only take a handful of values (DST), so format each once
+    offsets = ((local - utc).total_seconds() // 60).astype(int)
+    unique_offsets, inverse = np.unique(offsets, return_inverse=True)
+    suffixes = np.array([
+        f"{'+' if minutes >= 0 else '-'}{abs(minutes) // 60:02d}:{abs(minutes) % 60:02d}"
+        for minutes in unique_offsets
+    ])
+    return np.char.add(text, suffixes[inverse])
+
+
+def history_to_columns(hist: pd.DataFrame) -> Dict[str, List[Any]]:
+    """Convert a history frame to {dates: [...], open: [...], ...}"""
+    columns = {'dates': _isoformat_index(hist.index).tolist()}
+    for field, column in HISTORY_FIELDS.items():
+        columns[field] = hist[column].tolist()
+    return columns
+
+
+def history_to_records(hist: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Convert a history frame to [{date, open, high, low, close, volume}, ...]"""
+    columns = history_to_columns(hist)
+    keys = ('date',) + tuple(HISTORY_FIELDS)
+    return [dict(zip(keys, row)) for row in zip(*columns.values())]
+
+
 class MarketDataService:
     """Service for fetching market data from various sources"""
     
     def __init__(self):
         self.alpha_vantage_key = settings.ALPHA_VANTAGE_API_KEY
         self.finnhub_key = settings.FINNHUB_API_KEY
+        self.timeout = settings.MARKET_DATA_TIMEOUT_SECONDS
+        
+        # yfinance is synchronous, so all upstream calls run on this pool
+        # instead of blocking the event loop
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.MARKET_DATA_MAX_WORKERS,
+            thread_name_prefix="market-data"
+        )
+        
+        self.quote_cache = TieredCache(
+            namespace="quote",
+            ttl_seconds=settings.CACHE_EXPIRY_MINUTES * 60,
+            stale_seconds=settings.QUOTE_CACHE_STALE_SECONDS,
+            max_size=settings.QUOTE_CACHE_MAX_SIZE,
+            redis_client=create_redis_client(),
+            encode=_encode_quote,
+            decode=_decode_quote
+        )
+        
+        # Concurrent requests for the same symbol/period share one upstream call
+        self._inflight = SingleFlight()
+        
+        # Historical bars are kept locally; only missing ranges hit Yahoo
+        self.ohlcv_store = OHLCVStore(settings.OHLCV_STORE_PATH)
+        self.history_refresh_seconds = settings.CACHE_EXPIRY_MINUTES * 60
     
-    async def get_stock_quote(self, symbol: str) -> Dict[str, Any]:
-        """Get real-time stock quote"""
-        try:
-            # Use yfinance for quick quotes
-            ticker = yf.Ticker(symbol)
-            info = ticker.info
+    async def _run_blocking(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking call on the market data executor with a timeout"""
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+        return await asyncio.wait_for(future, timeout=self.timeout)
+    
+    async def shutdown(self):
+        """Release executor threads and cache connections"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        await self.quote_cache.close()
+    
+    def _fetch_quote(self, symbol: str) -> Dict[str, Any]:
+        """Fetch a quote from yfinance (blocking)"""
+        info = yf.Ticker(symbol).info
+        
+        return {
+            'symbol': symbol,
+            'name': info.get('longName', symbol),
+            'price': info.get('currentPrice', 0),
+            'change': info.get('regularMarketChange', 0),
+            'change_percent': info.get('regularMarketChangePercent', 0),
+            'volume': info.get('volume', 0),
+            'market_cap': info.get('marketCap'),
+            'pe_ratio': info.get('trailingPE'),
+            'dividend_yield': info.get('dividendYield'),
+            'fifty_two_week_high': info.get('fiftyTwoWeekHigh'),
+            'fifty_two_week_low': info.get('fiftyTwoWeekLow'),
+            'fundamentals_at': time.time(),
+            'last_updated': datetime.now()
+        }
+    
+    def _fetch_quotes_batch(
+        self,
+        symbols: List[str],
+        previous: Dict[str, Dict[str, Any]]
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Fetch quotes for many symbols in one bulk download (blocking).
+        
+        The bulk endpoint only returns OHLCV bars, so descriptive fields
+        (name, market cap, ratios) and their fundamentals_at stamp are
+        carried over from previous quotes when available. Symbols without
+        data are left out of the result.
+        """
+        data = yf.download(
+            symbols,
+            period="5d",
+            interval="1d",
+            group_by="ticker",
+            auto_adjust=False,
+            threads=False,
+            progress=False
+        )
+        
+        quotes = {}
+        if data.empty:
+            return quotes
+        
+        for symbol in symbols:
+            if isinstance(data.columns, pd.MultiIndex):
+                if symbol not in data.columns.get_level_values(0):
+                    continue
+                frame = data[symbol]
+            else:
+                frame = data
             
-            return {
+            bars = frame.dropna(subset=['Close'])
+            if bars.empty:
+                continue
+            
+            price = float(bars['Close'].iloc[-1])
+            volume = bars['Volume'].iloc[-1]
+            previous_close = float(bars['Close'].iloc[-2]) if len(bars) > 1 else price
+            change = price - previous_close
+            prior = previous.get(symbol, {})
+            
+            quotes[symbol] = {
                 'symbol': symbol,
-                'name': info.get('longName', symbol),
-                'price': info.get('currentPrice', 0),
-                'change': info.get('regularMarketChange', 0),
-                'change_percent': info.get('regularMarketChangePercent', 0),
-                'volume': info.get('volume', 0),
-                'market_cap': info.get('marketCap'),
-                'pe_ratio': info.get('trailingPE'),
-                'dividend_yield': info.get('dividendYield'),
-                'fifty_two_week_high': info.get('fiftyTwoWeekHigh'),
-                'fifty_two_week_low': info.get('fiftyTwoWeekLow'),
+                'name': prior.get('name', symbol),
+                'price': price,
+                'change': change,
+                'change_percent': (change / previous_close * 100) if previous_close else 0,
+                'volume': int(volume) if pd.notna(volume) else 0,
+                'market_cap': prior.get('market_cap'),
+                'pe_ratio': prior.get('pe_ratio'),
+                'dividend_yield': prior.get('dividend_yield'),
+                'fifty_two_week_high': prior.get('fifty_two_week_high'),
+                'fifty_two_week_low': prior.get('fifty_two_week_low'),
+                'fundamentals_at': prior.get('fundamentals_at'),
                 'last_updated': datetime.now()
             }
+        
+        return quotes
+    
+    def _fetch_history(self, symbol: str, period: str):
+        """Fetch price history from yfinance (blocking)"""
+        return yf.Ticker(symbol).history(period=period)
+    
+    def _load_history(self, symbol: str, period: str) -> pd.DataFrame:
+        """Serve price history from the local store, fetching only what it lacks (blocking)"""
+        if period not in SUPPORTED_PERIODS:
+            return self._fetch_history(symbol, period)
+        
+        store = self.ohlcv_store
+        with store.lock(symbol):
+            if not store.covers(symbol, period):
+                hist = self._fetch_history(symbol, period)
+                if hist.empty:
+                    return hist
+                start = hist.index[0] if period in BAR_COUNT_PERIODS else period_start(period)
+                store.store_range(symbol, hist, start)
+            elif not store.is_fresh(symbol, self.history_refresh_seconds):
+                self._refresh_history_tail(symbol)
+            
+            return store.read(symbol, period)
+    
+    def _refresh_history_tail(self, symbol: str):
+        """Append bars since the last stored one (blocking)"""
+        store = self.ohlcv_store
+        last = store.last_timestamp(symbol)
+        tail = yf.Ticker(symbol).history(start=last.strftime('%Y-%m-%d'), actions=True)
+        
+        if tail.empty:
+            store.touch(symbol)
+            return
+        
+        # Prices are split/dividend adjusted, so a new corporate action
+        # invalidates every stored bar: re-download the covered range
+        actions = tail.loc[tail.index > last].reindex(columns=['Dividends', 'Stock Splits']).fillna(0)
+        if (actions != 0).any().any():
+            covers_from = store.read_meta(symbol)['covers_from']
+            if covers_from is None:
+                store.replace(symbol, yf.Ticker(symbol).history(period='max'), None)
+            else:
+                start = pd.Timestamp(covers_from, tz='UTC')
+                store.replace(symbol, yf.Ticker(symbol).history(start=start.strftime('%Y-%m-%d')), start)
+            return
+        
+        store.append_tail(symbol, tail)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get service cache counters"""
+        return {
+            'quote_cache': self.quote_cache.stats,
+            'coalescing': self._inflight.stats
+        }
+    
+    async def get_stock_quote(self, symbol: str) -> Dict[str, Any]:
+        """Get real-time stock quote (served from cache when fresh)"""
+        quote = await self.quote_cache.get(symbol, lambda: self._fetch_stock_quote_shared(symbol))
+        if quote is not None:
+            return quote
+        return await self._fetch_stock_quote_shared(symbol)
+    
+    async def get_cached_quote(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """Last cached quote for symbol whatever its age, or None"""
+        entry = await self.quote_cache.get_entry(symbol)
+        return entry[0] if entry is not None else None
+    
+    async def _fetch_stock_quote_shared(self, symbol: str) -> Dict[str, Any]:
+        """
+        Fetch a quote from upstream and cache it, sharing the call with
+        concurrent callers.
+        
+        The cache write is part of the shared call, so a fetch whose callers
+        all gave up (e.g. on a deadline) still lands in the cache.
+        """
+        return await self._inflight.do(
+            f"quote:{symbol}", lambda: self._fetch_and_cache_quote(symbol)
+        )
+    
+    async def _fetch_stock_quote(self, symbol: str) -> Dict[str, Any]:
+        """Fetch a quote from upstream, bypassing the cache"""
+        try:
+            return await self._run_blocking(self._fetch_quote, symbol)
+        except asyncio.TimeoutError:
+            logger.error(f"Timed out fetching quote for {symbol}")
+            raise ExternalAPIError(f"Timed out fetching quote for {symbol}")
         except Exception as e:
             logger.error(f"Error fetching quote for {symbol}: {str(e)}")
             raise ExternalAPIError(f"Failed to fetch quote for {symbol}")
     
     async def get_multiple_quotes(self, symbols: List[str]) -> List[Dict[str, Any]]:
         """Get quotes for multiple symbols"""
-        tasks = [self.get_stock_quote(symbol) for symbol in symbols]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        symbols = list(dict.fromkeys(symbols))  # Dedupe, keep order
+        
+        # One cache round trip; stale quotes revalidate together in bulk chunks
+        found = await self.quote_cache.get_many(symbols, self._fetch_quotes)
+        missing = [symbol for symbol in symbols if symbol not in found]
+        
+        if missing:
+            found.update(await self._fetch_quotes(missing))
+        
+        return [found[symbol] for symbol in symbols if symbol in found]
+    
+    async def refresh_quotes(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Fetch fresh quotes for symbols whatever their cache state, and cache them"""
+        return await self._fetch_quotes(list(dict.fromkeys(symbols)))
+    
+    async def _fetch_quotes(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Fetch quotes from upstream in bulk chunks, falling back per symbol"""
+        found: Dict[str, Dict[str, Any]] = {}
+        
+        batch_size = settings.MARKET_DATA_BATCH_SIZE
+        chunks = [symbols[i:i + batch_size] for i in range(0, len(symbols), batch_size)]
+        results = await asyncio.gather(
+            *[self._fetch_quotes_chunk(chunk) for chunk in chunks],
+            return_exceptions=True
+        )
+        for chunk, result in zip(chunks, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Batch quote fetch failed for {len(chunk)} symbols: {str(result)}")
+                continue
+            found.update(result)
         
-        quotes = []
-        for i, result in enumerate(results):
+        # Anything the bulk download couldn't price goes through the per-symbol path
+        leftovers = [symbol for symbol in symbols if symbol not in found]
+        results = await asyncio.gather(
+            *[self._fetch_stock_quote_shared(symbol) for symbol in leftovers],
+            return_exceptions=True
+        )
+        for symbol, result in zip(leftovers, results):
             if isinstance(result, Exception):
-                logger.error(f"Error fetching quote for {symbols[i]}: {str(result)}")
+                logger.error(f"Error fetching quote for {symbol}: {str(result)}")
                 continue
-            quotes.append(result)
+            found[symbol] = result
+        
+        return found
+    
+    async def _fetch_and_cache_quote(self, symbol: str) -> Dict[str, Any]:
+        """Fetch one quote from upstream and store it in the cache"""
+        quote = await self._fetch_stock_quote(symbol)
+        await self.quote_cache.set(symbol, quote)
+        return quote
+    
+    async def _fetch_quotes_chunk(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Bulk-fetch one chunk of symbols, sharing the call with concurrent callers"""
+        return await self._inflight.do(
+            f"batch:{','.join(symbols)}", lambda: self._fetch_and_cache_chunk(symbols)
+        )
+    
+    async def _fetch_and_cache_chunk(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Bulk-fetch one chunk of symbols and store the results in the cache.
+        
+        Runs as the shared call, so the results are cached even if every
+        caller has stopped waiting.
+        """
+        previous = {}
+        for symbol in symbols:
+            entry = await self.quote_cache.get_entry(symbol)
+            if entry is not None:
+                previous[symbol] = entry[0]
+        
+        quotes = await self._run_blocking(self._fetch_quotes_batch, symbols, previous)
+        
+        for symbol, quote in quotes.items():
+            await self.quote_cache.set(symbol, quote)
+            
+            # First sighting or aging fundamentals: refetch them with the full quote
+            if self._fundamentals_expired(quote):
+                self.quote_cache.schedule_refresh(
+                    symbol, lambda symbol=symbol: self._fetch_stock_quote_shared(symbol)
+                )
         
         return quotes
     
-    async def get_historical_data(self, symbol: str, period: str = "1y") -> Dict[str, Any]:
-        """Get historical price data"""
+    def _fundamentals_expired(self, quote: Dict[str, Any]) -> bool:
+        """Whether a quote's descriptive fields are missing or older than MARKET_FUNDAMENTALS_TTL_SECONDS"""
+        fundamentals_at = quote.get('fundamentals_at')
+        return fundamentals_at is None or time.time() - fundamentals_at > settings.MARKET_FUNDAMENTALS_TTL_SECONDS
+    
+    async def get_historical_frame(self, symbol: str, period: str = "1y") -> pd.DataFrame:
+        """Get historical OHLCV bars as a DataFrame indexed by bar date"""
         try:
-            ticker = yf.Ticker(symbol)
-            hist = ticker.history(period=period)
-            
-            if hist.empty:
-                raise ExternalAPIError(f"No historical data found for {symbol}")
-            
-            # Convert to list of dictionaries
-            data = []
-            for date, row in hist.iterrows():
-                data.append({
-                    'date': date.isoformat(),
-                    'open': row['Open'],
-                    'high': row['High'],
-                    'low': row['Low'],
-                    'close': row['Close'],
-                    'volume': row['Volume']
-                })
-            
-            return {
-                'symbol': symbol,
-                'period': period,
-                'data': data
-            }
+            hist = await self._inflight.do(
+                f"history:{symbol}:{period}",
+                lambda: self._run_blocking(self._load_history, symbol, period)
+            )
         except Exception as e:
             logger.error(f"Error fetching historical data for {symbol}: {str(e)}")
             raise ExternalAPIError(f"Failed to fetch historical data for {symbol}")
+        
+        if hist.empty:
+            raise ExternalAPIError(f"No historical data found for {symbol}")
+        
+        return hist
+    
+    async def get_historical_data(
+        self,
+        symbol: str,
+        period: str = "1y",
+        data_format: str = "records"
+    ) -> Dict[str, Any]:
+        """
+        Get historical price data.
+        
+        data_format "records" returns a list of per-bar dicts; "columns"
+        returns one list per field, which is much cheaper for long periods.
+        """
+        hist = await self.get_historical_frame(symbol, period)
+        
+        if data_format == "columns":
+            data = history_to_columns(hist)
+        else:
+            data = history_to_records(hist)
+        
+        return {
+            'symbol': symbol,
+            'period': period,
+            'format': data_format,
+            'data': data
+        }
     
     async def get_market_overview(self) -> Dict[str, Any]:
         """Get market overview with major indices and trending stocks"""
         try:
-            # Major indices
-            indices_symbols = ['^GSPC', '^IXIC', '^DJI', '^RUT']  # S&P 500, NASDAQ, DOW, Russell 2000
-            indices = await self.get_multiple_quotes(indices_symbols)
-            
-            # Trending stocks (popular stocks)
-            trending_symbols = ['AAPL', 'MSFT', 'GOOGL', 'AMZN', 'TSLA', 'NVDA', 'META', 'NFLX']
-            trending = await self.get_multiple_quotes(trending_symbols)
+            # Major indices and trending stocks in one batch
+            quotes = await self.get_multiple_quotes(INDEX_SYMBOLS + TRENDING_SYMBOLS)
             
             return {
-                'indices': indices,
-                'trending': trending,
+                'indices': [quote for quote in quotes if quote['symbol'] in INDEX_SYMBOLS],
+                'trending': [quote for quote in quotes if quote['symbol'] in TRENDING_SYMBOLS],
                 'last_updated': datetime.now()
             }
         except Exception as e:
             logger.error(f"Error fetching market overview: {str(e)}")
             raise ExternalAPIError("Failed to fetch market overview")
     
-    async def search_symbols(self, query: str) -> List[Dict[str, Any]]:
-        """Search for stock symbols"""
+    async def search_symbols(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Search for stock symbols by ticker or company name"""
         try:
-            # Use yfinance to search for symbols
-            # This is a simplified implementation
-            # In production, you might want to use a dedicated search API
-            
-            # For now, return some common matches
-            common_stocks = {
-                'apple': {'symbol': 'AAPL', 'name': 'Apple Inc.'},
-                'microsoft': {'symbol': 'MSFT', 'name': 'Microsoft Corporation'},
-                'google': {'symbol': 'GOOGL', 'name': 'Alphabet Inc.'},
-                'amazon': {'symbol': 'AMZN', 'name': 'Amazon.com Inc.'},
-                'tesla': {'symbol': 'TSLA', 'name': 'Tesla Inc.'},
-                'nvidia': {'symbol': 'NVDA', 'name': 'NVIDIA Corporation'},
-                'meta': {'symbol': 'META', 'name': 'Meta Platforms Inc.'},
-                'netflix': {'symbol': 'NFLX', 'name': 'Netflix Inc.'},
-            }
-            
-            results = []
-            query_lower = query.lower()
-            
-            for key, stock in common_stocks.items():
-                if query_lower in key or query_lower in stock['symbol'].lower():
-                    results.append(stock)
-            
-            return results
+            return symbol_index.search(query, limit)
         except Exception as e:
             logger.error(f"Error searching symbols: {str(e)}")
             return []
@@ -144,28 +470,13 @@ class MarketDataService:
     async def get_sector_performance(self) -> List[Dict[str, Any]]:
         """Get sector performance data"""
         try:
-            # Sector ETFs as proxies for sector performance
-            sector_etfs = {
-                'XLK': 'Technology',
-                'XLF': 'Financial',
-                'XLV': 'Healthcare',
-                'XLE': 'Energy',
-                'XLI': 'Industrial',
-                'XLY': 'Consumer Discretionary',
-                'XLP': 'Consumer Staples',
-                'XLU': 'Utilities',
-                'XLB': 'Materials',
-                'XLRE': 'Real Estate',
-                'XLC': 'Communication Services'
-            }
-            
-            quotes = await self.get_multiple_quotes(list(sector_etfs.keys()))
+            quotes = await self.get_multiple_quotes(list(SECTOR_ETFS))
             
             sectors = []
             for quote in quotes:
-                if quote['symbol'] in sector_etfs:
+                if quote['symbol'] in SECTOR_ETFS:
                     sectors.append({
-                        'sector': sector_etfs[quote['symbol']],
+                        'sector': SECTOR_ETFS[quote['symbol']],
                         'symbol': quote['symbol'],
                         'price': quote['price'],
                         'change': quote['change'],
@@ -180,7 +491,7 @@ class MarketDataService:
     async def get_crypto_quotes(self, symbols: List[str] = None) -> List[Dict[str, Any]]:
         """Get cryptocurrency quotes"""
         if symbols is None:
-            symbols = ['BTC-USD', 'ETH-USD', 'ADA-USD', 'DOT-USD', 'LINK-USD']
+            symbols = CRYPTO_SYMBOLS
         
         try:
             quotes = await self.get_multiple_quotes(symbols)
@@ -0,0 +1,236 @@
+"""
+Background refresher that keeps quotes for hot symbols warm
+"""
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+import asyncio
+import logging
+import random
+import time
+
+from sqlalchemy import distinct, select, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, engine
+from app.core.exceptions import ExternalAPIError
+from app.crud import market as crud_market
+from app.crud import portfolio as crud_portfolio
+from app.models.portfolio import Holding
+from app.services.market_data import (
+    CRYPTO_SYMBOLS, INDEX_SYMBOLS, SECTOR_ETFS, TRENDING_SYMBOLS, market_data_service
+)
+
+logger = logging.getLogger(__name__)
+
+# pg_try_advisory_lock key held by the worker that runs the refresher
+REFRESHER_LOCK_KEY = 0x6d6b7472  # "mktr"
+
+
+def _asset_type(symbol: str) -> str:
+    if symbol.startswith('^'):
+        return 'index'
+    if symbol in SECTOR_ETFS:
+        return 'etf'
+    if symbol.endswith('-USD'):
+        return 'crypto'
+    return 'stock'
+
+
+class MarketDataRefresher:
+    """
+    Refreshes quotes for the symbols users are most likely to ask for.
+    
+    Every cycle re-fetches indices, trending stocks, sector ETFs, the default
+    crypto list and every symbol held in a portfolio, writes them into the
+    quote cache and the market_data table, reprices holdings, then sleeps for the configured
+    interval with jitter. Failed cycles back off exponentially. With the
+    interval below the cache TTL, /market/* requests are served from cache
+    instead of waiting on Yahoo.
+    
+    On Postgres only the worker holding an advisory lock refreshes; the
+    others retry the lock every interval, so one takes over if it exits.
+    """
+    
+    def __init__(self):
+        self.interval = settings.MARKET_REFRESH_INTERVAL_SECONDS
+        self.jitter = settings.MARKET_REFRESH_JITTER
+        self.max_backoff = settings.MARKET_REFRESH_MAX_BACKOFF_SECONDS
+        self._task: Optional[asyncio.Task] = None
+        self._lock_connection: Optional[AsyncConnection] = None
+        
+        self.cycles = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.symbols = 0
+        self.refreshed = 0
+        self.holdings_revalued = 0
+        self.last_duration = 0.0
+        self.last_refreshed_at: Optional[datetime] = None
+    
+    async def _hot_symbols(self) -> List[str]:
+        """Static watch lists plus every symbol currently held"""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(distinct(Holding.symbol)))
+            held = result.scalars().all()
+        
+        return list(dict.fromkeys([
+            *INDEX_SYMBOLS, *TRENDING_SYMBOLS, *SECTOR_ETFS, *CRYPTO_SYMBOLS, *held
+        ]))
+    
+    async def refresh_once(self) -> int:
+        """Run one refresh cycle, returning the number of symbols refreshed"""
+        started = time.perf_counter()
+        symbols = await self._hot_symbols()
+        quotes = await market_data_service.refresh_quotes(symbols)
+        if symbols and not quotes:
+            raise ExternalAPIError("No quotes returned for any hot symbol")
+        
+        await self._store(quotes)
+        async with AsyncSessionLocal() as db:
+            self.holdings_revalued = await crud_portfolio.revalue_holdings(
+                db, {symbol: quote['price'] for symbol, quote in quotes.items()}
+            )
+        
+        self.symbols = len(symbols)
+        self.refreshed = len(quotes)
+        self.last_duration = time.perf_counter() - started
+        self.last_refreshed_at = datetime.now(timezone.utc)
+        return len(quotes)
+    
+    async def _store(self, quotes: Dict[str, Dict[str, Any]]):
+        """Upsert quotes into the market_data table"""
+        now = datetime.now(timezone.utc)
+        rows = [
+            {
+                'symbol': symbol,
+                'asset_type': _asset_type(symbol),
+                'name': quote.get('name') or symbol,
+                'current_price': quote['price'],
+                'previous_close': quote['price'] - (quote.get('change') or 0),
+                'price_change': quote.get('change'),
+                'price_change_percent': quote.get('change_percent'),
+                'volume': quote.get('volume'),
+                'market_cap': quote.get('market_cap'),
+                'pe_ratio': quote.get('pe_ratio'),
+                'dividend_yield': quote.get('dividend_yield'),
+                'fifty_two_week_high': quote.get('fifty_two_week_high'),
+                'fifty_two_week_low': quote.get('fifty_two_week_low'),
+                'data_source': settings.DEFAULT_MARKET_DATA_PROVIDER,
+                'last_updated': now
+            }
+            for symbol, quote in quotes.items()
+        ]
+        async with AsyncSessionLocal() as db:
+            await crud_market.upsert_market_data(db, rows)
+    
+    async def _hold_lock(self) -> bool:
+        """
+        Whether this worker should refresh: always off Postgres, otherwise
+        while it holds the refresher advisory lock (on a dedicated connection,
+        since session locks live as long as the connection)
+        """
+        if engine.dialect.name != 'postgresql':
+            return True
+        
+        if self._lock_connection is not None:
+            try:
+                await self._lock_connection.execute(text('SELECT 1'))
+                return True
+            except Exception as e:
+                logger.warning(f"Lost the market refresher lock connection: {str(e)}")
+                await self._release_lock()
+        
+        connection = await engine.connect()
+        try:
+            connection = await connection.execution_options(isolation_level="AUTOCOMMIT")
+            result = await connection.execute(
+                text('SELECT pg_try_advisory_lock(:key)'), {'key': REFRESHER_LOCK_KEY}
+            )
+            acquired = bool(result.scalar())
+        except Exception:
+            await connection.close()
+            raise
+        
+        if not acquired:
+            await connection.close()
+            return False
+        
+        logger.info("Market refresher lock acquired, refreshing from this worker")
+        self._lock_connection = connection
+        return True
+    
+    async def _release_lock(self):
+        if self._lock_connection is None:
+            return
+        connection, self._lock_connection = self._lock_connection, None
+        try:
+            await connection.execute(text('SELECT pg_advisory_unlock(:key)'), {'key': REFRESHER_LOCK_KEY})
+        except Exception:
+            pass  # The lock goes with the connection anyway
+        finally:
+            await connection.close()
+    
+    def _next_delay(self) -> float:
+        """Seconds until the next cycle: interval, doubled per consecutive failure, with jitter"""
+        delay = self.interval * 2 ** self.consecutive_failures
+        return min(delay * random.uniform(1 - self.jitter, 1 + self.jitter), self.max_backoff)
+    
+    async def _run(self):
+        while True:
+            try:
+                leader = await self._hold_lock()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                leader = False
+                logger.warning(f"Could not check the market refresher lock: {str(e)}")
+            
+            if leader:
+                self.cycles += 1
+                try:
+                    await self.refresh_once()
+                    self.consecutive_failures = 0
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.failures += 1
+                    self.consecutive_failures += 1
+                    logger.warning(f"Market data refresh failed ({self.consecutive_failures} in a row): {str(e)}")
+            await asyncio.sleep(self._next_delay())
+    
+    def start(self):
+        """Start refreshing in the background (first cycle runs immediately)"""
+        if self._task is None and settings.MARKET_REFRESH_ENABLED:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Stop the background task"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._release_lock()
+    
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """Refresh counters"""
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "holds_lock": engine.dialect.name != 'postgresql' or self._lock_connection is not None,
+            "cycles": self.cycles,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "symbols": self.symbols,
+            "refreshed": self.refreshed,
+            "holdings_revalued": self.holdings_revalued,
+            "last_duration_ms": self.last_duration * 1000,
+            "last_refreshed_at": self.last_refreshed_at.isoformat() if self.last_refreshed_at else None
+        }
+
+
+# Global instance
+market_refresher = MarketDataRefresher()
\ No newline at end of file
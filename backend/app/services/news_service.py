@@ -1,26 +1,118 @@
 """
 News service for fetching and analyzing financial news
 """
-import aiohttp
 import asyncio
-from typing import List, Dict, Any, Optional
-from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional, Set
+from datetime import datetime, timedelta, timezone
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import hashlib
 import logging
-from textblob import TextBlob
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+import time
 
+from app.core.cache import SingleFlight
 from app.core.config import settings
+from app.core.database import AsyncSessionLocal
 from app.core.exceptions import ExternalAPIError
+from app.core.http import http_client
+from app.crud import news as crud_news
+from app.services.sentiment import sentiment_engine
+from app.services.symbol_extractor import symbol_extractor
 
 logger = logging.getLogger(__name__)
 
+MARKET_NEWS_QUERY = "stock market finance economy"
+
+# Search terms for symbols whose ticker alone finds little news
+COMPANY_SEARCH_TERMS = {
+    'AAPL': 'Apple',
+    'MSFT': 'Microsoft',
+    'GOOGL': 'Google Alphabet',
+    'AMZN': 'Amazon',
+    'TSLA': 'Tesla',
+    'NVDA': 'NVIDIA',
+    'META': 'Meta Facebook',
+    'NFLX': 'Netflix'
+}
+
+# NewsAPI limit on the q parameter
+SEARCH_QUERY_MAX_LENGTH = 500
+
+# Search terms whose last ingestion time is remembered
+INGESTED_TERMS_MAX_SIZE = 10000
+
+
+def url_hash(url: str) -> str:
+    """SHA-256 of a URL with case, fragment and tracking parameters normalized away"""
+    parts = urlsplit(url.strip())
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith('utm_')
+    ))
+    normalized = urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip('/'), query, ''))
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def _parse_published_at(value: Optional[str]) -> datetime:
+    if value:
+        try:
+            published_at = datetime.fromisoformat(value.replace('Z', '+00:00'))
+            return published_at if published_at.tzinfo else published_at.replace(tzinfo=timezone.utc)
+        except ValueError:
+            pass
+    return datetime.now(timezone.utc)
+
 
 class NewsService:
     """Service for fetching and analyzing financial news"""
     
     def __init__(self):
         self.news_api_key = settings.NEWS_API_KEY
-        self.sentiment_analyzer = SentimentIntensityAnalyzer()
+        self.ingest_interval = settings.NEWS_INGEST_INTERVAL_SECONDS
+        self.sentiment_window = timedelta(hours=settings.NEWS_SENTIMENT_WINDOW_HOURS)
+        self._inflight = SingleFlight()
+        self._ingest_task: Optional[asyncio.Task] = None
+        self._refresh_tasks: Set[asyncio.Task] = set()
+        
+        # Search term -> monotonic time it was last pulled, empty results included
+        self._ingested_at: Dict[str, float] = {}
+        self.articles_fetched = 0
+        self.articles_ingested = 0
+        self.last_ingested_at: Optional[datetime] = None
+    
+    async def _fetch_articles(
+        self,
+        category: str = "business",
+        page: int = 1,
+        page_size: int = 20,
+        search_query: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Fetch one page of raw articles from News API"""
+        url = "https://newsapi.org/v2/top-headlines"
+        params = {
+            'apiKey': self.news_api_key,
+            'category': category,
+            'language': 'en',
+            'page': page,
+            'pageSize': page_size
+        }
+        
+        if search_query:
+            params['q'] = search_query
+            url = "https://newsapi.org/v2/everything"
+            params['sortBy'] = 'publishedAt'
+            params['from'] = (datetime.now() - timedelta(days=7)).isoformat()
+        
+        async with http_client.session.get(url, params=params) as response:
+            if response.status != 200:
+                raise ExternalAPIError(f"News API error: {response.status}")
+            
+            data = await response.json()
+        
+        if data.get('status') != 'ok':
+            raise ExternalAPIError(f"News API error: {data.get('message')}")
+        
+        self.articles_fetched += len(data.get('articles', []))
+        return data
     
     async def get_financial_news(
         self, 
@@ -31,63 +123,40 @@ class NewsService:
     ) -> Dict[str, Any]:
         """Fetch financial news from News API"""
         try:
-            url = "https://newsapi.org/v2/top-headlines"
-            params = {
-                'apiKey': self.news_api_key,
-                'category': category,
-                'language': 'en',
-                'page': page,
-                'pageSize': page_size
-            }
+            data = await self._fetch_articles(category, page, page_size, search_query)
             
-            if search_query:
-                params['q'] = search_query
-                url = "https://newsapi.org/v2/everything"
-                params['sortBy'] = 'publishedAt'
-                params['from'] = (datetime.now() - timedelta(days=7)).isoformat()
+            # Process articles with sentiment analysis
+            articles = await self._process_articles(data.get('articles', []))
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, params=params) as response:
-                    if response.status != 200:
-                        raise ExternalAPIError(f"News API error: {response.status}")
-                    
-                    data = await response.json()
-                    
-                    if data.get('status') != 'ok':
-                        raise ExternalAPIError(f"News API error: {data.get('message')}")
-                    
-                    # Process articles with sentiment analysis
-                    articles = []
-                    for article in data.get('articles', []):
-                        processed_article = await self._process_article(article)
-                        articles.append(processed_article)
-                    
-                    return {
-                        'articles': articles,
-                        'total_results': data.get('totalResults', 0),
-                        'page': page,
-                        'page_size': page_size
-                    }
+            return {
+                'articles': articles,
+                'total_results': data.get('totalResults', 0),
+                'page': page,
+                'page_size': page_size
+            }
         
         except Exception as e:
             logger.error(f"Error fetching news: {str(e)}")
             raise ExternalAPIError("Failed to fetch financial news")
     
-    async def _process_article(self, article: Dict[str, Any]) -> Dict[str, Any]:
-        """Process article with sentiment analysis"""
-        title = article.get('title', '')
-        description = article.get('description', '')
-        content = f"{title} {description}"
-        
-        # Perform sentiment analysis
-        sentiment_data = self.analyze_sentiment(content)
+    async def _process_articles(self, articles: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Process articles, scoring sentiment for the whole page in one batch off the event loop"""
+        contents = [f"{article.get('title', '')} {article.get('description', '')}" for article in articles]
+        sentiments = await sentiment_engine.score(contents)
         
-        # Extract related symbols (simplified)
+        return [
+            self._process_article(article, content, sentiment_data)
+            for article, content, sentiment_data in zip(articles, contents, sentiments)
+        ]
+    
+    def _process_article(self, article: Dict[str, Any], content: str, sentiment_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the processed article from its sentiment scores"""
+        # Extract related symbols
         related_symbols = self._extract_symbols(content)
         
         return {
-            'title': title,
-            'description': description,
+            'title': article.get('title', ''),
+            'description': article.get('description', ''),
             'url': article.get('url'),
             'source': article.get('source', {}).get('name'),
             'author': article.get('author'),
@@ -101,68 +170,12 @@ class NewsService:
         }
     
     def analyze_sentiment(self, text: str) -> Dict[str, Any]:
-        """Analyze sentiment of text"""
-        if not text:
-            return {
-                'sentiment': 'neutral',
-                'score': 0.0,
-                'confidence': 0.0
-            }
-        
-        # Use VADER sentiment analyzer
-        vader_scores = self.sentiment_analyzer.polarity_scores(text)
-        compound_score = vader_scores['compound']
-        
-        # Determine sentiment
-        if compound_score >= 0.05:
-            sentiment = 'positive'
-        elif compound_score <= -0.05:
-            sentiment = 'negative'
-        else:
-            sentiment = 'neutral'
-        
-        # Use TextBlob for additional analysis
-        blob = TextBlob(text)
-        textblob_polarity = blob.sentiment.polarity
-        
-        # Combine scores
-        final_score = (compound_score + textblob_polarity) / 2
-        confidence = abs(final_score)
-        
-        return {
-            'sentiment': sentiment,
-            'score': final_score,
-            'confidence': min(confidence, 1.0)
-        }
+        """Analyze sentiment of a single text inline (use sentiment_engine for batches)"""
+        return sentiment_engine.score_one(text)
     
     def _extract_symbols(self, text: str) -> List[str]:
-        """Extract stock symbols from text (simplified)"""
-        # This is a simplified implementation
-        # In production, you'd want a more sophisticated NLP approach
-        
-        common_symbols = {
-            'apple': 'AAPL',
-            'microsoft': 'MSFT',
-            'google': 'GOOGL',
-            'alphabet': 'GOOGL',
-            'amazon': 'AMZN',
-            'tesla': 'TSLA',
-            'nvidia': 'NVDA',
-            'meta': 'META',
-            'facebook': 'META',
-            'netflix': 'NFLX',
-            'bitcoin': 'BTC-USD',
-            'ethereum': 'ETH-USD'
-        }
-        
-        text_lower = text.lower()
-        found_symbols = []
-        
-        for keyword, symbol in common_symbols.items():
-            if keyword in text_lower:
-                found_symbols.append(symbol)
-        
-        return list(set(found_symbols))  # Remove duplicates
+        """Extract stock symbols from text"""
+        return symbol_extractor.extract(text)
     
     def _determine_impact_level(self, sentiment_data: Dict[str, Any], related_symbols: List[str]) -> str:
         """Determine the impact level of news"""
@@ -176,18 +189,176 @@ class NewsService:
         else:
             return 'low'
     
+    async def ingest_news(self, search_query: Optional[str] = None, page_size: int = 100) -> int:
+        """
+        Pull the latest articles into the news_articles table.
+        
+        Articles are keyed by URL hash; only ones not stored yet are scored
+        and inserted. Returns the number of new articles.
+        """
+        data = await self._fetch_articles(page_size=page_size, search_query=search_query)
+        raw_articles = {}
+        for article in data.get('articles', []):
+            if article.get('url') and article.get('title'):
+                raw_articles.setdefault(url_hash(article['url']), article)
+        
+        async with AsyncSessionLocal() as db:
+            existing = await crud_news.get_existing_url_hashes(db, list(raw_articles))
+            new_hashes = [key for key in raw_articles if key not in existing]
+            if not new_hashes:
+                return 0
+            
+            processed = await self._process_articles([raw_articles[key] for key in new_hashes])
+            rows = [
+                self._article_to_row(article, key, search_query)
+                for key, article in zip(new_hashes, processed)
+            ]
+            inserted = await crud_news.create_articles(db, rows)
+        
+        self.articles_ingested += inserted
+        self.last_ingested_at = datetime.now(timezone.utc)
+        logger.info(f"Ingested {inserted} new articles (query={search_query!r}, fetched={len(raw_articles)})")
+        return inserted
+    
+    def _article_to_row(self, article: Dict[str, Any], key: str, search_query: Optional[str]) -> Dict[str, Any]:
+        """Map a processed article onto NewsArticle columns"""
+        return {
+            'title': article['title'],
+            'summary': article['description'],
+            'url': article['url'],
+            'url_hash': key,
+            'source': article['source'] or 'unknown',
+            'author': article['author'],
+            'image_url': article['image_url'],
+            'category': search_query or 'business',
+            'related_symbols': article['related_symbols'],
+            'sentiment': article['sentiment'],
+            'sentiment_score': article['sentiment_score'],
+            'impact_level': article['impact_level'],
+            'published_at': _parse_published_at(article['published_at']),
+            'is_processed': True
+        }
+    
+    def _row_to_article(self, row) -> Dict[str, Any]:
+        """Map a stored NewsArticle back to the processed-article shape"""
+        return {
+            'title': row.title,
+            'description': row.summary,
+            'url': row.url,
+            'source': row.source,
+            'author': row.author,
+            'published_at': row.published_at.isoformat(),
+            'image_url': row.image_url,
+            'sentiment': row.sentiment,
+            'sentiment_score': row.sentiment_score,
+            'confidence': min(abs(row.sentiment_score or 0.0), 1.0),
+            'related_symbols': row.related_symbols or [],
+            'impact_level': row.impact_level
+        }
+    
+    async def _ingest_on_demand(self, search_query: Optional[str], terms: Optional[List[str]] = None) -> int:
+        """
+        Ingest once for a query, joining an ingestion already running for it.
+        
+        terms (default: the query itself) are marked as freshly ingested
+        once the pull succeeds, whether or not it found anything.
+        """
+        return await self._inflight.do(
+            search_query or '',
+            lambda: self._ingest_and_mark(search_query, terms if terms is not None else [search_query or ''])
+        )
+    
+    async def _ingest_and_mark(self, search_query: Optional[str], terms: List[str]) -> int:
+        inserted = await self.ingest_news(search_query=search_query)
+        now = time.monotonic()
+        for term in terms:
+            self._ingested_at.pop(term, None)
+            self._ingested_at[term] = now
+        while len(self._ingested_at) > INGESTED_TERMS_MAX_SIZE:
+            del self._ingested_at[next(iter(self._ingested_at))]
+        return inserted
+    
+    def _is_fresh(self, term: str) -> bool:
+        """Whether term was pulled within the ingest interval"""
+        ingested_at = self._ingested_at.get(term)
+        return ingested_at is not None and time.monotonic() - ingested_at < self.ingest_interval
+    
+    async def _ingest_terms(self, terms: List[str]) -> int:
+        """Pull news for search terms in one OR-joined query"""
+        query = ' OR '.join(f"({term})" if ' ' in term else term for term in terms)
+        return await self._ingest_on_demand(query, terms)
+    
+    def _refresh_in_background(self, terms: List[str]):
+        """Re-pull stale search terms without making the caller wait"""
+        task = asyncio.create_task(self._ingest_terms(terms))
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_done)
+    
+    def _refresh_done(self, task: asyncio.Task):
+        self._refresh_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Background news refresh failed: {str(task.exception())}")
+    
+    def _search_term_batches(self, symbols: List[str]) -> List[List[str]]:
+        """Search terms for symbols, grouped so each OR-joined query fits SEARCH_QUERY_MAX_LENGTH"""
+        batches: List[List[str]] = []
+        length = 0
+        for term in dict.fromkeys(COMPANY_SEARCH_TERMS.get(symbol, symbol) for symbol in symbols):
+            size = len(term) + (2 if ' ' in term else 0)
+            if batches and length + len(' OR ') + size <= SEARCH_QUERY_MAX_LENGTH:
+                batches[-1].append(term)
+                length += len(' OR ') + size
+            else:
+                batches.append([term])
+                length = size
+        return batches
+    
+    async def _ingest_loop(self):
+        """Periodically pull headlines, the market news query and the configured queries"""
+        while True:
+            for search_query in [None, *dict.fromkeys([MARKET_NEWS_QUERY, *settings.NEWS_INGEST_QUERIES])]:
+                try:
+                    await self._ingest_on_demand(search_query)
+                except Exception as e:
+                    logger.warning(f"News ingestion failed (query={search_query!r}): {str(e)}")
+            await asyncio.sleep(self.ingest_interval)
+    
+    def start_ingestion(self):
+        """Start the background ingestion task"""
+        if self._ingest_task is None and self.news_api_key:
+            self._ingest_task = asyncio.create_task(self._ingest_loop())
+    
+    async def stop_ingestion(self):
+        """Stop the background ingestion task"""
+        if self._ingest_task is not None:
+            self._ingest_task.cancel()
+            try:
+                await self._ingest_task
+            except asyncio.CancelledError:
+                pass
+            self._ingest_task = None
+        for task in list(self._refresh_tasks):
+            task.cancel()
+    
     async def get_market_sentiment(self) -> Dict[str, Any]:
-        """Get overall market sentiment from recent news"""
+        """
+        Get overall market sentiment from the market news (articles ingested
+        for MARKET_NEWS_QUERY) stored in the sentiment window
+        """
         try:
-            # Fetch recent financial news
-            news_data = await self.get_financial_news(
-                search_query="stock market finance economy",
-                page_size=50
-            )
+            since = datetime.now(timezone.utc) - self.sentiment_window
+            async with AsyncSessionLocal() as db:
+                breakdown = await crud_news.get_sentiment_breakdown(db, since, MARKET_NEWS_QUERY)
+            
+            if not breakdown and not self._is_fresh(MARKET_NEWS_QUERY):
+                # Nothing ingested yet (e.g. right after startup)
+                await self._ingest_on_demand(MARKET_NEWS_QUERY)
+                async with AsyncSessionLocal() as db:
+                    breakdown = await crud_news.get_sentiment_breakdown(db, since, MARKET_NEWS_QUERY)
             
-            articles = news_data['articles']
+            total_count = sum(bucket['count'] for bucket in breakdown.values())
             
-            if not articles:
+            if not total_count:
                 return {
                     'overall_sentiment': 'neutral',
                     'sentiment_score': 0.0,
@@ -197,19 +368,11 @@ class NewsService:
                     'total_articles': 0
                 }
             
-            # Analyze sentiment distribution
-            sentiments = [article['sentiment'] for article in articles]
-            positive_count = sentiments.count('positive')
-            negative_count = sentiments.count('negative')
-            neutral_count = sentiments.count('neutral')
-            total_count = len(sentiments)
-            
-            positive_pct = (positive_count / total_count) * 100
-            negative_pct = (negative_count / total_count) * 100
-            neutral_pct = (neutral_count / total_count) * 100
+            def percentage(sentiment: str) -> float:
+                return (breakdown.get(sentiment, {}).get('count', 0) / total_count) * 100
             
             # Calculate overall sentiment
-            avg_score = sum(article['sentiment_score'] for article in articles) / total_count
+            avg_score = sum(bucket['count'] * bucket['avg_score'] for bucket in breakdown.values()) / total_count
             
             if avg_score > 0.1:
                 overall_sentiment = 'positive'
@@ -221,50 +384,85 @@ class NewsService:
             return {
                 'overall_sentiment': overall_sentiment,
                 'sentiment_score': avg_score,
-                'positive_percentage': positive_pct,
-                'negative_percentage': negative_pct,
-                'neutral_percentage': neutral_pct,
+                'positive_percentage': percentage('positive'),
+                'negative_percentage': percentage('negative'),
+                'neutral_percentage': percentage('neutral'),
                 'total_articles': total_count,
-                'last_updated': datetime.now()
+                'last_updated': self.last_ingested_at or datetime.now()
             }
         
         except Exception as e:
             logger.error(f"Error calculating market sentiment: {str(e)}")
             raise ExternalAPIError("Failed to calculate market sentiment")
     
-    async def get_symbol_news(self, symbol: str, days: int = 7) -> List[Dict[str, Any]]:
-        """Get news related to a specific symbol"""
+    async def get_symbol_news(self, symbol: str, days: int = 7, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Get stored news related to a specific symbol.
+        
+        The symbol's search term is re-pulled once it is older than the
+        ingest interval: in the background when stored news exists, inline
+        when there is none.
+        """
         try:
-            # Search for news mentioning the symbol
-            company_names = {
-                'AAPL': 'Apple',
-                'MSFT': 'Microsoft',
-                'GOOGL': 'Google Alphabet',
-                'AMZN': 'Amazon',
-                'TSLA': 'Tesla',
-                'NVDA': 'NVIDIA',
-                'META': 'Meta Facebook',
-                'NFLX': 'Netflix'
-            }
-            
-            search_query = company_names.get(symbol, symbol)
-            
-            news_data = await self.get_financial_news(
-                search_query=search_query,
-                page_size=20
-            )
+            since = datetime.now(timezone.utc) - timedelta(days=days)
+            async with AsyncSessionLocal() as db:
+                rows = await crud_news.get_articles(db, since, symbol=symbol, limit=limit)
             
-            # Filter articles that actually mention the symbol
-            relevant_articles = []
-            for article in news_data['articles']:
-                if symbol in article['related_symbols']:
-                    relevant_articles.append(article)
+            term = COMPANY_SEARCH_TERMS.get(symbol, symbol)
+            if not self._is_fresh(term):
+                if rows:
+                    self._refresh_in_background([term])
+                else:
+                    await self._ingest_terms([term])
+                    async with AsyncSessionLocal() as db:
+                        rows = await crud_news.get_articles(db, since, symbol=symbol, limit=limit)
             
-            return relevant_articles
+            return [self._row_to_article(row) for row in rows]
         
         except Exception as e:
             logger.error(f"Error fetching news for {symbol}: {str(e)}")
             return []
+    
+    async def get_symbols_sentiment_counts(self, symbols: List[str], days: int = 7) -> Dict[str, Dict[str, int]]:
+        """
+        Sentiment label counts of stored news for many symbols in one query.
+        
+        Stale symbols with no stored news are searched for together in
+        OR-joined on-demand ingestions, then counted again; stale symbols
+        that have news are re-pulled in the background.
+        """
+        since = datetime.now(timezone.utc) - timedelta(days=days)
+        async with AsyncSessionLocal() as db:
+            counts = await crud_news.get_symbol_sentiment_counts(db, since, symbols)
+        
+        stale = [symbol for symbol in symbols if not self._is_fresh(COMPANY_SEARCH_TERMS.get(symbol, symbol))]
+        for batch in self._search_term_batches([symbol for symbol in stale if symbol in counts]):
+            self._refresh_in_background(batch)
+        
+        uncovered = [symbol for symbol in stale if symbol not in counts]
+        if uncovered:
+            results = await asyncio.gather(
+                *(self._ingest_terms(batch) for batch in self._search_term_batches(uncovered)),
+                return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.error(f"Error fetching news for {len(uncovered)} symbols: {str(result)}")
+            
+            async with AsyncSessionLocal() as db:
+                counts.update(await crud_news.get_symbol_sentiment_counts(db, since, uncovered))
+        
+        return counts
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Ingestion counters"""
+        return {
+            'articles_fetched': self.articles_fetched,
+            'articles_ingested': self.articles_ingested,
+            'last_ingested_at': self.last_ingested_at.isoformat() if self.last_ingested_at else None,
+            'ingestion_running': self._ingest_task is not None and not self._ingest_task.done(),
+            'ingest_requests': self._inflight.stats
+        }
 
 
 # Global instance
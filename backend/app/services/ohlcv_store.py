@@ -0,0 +1,224 @@
+"""
+Local persistent OHLCV store backed by memory-mapped NumPy files
+"""
+from typing import Any, Dict, Optional
+from urllib.parse import quote
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+BAR_DTYPE = np.dtype([
+    ('ts', 'i8'),  # Bar start, nanoseconds since epoch (UTC)
+    ('open', 'f8'),
+    ('high', 'f8'),
+    ('low', 'f8'),
+    ('close', 'f8'),
+    ('volume', 'i8')
+])
+
+# yfinance history column -> stored field
+COLUMNS = {
+    'Open': 'open',
+    'High': 'high',
+    'Low': 'low',
+    'Close': 'close',
+    'Volume': 'volume'
+}
+
+# Periods expressed as a trailing number of bars rather than a date range
+BAR_COUNT_PERIODS = {'1d': 1, '5d': 5}
+
+CALENDAR_PERIODS = {
+    '1mo': pd.DateOffset(months=1),
+    '3mo': pd.DateOffset(months=3),
+    '6mo': pd.DateOffset(months=6),
+    '1y': pd.DateOffset(years=1),
+    '2y': pd.DateOffset(years=2),
+    '5y': pd.DateOffset(years=5),
+    '10y': pd.DateOffset(years=10)
+}
+
+SUPPORTED_PERIODS = set(BAR_COUNT_PERIODS) | set(CALENDAR_PERIODS) | {'ytd', 'max'}
+
+# Relative store paths are resolved against the backend directory, not the working directory
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def period_start(period: str, now: Optional[pd.Timestamp] = None) -> Optional[pd.Timestamp]:
+    """UTC start of a calendar period, or None for 'max' and bar-count periods"""
+    now = now or pd.Timestamp.now(tz='UTC')
+    if period in CALENDAR_PERIODS:
+        return (now - CALENDAR_PERIODS[period]).normalize()
+    if period == 'ytd':
+        return pd.Timestamp(year=now.year, month=1, day=1, tz='UTC')
+    return None
+
+
+class OHLCVStore:
+    """
+    Per-symbol bar files plus a JSON sidecar describing what they cover.
+    
+    Bars live in <root>/<symbol>.npy as a structured array sorted by
+    timestamp and are opened with mmap so range reads only touch the slice
+    they need. The sidecar records the exchange timezone, the earliest
+    start that was fully downloaded (None once 'max' has been fetched) and
+    when the tail was last refreshed.
+    
+    The root directory is created on the first write, so constructing the
+    store (at import time) touches nothing on disk.
+    """
+    
+    def __init__(self, root: str):
+        self.root = os.path.normpath(os.path.join(BACKEND_DIR, os.path.expanduser(root)))
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._root_created = False
+    
+    def _path(self, symbol: str, suffix: str) -> str:
+        return os.path.join(self.root, quote(symbol, safe='') + suffix)
+    
+    def lock(self, symbol: str) -> threading.Lock:
+        """Per-symbol lock serializing read-modify-write cycles"""
+        with self._locks_guard:
+            return self._locks.setdefault(symbol, threading.Lock())
+    
+    def read_meta(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """Load the sidecar for symbol, or None if nothing is stored"""
+        try:
+            with open(self._path(symbol, '.json')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+    
+    def covers(self, symbol: str, period: str) -> bool:
+        """Whether stored bars reach back far enough to answer period"""
+        meta = self.read_meta(symbol)
+        if meta is None:
+            return False
+        if meta['covers_from'] is None:
+            return True
+        if period == 'max':
+            return False
+        start = period_start(period)
+        # Bar-count periods only need the most recent bars
+        return start is None or start.value >= meta['covers_from']
+    
+    def is_fresh(self, symbol: str, max_age_seconds: float) -> bool:
+        """Whether the tail was refreshed within max_age_seconds"""
+        meta = self.read_meta(symbol)
+        return meta is not None and time.time() - meta['refreshed_at'] <= max_age_seconds
+    
+    def last_timestamp(self, symbol: str) -> Optional[pd.Timestamp]:
+        """Start of the most recent stored bar (exchange timezone)"""
+        bars = self._load(symbol)
+        meta = self.read_meta(symbol)
+        if bars is None or meta is None or len(bars) == 0:
+            return None
+        return pd.Timestamp(int(bars['ts'][-1]), tz='UTC').tz_convert(meta['tz'])
+    
+    def _load(self, symbol: str) -> Optional[np.ndarray]:
+        try:
+            return np.load(self._path(symbol, '.npy'), mmap_mode='r')
+        except FileNotFoundError:
+            return None
+    
+    def read(self, symbol: str, period: str = 'max') -> Optional[pd.DataFrame]:
+        """Read stored bars for period as a yfinance-shaped DataFrame"""
+        bars = self._load(symbol)
+        meta = self.read_meta(symbol)
+        if bars is None or meta is None:
+            return None
+        
+        if period in BAR_COUNT_PERIODS:
+            bars = bars[-BAR_COUNT_PERIODS[period]:]
+        else:
+            start = period_start(period)
+            if start is not None:
+                bars = bars[np.searchsorted(bars['ts'], start.value):]
+        
+        index = pd.to_datetime(np.asarray(bars['ts']), utc=True).tz_convert(meta['tz'])
+        index.name = 'Date'
+        return pd.DataFrame(
+            {column: np.asarray(bars[field]) for column, field in COLUMNS.items()},
+            index=index
+        )
+    
+    def store_range(self, symbol: str, hist: pd.DataFrame, covers_from: Optional[pd.Timestamp]):
+        """
+        Merge a downloaded range that runs up to now into the stored bars.
+        
+        covers_from is the start the download was asked for (None for
+        'max'); coverage only ever widens.
+        """
+        meta = self.read_meta(symbol)
+        if meta is None:
+            coverage = None if covers_from is None else covers_from.value
+        elif meta['covers_from'] is None or covers_from is None:
+            coverage = None
+        else:
+            coverage = min(meta['covers_from'], covers_from.value)
+        self._merge(symbol, hist, coverage)
+    
+    def append_tail(self, symbol: str, hist: pd.DataFrame):
+        """Merge newly fetched trailing bars, keeping the current coverage"""
+        meta = self.read_meta(symbol)
+        self._merge(symbol, hist, meta['covers_from'] if meta else int(hist.index[0].value))
+    
+    def touch(self, symbol: str):
+        """Mark the tail as refreshed without changing any bars"""
+        meta = self.read_meta(symbol)
+        if meta is not None:
+            meta['refreshed_at'] = time.time()
+            self._atomic_write_meta(symbol, meta)
+    
+    def replace(self, symbol: str, hist: pd.DataFrame, covers_from: Optional[pd.Timestamp]):
+        """Discard stored bars for symbol and store hist instead"""
+        self._merge(symbol, hist, None if covers_from is None else covers_from.value, keep_existing=False)
+    
+    def _merge(self, symbol: str, hist: pd.DataFrame, coverage: Optional[int], keep_existing: bool = True):
+        index = hist.index if hist.index.tz is not None else hist.index.tz_localize('UTC')
+        
+        new = np.empty(len(hist), dtype=BAR_DTYPE)
+        new['ts'] = index.tz_convert('UTC').as_unit('ns').asi8
+        for column, field in COLUMNS.items():
+            values = hist[column]
+            new[field] = (values.fillna(0) if field == 'volume' else values).to_numpy()
+        
+        # Stored bars at or after the first new bar are superseded (the last
+        # bar of a trading day may have been partial when it was stored)
+        existing = self._load(symbol) if keep_existing else None
+        if existing is not None and len(new):
+            existing = existing[:np.searchsorted(existing['ts'], new['ts'][0])]
+        bars = new if existing is None else np.concatenate([existing, new])
+        
+        self._atomic_write(symbol, bars, {
+            'tz': str(index.tz),
+            'covers_from': coverage,
+            'refreshed_at': time.time()
+        })
+    
+    def _ensure_root(self):
+        if not self._root_created:
+            os.makedirs(self.root, exist_ok=True)
+            self._root_created = True
+    
+    def _atomic_write(self, symbol: str, bars: np.ndarray, meta: Dict[str, Any]):
+        self._ensure_root()
+        npy_path = self._path(symbol, '.npy')
+        tmp_npy = npy_path + '.tmp'
+        with open(tmp_npy, 'wb') as f:
+            np.save(f, bars)
+        os.replace(tmp_npy, npy_path)
+        self._atomic_write_meta(symbol, meta)
+    
+    def _atomic_write_meta(self, symbol: str, meta: Dict[str, Any]):
+        self._ensure_root()
+        json_path = self._path(symbol, '.json')
+        tmp_json = json_path + '.tmp'
+        with open(tmp_json, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_json, json_path)
@@ -0,0 +1,274 @@
+"""
+Vectorized portfolio analytics: weights, concentration, volatility, beta
+and covariance risk over portfolios x symbols matrices
+"""
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+import asyncio
+import logging
+
+import numpy as np
+import pandas as pd
+
+from app.services.market_data import market_data_service
+
+logger = logging.getLogger(__name__)
+
+TRADING_DAYS = 252
+
+# Benchmark for beta
+MARKET_SYMBOL = '^GSPC'
+
+# Annualized volatility that maps to the top of the volatility factor
+# (a 25% portfolio lands mid-scale)
+MAX_VOLATILITY = 0.5
+
+# Volatility factor used when no price history covers the portfolio
+DEFAULT_VOLATILITY_FACTOR = 0.5
+
+# Risk score when a portfolio has no holdings
+EMPTY_RISK_SCORE = 5.0
+
+
+def holdings_matrix(portfolios: Sequence[Sequence[Dict[str, Any]]]) -> Tuple[List[str], np.ndarray]:
+    """
+    Position values as a portfolios x symbols matrix.
+    
+    Holdings of the same symbol within a portfolio are summed; negative
+    values are treated as zero. Returns the column symbols and the matrix.
+    """
+    symbol_ids: Dict[str, int] = {}
+    rows, columns, values = [], [], []
+    for row, holdings in enumerate(portfolios):
+        for holding in holdings:
+            rows.append(row)
+            columns.append(symbol_ids.setdefault(holding['symbol'], len(symbol_ids)))
+            values.append(holding.get('total_value') or 0.0)
+    
+    matrix = np.zeros((len(portfolios), len(symbol_ids)))
+    np.add.at(matrix, (np.asarray(rows, dtype=np.intp), np.asarray(columns, dtype=np.intp)), values)
+    return list(symbol_ids), np.clip(matrix, 0.0, None)
+
+
+def weights(values: np.ndarray) -> np.ndarray:
+    """Row-normalize position values; empty portfolios get all-zero rows"""
+    totals = values.sum(axis=1, keepdims=True)
+    return np.divide(values, totals, out=np.zeros_like(values), where=totals > 0)
+
+
+def herfindahl(weights: np.ndarray) -> np.ndarray:
+    """Herfindahl-Hirschman index (sum of squared weights) per row"""
+    return (weights * weights).sum(axis=1)
+
+
+def diversification_scores(weights: np.ndarray) -> np.ndarray:
+    """
+    Diversification score (0-100) per portfolio.
+    
+    The Herfindahl index rescaled between a single position (0) and equal
+    weights across the portfolio's positions (100).
+    """
+    positions = np.count_nonzero(weights, axis=1)
+    floor = 1.0 / np.maximum(positions, 1)
+    spread = 1.0 - floor
+    excess = np.divide(herfindahl(weights) - floor, spread, out=np.ones(len(positions)), where=spread > 0)
+    return np.clip((1.0 - excess) * 100, 0.0, 100.0)
+
+
+def sector_weights(weights: np.ndarray, symbol_sectors: Sequence[str]) -> Tuple[List[str], np.ndarray]:
+    """Aggregate symbol weights into a portfolios x sectors matrix"""
+    sectors, sector_ids = np.unique(np.asarray(symbol_sectors, dtype=object), return_inverse=True)
+    membership = np.zeros((len(symbol_sectors), len(sectors)))
+    membership[np.arange(len(symbol_sectors)), sector_ids] = 1.0
+    return list(sectors), weights @ membership
+
+
+def calendar_dates(index: pd.Index) -> pd.DatetimeIndex:
+    """Exchange-local bar timestamps as tz-naive calendar dates"""
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.normalize()
+
+
+def returns_matrix(closes: Mapping[str, pd.Series]) -> pd.DataFrame:
+    """
+    Daily simple returns as a dates x symbols frame.
+    
+    Each symbol's returns come from its own close series before the join,
+    keyed by calendar date, so symbols on different exchanges or trading
+    calendars (US, NSE, 24/7 crypto) line up instead of cancelling out.
+    """
+    returns = {}
+    for symbol, close in closes.items():
+        change = close.sort_index().pct_change(fill_method=None)
+        change.index = calendar_dates(change.index)
+        returns[symbol] = change[~change.index.duplicated(keep='last')].dropna()
+    
+    if not returns:
+        return pd.DataFrame()
+    return pd.DataFrame(returns).sort_index().dropna(how='all')
+
+
+def covariance(returns: np.ndarray) -> np.ndarray:
+    """Annualized covariance of a dates x symbols returns matrix (missing days count as zero return)"""
+    returns = np.nan_to_num(returns)
+    centered = returns - returns.mean(axis=0)
+    return centered.T @ centered / max(len(returns) - 1, 1) * TRADING_DAYS
+
+
+def asset_betas(returns: np.ndarray, market_returns: np.ndarray) -> np.ndarray:
+    """Beta of every column of returns against market_returns"""
+    returns = np.nan_to_num(returns)
+    market = np.nan_to_num(market_returns) - np.nanmean(market_returns)
+    variance = market @ market
+    if variance <= 0:
+        return np.full(returns.shape[1], np.nan)
+    return market @ (returns - returns.mean(axis=0)) / variance
+
+
+def risk_scores(
+    effective_positions: np.ndarray,
+    effective_sectors: np.ndarray,
+    volatility: np.ndarray
+) -> np.ndarray:
+    """
+    Risk score (0-10, lower is safer) per portfolio.
+    
+    Fewer effective positions, fewer effective sectors and higher
+    volatility all raise the score; NaN volatility uses the default factor.
+    """
+    diversification_factor = np.minimum(effective_positions / 10, 1.0)
+    sector_factor = np.minimum(effective_sectors / 5, 1.0)
+    volatility_factor = np.where(
+        np.isnan(volatility), DEFAULT_VOLATILITY_FACTOR, np.clip(volatility / MAX_VOLATILITY, 0.0, 1.0)
+    )
+    scores = 10 - (diversification_factor * 3 + sector_factor * 3 + (1 - volatility_factor) * 4)
+    return np.clip(scores, 0.0, 10.0)
+
+
+class PortfolioAnalytics:
+    """
+    Scores portfolios in batches.
+    
+    Holdings become a portfolios x symbols weight matrix, so every metric is
+    one array expression over the whole batch: Herfindahl and sector
+    concentration from the weights, volatility from w Σ wᵀ over the
+    covariance of daily returns, and beta as the weighted asset betas.
+    Symbols without price history drop out of volatility and beta, which
+    are computed on the remaining weights.
+    """
+    
+    def score(
+        self,
+        portfolios: Sequence[Sequence[Dict[str, Any]]],
+        returns: Optional[pd.DataFrame] = None,
+        market_returns: Optional[pd.Series] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Metrics for each portfolio, given as a list of holding dicts
+        ('symbol', 'total_value', optional 'sector' or 'asset_type').
+        
+        returns is a dates x symbols frame of daily returns and
+        market_returns the benchmark's daily returns; without them
+        volatility and beta are None.
+        """
+        symbols, values = holdings_matrix(portfolios)
+        position_weights = weights(values)
+        
+        symbol_sectors = dict.fromkeys(symbols, 'other')
+        for holdings in portfolios:
+            for holding in holdings:
+                symbol_sectors[holding['symbol']] = holding.get('sector') or holding.get('asset_type') or 'other'
+        sectors, sector_matrix = sector_weights(position_weights, [symbol_sectors[symbol] for symbol in symbols])
+        
+        concentration = herfindahl(position_weights)
+        sector_concentration = herfindahl(sector_matrix)
+        volatility, beta = self._volatility_and_beta(symbols, position_weights, returns, market_returns)
+        
+        effective_positions = np.divide(1.0, concentration, out=np.zeros_like(concentration), where=concentration > 0)
+        effective_sectors = np.divide(
+            1.0, sector_concentration, out=np.zeros_like(sector_concentration), where=sector_concentration > 0
+        )
+        risk = risk_scores(effective_positions, effective_sectors, volatility)
+        risk[values.sum(axis=1) <= 0] = EMPTY_RISK_SCORE
+        diversification = diversification_scores(position_weights)
+        
+        top_sectors = sector_matrix.argmax(axis=1) if sectors else np.zeros(len(portfolios), dtype=np.intp)
+        return [
+            {
+                "risk_score": float(risk[i]),
+                "diversification_score": float(diversification[i]),
+                "herfindahl_index": float(concentration[i]),
+                "effective_positions": float(effective_positions[i]),
+                "sector_concentration": float(sector_concentration[i]),
+                "top_sector": sectors[top_sectors[i]] if concentration[i] > 0 else None,
+                "top_sector_weight": float(sector_matrix[i, top_sectors[i]]) if concentration[i] > 0 else 0.0,
+                "volatility": None if np.isnan(volatility[i]) else float(volatility[i]),
+                "beta": None if np.isnan(beta[i]) else float(beta[i])
+            }
+            for i in range(len(portfolios))
+        ]
+    
+    def _volatility_and_beta(
+        self,
+        symbols: List[str],
+        position_weights: np.ndarray,
+        returns: Optional[pd.DataFrame],
+        market_returns: Optional[pd.Series]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Annualized volatility and beta per portfolio (NaN where no history covers it)"""
+        volatility = np.full(len(position_weights), np.nan)
+        beta = np.full(len(position_weights), np.nan)
+        if returns is None or returns.empty:
+            return volatility, beta
+        
+        covered = [i for i, symbol in enumerate(symbols) if symbol in returns.columns]
+        if not covered:
+            return volatility, beta
+        
+        covered_weights = position_weights[:, covered]
+        coverage = covered_weights.sum(axis=1, keepdims=True)
+        covered_weights = np.divide(covered_weights, coverage, out=np.zeros_like(covered_weights), where=coverage > 0)
+        has_history = coverage[:, 0] > 0
+        
+        asset_returns = returns[[symbols[i] for i in covered]]
+        variance = ((covered_weights @ covariance(asset_returns.to_numpy())) * covered_weights).sum(axis=1)
+        volatility[has_history] = np.sqrt(np.maximum(variance[has_history], 0.0))
+        
+        if market_returns is not None:
+            aligned = pd.concat([asset_returns, market_returns.rename('__market__')], axis=1, join='inner')
+            aligned = aligned[aligned['__market__'].notna()]
+            if len(aligned) > 1:
+                betas = asset_betas(aligned.drop(columns='__market__').to_numpy(), aligned['__market__'].to_numpy())
+                beta[has_history] = (covered_weights @ betas)[has_history]
+        
+        return volatility, beta
+    
+    async def load_returns(self, symbols: Sequence[str], period: str = "1y") -> pd.DataFrame:
+        """Daily returns for symbols from stored history; symbols that fail to load are left out"""
+        symbols = list(dict.fromkeys(symbols))
+        frames = await asyncio.gather(
+            *(market_data_service.get_historical_frame(symbol, period) for symbol in symbols),
+            return_exceptions=True
+        )
+        
+        closes = {}
+        for symbol, frame in zip(symbols, frames):
+            if isinstance(frame, Exception):
+                logger.warning(f"No history for {symbol}, leaving it out of risk metrics: {str(frame)}")
+                continue
+            closes[symbol] = frame['Close']
+        
+        if not closes:
+            return pd.DataFrame()
+        return returns_matrix(closes)
+    
+    async def analyze(self, holdings: Sequence[Dict[str, Any]], period: str = "1y") -> Dict[str, Any]:
+        """Metrics for one portfolio, with volatility and beta from its symbols' price history"""
+        returns = await self.load_returns([*(holding['symbol'] for holding in holdings), MARKET_SYMBOL], period)
+        market_returns = returns[MARKET_SYMBOL] if MARKET_SYMBOL in returns.columns else None
+        return self.score([holdings], returns, market_returns)[0]
+
+
+# Global instance
+portfolio_analytics = PortfolioAnalytics()
\ No newline at end of file
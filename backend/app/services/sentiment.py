@@ -0,0 +1,177 @@
+"""
+Batch sentiment scoring for news text
+"""
+from typing import Any, Dict, List, Optional
+import asyncio
+import hashlib
+import math
+import re
+
+from textblob import TextBlob
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.workers import WorkerPool
+
+# Created lazily so each worker process builds its own lexicon once
+_analyzer: Optional[SentimentIntensityAnalyzer] = None
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _get_analyzer() -> SentimentIntensityAnalyzer:
+    global _analyzer
+    if _analyzer is None:
+        _analyzer = SentimentIntensityAnalyzer()
+    return _analyzer
+
+
+def score_text(text: str, use_textblob: bool = True) -> Dict[str, Any]:
+    """
+    Score one text with VADER, optionally averaged with TextBlob polarity.
+    
+    TextBlob is several times slower than VADER; skipping it trades a little
+    nuance for throughput.
+    """
+    if not text:
+        return {
+            'sentiment': 'neutral',
+            'score': 0.0,
+            'confidence': 0.0
+        }
+    
+    # Use VADER sentiment analyzer
+    compound_score = _get_analyzer().polarity_scores(text)['compound']
+    
+    # Determine sentiment
+    if compound_score >= 0.05:
+        sentiment = 'positive'
+    elif compound_score <= -0.05:
+        sentiment = 'negative'
+    else:
+        sentiment = 'neutral'
+    
+    if use_textblob:
+        # Combine with TextBlob polarity
+        final_score = (compound_score + TextBlob(text).sentiment.polarity) / 2
+    else:
+        final_score = compound_score
+    
+    return {
+        'sentiment': sentiment,
+        'score': final_score,
+        'confidence': min(abs(final_score), 1.0)
+    }
+
+
+def text_key(text: str, use_textblob: bool) -> str:
+    """
+    Cache key for a text's scores.
+    
+    Only whitespace is normalized: VADER weighs capitalization and
+    punctuation, so case-folding would change the result.
+    """
+    normalized = _WHITESPACE.sub(" ", text).strip()
+    digest = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+    return f"{'vt' if use_textblob else 'v'}:{digest}"
+
+
+def score_texts(texts: List[str], use_textblob: bool = True) -> List[Dict[str, Any]]:
+    """Score a batch of texts (runs inside a worker process)"""
+    return [score_text(text, use_textblob) for text in texts]
+
+
+class SentimentEngine:
+    """
+    Scores batches of texts on a process pool, split across workers.
+    
+    Results are memoized by content hash, so headlines that come back
+    across news, market-sentiment and symbol-news calls are scored once.
+    """
+    
+    def __init__(self):
+        self.use_textblob = settings.SENTIMENT_USE_TEXTBLOB
+        self.cache = LRUCache(settings.SENTIMENT_CACHE_MAX_SIZE)
+        self.hits = 0
+        self.misses = 0
+        self.pool = WorkerPool(
+            name="sentiment",
+            max_workers=settings.SENTIMENT_WORKERS,
+            use_processes=settings.SENTIMENT_USE_PROCESSES
+        )
+    
+    def score_one(self, text: str, use_textblob: Optional[bool] = None) -> Dict[str, Any]:
+        """Score a single text inline, through the cache"""
+        if use_textblob is None:
+            use_textblob = self.use_textblob
+        
+        key = text_key(text, use_textblob)
+        entry = self.cache.get(key)
+        if entry is not None:
+            self.hits += 1
+            return entry[0]
+        
+        self.misses += 1
+        result = score_text(text, use_textblob)
+        self.cache.set(key, result)
+        return result
+    
+    async def score(self, texts: List[str], use_textblob: Optional[bool] = None) -> List[Dict[str, Any]]:
+        """Score texts, preserving order; only cache misses reach the pool"""
+        if not texts:
+            return []
+        if use_textblob is None:
+            use_textblob = self.use_textblob
+        
+        keys = [text_key(text, use_textblob) for text in texts]
+        results: List[Optional[Dict[str, Any]]] = []
+        pending: Dict[str, str] = {}  # key -> text, deduplicated within the batch
+        for key, text in zip(keys, texts):
+            entry = self.cache.get(key)
+            if entry is not None:
+                self.hits += 1
+                results.append(entry[0])
+            else:
+                self.misses += 1
+                results.append(None)
+                pending.setdefault(key, text)
+        
+        if pending:
+            missing = list(pending.values())
+            chunk_size = math.ceil(len(missing) / self.pool.max_workers)
+            chunks = [missing[i:i + chunk_size] for i in range(0, len(missing), chunk_size)]
+            scored = await asyncio.gather(
+                *[self.pool.run(score_texts, chunk, use_textblob) for chunk in chunks]
+            )
+            fresh = dict(zip(pending, [result for chunk in scored for result in chunk]))
+            for key, result in fresh.items():
+                self.cache.set(key, result)
+            results = [result if result is not None else fresh[key] for key, result in zip(keys, results)]
+        
+        return results
+    
+    def clear_cache(self):
+        """Drop memoized scores"""
+        self.cache.clear()
+    
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """Cache and pool counters"""
+        lookups = self.hits + self.misses
+        return {
+            "cache_size": len(self.cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.cache.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "pool": self.pool.stats
+        }
+    
+    def shutdown(self):
+        """Stop worker processes"""
+        self.pool.shutdown()
+
+
+# Global instance
+sentiment_engine = SentimentEngine()
\ No newline at end of file
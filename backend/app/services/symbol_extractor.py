@@ -0,0 +1,252 @@
+"""
+Ticker and company-name extraction backed by an Aho-Corasick automaton
+"""
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import re
+
+from app.core.config import settings
+from app.services.listings import load_listings_or_builtin
+
+# Names and aliases always known, whether or not a universe file is present
+SEED_ALIASES = {
+    'apple': 'AAPL',
+    'microsoft': 'MSFT',
+    'google': 'GOOGL',
+    'alphabet': 'GOOGL',
+    'amazon': 'AMZN',
+    'tesla': 'TSLA',
+    'nvidia': 'NVDA',
+    'meta': 'META',
+    'facebook': 'META',
+    'netflix': 'NFLX',
+    'bitcoin': 'BTC-USD',
+    'ethereum': 'ETH-USD'
+}
+
+# Legal-form and share-class words stripped from listing names to get the
+# name people actually write ("Apple Inc. Common Stock" -> "apple")
+NAME_SUFFIXES = {
+    'inc', 'incorporated', 'corp', 'corporation', 'co', 'company', 'ltd',
+    'limited', 'plc', 'llc', 'lp', 'sa', 'ag', 'nv', 'se', 'holdings',
+    'holding', 'group', 'common', 'stock', 'shares', 'ordinary', 'class',
+    'a', 'b', 'c', 'adr', 'ads', 'the', 'new', 'trust', 'fund', 'etf'
+}
+
+# Tickers that are also words or common abbreviations; matched only as
+# cashtags or in ticker context ("(CAT)", "NYSE: CAT"), never bare
+AMBIGUOUS_TICKERS = {
+    'A', 'AI', 'ALL', 'AM', 'AN', 'ANY', 'ARE', 'AS', 'AT', 'BE', 'BIG',
+    'CAN', 'CEO', 'CFO', 'DD', 'EPS', 'ETF', 'EU', 'FOR', 'GDP', 'GO',
+    'HAS', 'HE', 'IPO', 'IT', 'IS', 'LOW', 'NEW', 'NOW', 'ON', 'ONE', 'OR',
+    'OUT', 'PE', 'RE', 'SEC', 'SO', 'TV', 'UK', 'US', 'USA', 'WELL',
+    'ACT', 'AGO', 'AIR', 'ALLY', 'APP', 'ARM', 'ART', 'BEST', 'BOX', 'BUY',
+    'CAR', 'CARS', 'CASH', 'CAT', 'COLD', 'COOL', 'CUT', 'DAY', 'DOG', 'EAT',
+    'EVER', 'EYE', 'FAST', 'FIVE', 'FLY', 'FUN', 'GAIN', 'GOOD', 'HOME',
+    'HOPE', 'HUGE', 'JOB', 'KEY', 'LIFE', 'LOVE', 'MAN', 'MAIN', 'MORE',
+    'MOVE', 'NEXT', 'NICE', 'NOTE', 'OPEN', 'PAY', 'PEAK', 'PLAY', 'REAL',
+    'RUN', 'SAFE', 'SEE', 'SHE', 'SKY', 'SUN', 'TALK', 'TEAM', 'TRUE', 'TWO',
+    'USE', 'VERY', 'WAY', 'WIN', 'WORK', 'YOU'
+}
+
+# First words of listing names too generic to stand in for the company
+GENERIC_NAME_TOKENS = {
+    'american', 'first', 'general', 'united', 'national', 'global',
+    'international', 'new', 'great', 'north', 'south', 'east', 'west',
+    'western', 'eastern', 'central', 'pacific', 'atlantic', 'bank', 'china',
+    'us', 'usa', 'royal', 'capital', 'energy', 'best', 'big', 'blue',
+    'green', 'golden', 'silver', 'advanced', 'applied', 'digital', 'premier'
+}
+
+_CASHTAG = re.compile(r"(?<![\w$])\$([A-Za-z][A-Za-z0-9.\-]{0,9})\b")
+# Bare tickers need 2+ characters: single letters (C, F, T) are too often
+# initials or series labels ("Series C"), so those only match as cashtags
+_BARE_TICKER = re.compile(r"(?<![\w$.\-])([A-Z][A-Z0-9]{1,4}(?:[.\-][A-Z]{1,2})?)(?![\w\-])")
+# Exchange-prefixed ("NYSE: F", "(Nasdaq: AAPL)") or parenthesized ("(CAT)") tickers
+_CONTEXT_TICKER = re.compile(
+    r"(?:\b(?:NYSE|NASDAQ|Nasdaq|AMEX|NYSEARCA|NYSE American|OTC|TSX|LSE)\s*:\s*"
+    r"(?P<listed>[A-Z]{1,5}(?:[.\-][A-Z]{1,2})?)"
+    r"|\((?P<quoted>[A-Z][A-Z0-9]{1,4}(?:[.\-][A-Z]{1,2})?)\))(?![\w\-])"
+)
+_NAME_TOKEN = re.compile(r"[a-z0-9&']+")
+
+
+def normalize_name(name: str) -> str:
+    """Lowercase a listing name and drop trailing legal-form/share-class words"""
+    tokens = _NAME_TOKEN.findall(name.lower().replace('.com', ''))
+    while tokens and tokens[-1] in NAME_SUFFIXES:
+        tokens.pop()
+    while tokens and tokens[0] == 'the':
+        tokens.pop(0)
+    return ' '.join(tokens)
+
+
+class AhoCorasick:
+    """Multi-pattern matcher: one pass over the text finds every pattern occurrence"""
+    
+    def __init__(self, patterns: Iterable[Tuple[str, str]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, str]]] = [[]]
+        
+        for pattern, value in patterns:
+            self._add(pattern, value)
+        self._build()
+    
+    def _add(self, pattern: str, value: str):
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = next_node
+        self._out[node].append((len(pattern), value))
+    
+    def _build(self):
+        # Breadth-first so every failure link points at an already-finished node
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+    
+    def __len__(self) -> int:
+        return len(self._goto)
+    
+    def iter_matches(self, text: str):
+        """Yield (start, end, value) for every occurrence, overlapping included"""
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for length, value in out[node]:
+                yield index - length + 1, index + 1, value
+
+
+class SymbolExtractor:
+    """
+    Finds the tickers a piece of text talks about.
+    
+    Four kinds of mention are recognized:
+        - cashtags ($AAPL, any case) for any known ticker
+        - tickers in context: after an exchange prefix (NYSE: F) or alone in
+          parentheses (CAT), including ones that double as words
+        - bare all-caps tickers (NVDA) of two or more characters, except
+          ones that double as words
+        - company names and aliases, on word boundaries; single-word names
+          must be capitalized so "apple pie" or "target date" don't match.
+          A name's first word is an alias too when no other listing starts
+          with it and it isn't generic ("Ford Motor Company" -> "Ford")
+    
+    Overlapping name matches resolve to the longest one, so "Bank of America"
+    doesn't also count as "America".
+    """
+    
+    def __init__(self, universe: Iterable[Tuple[str, str]] = (), aliases: Optional[Dict[str, str]] = None):
+        self.tickers: Set[str] = set()
+        names: Dict[str, str] = {}
+        first_tokens: Dict[str, Set[str]] = {}
+        
+        for symbol, name in universe:
+            self.tickers.add(symbol)
+            normalized = normalize_name(name)
+            if len(normalized) >= 3:
+                # First listing wins when several share a name
+                names.setdefault(normalized, symbol)
+                first_tokens.setdefault(normalized.split(' ')[0], set()).add(symbol)
+        
+        for token, symbols in first_tokens.items():
+            if len(symbols) == 1 and len(token) >= 3 and token not in GENERIC_NAME_TOKENS:
+                names.setdefault(token, next(iter(symbols)))
+        
+        for alias, symbol in (aliases if aliases is not None else SEED_ALIASES).items():
+            self.tickers.add(symbol)
+            names[alias] = symbol
+        
+        self.name_count = len(names)
+        self._automaton = AhoCorasick(names.items())
+    
+    @classmethod
+    def from_file(cls, path: str) -> "SymbolExtractor":
+        """Build from a listing file (see app.services.listings)"""
+        return cls((listing['symbol'], listing['name']) for listing in load_listings_or_builtin(path))
+    
+    def extract(self, text: str) -> List[str]:
+        """Symbols mentioned in text, in order of first mention"""
+        if not text:
+            return []
+        
+        found: List[Tuple[int, str]] = []
+        
+        for match in _CASHTAG.finditer(text):
+            symbol = match.group(1).upper()
+            if symbol in self.tickers:
+                found.append((match.start(), symbol))
+        
+        for match in _CONTEXT_TICKER.finditer(text):
+            symbol = match.group('listed') or match.group('quoted')
+            if symbol in self.tickers:
+                found.append((match.start(), symbol))
+        
+        for match in _BARE_TICKER.finditer(text):
+            symbol = match.group(1)
+            if symbol in self.tickers and symbol not in AMBIGUOUS_TICKERS:
+                found.append((match.start(), symbol))
+        
+        found.extend(self._match_names(text))
+        found.sort()
+        
+        seen: Dict[str, None] = {}
+        for _, symbol in found:
+            seen.setdefault(symbol, None)
+        return list(seen)
+    
+    def _match_names(self, text: str) -> List[Tuple[int, str]]:
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            # A few characters lowercase to two; keep offsets aligned with text
+            lowered = ''.join(char.lower() if len(char.lower()) == 1 else char for char in text)
+        length = len(lowered)
+        candidates = []
+        
+        for start, end, symbol in self._automaton.iter_matches(lowered):
+            if start > 0 and lowered[start - 1].isalnum():
+                continue
+            if end < length and lowered[end].isalnum():
+                continue
+            if ' ' not in lowered[start:end] and not text[start].isupper():
+                continue
+            candidates.append((start, -(end - start), end, symbol))
+        
+        # Leftmost-longest, non-overlapping
+        matches = []
+        covered_until = 0
+        for start, _, end, symbol in sorted(candidates):
+            if start >= covered_until:
+                matches.append((start, symbol))
+                covered_until = end
+        return matches
+    
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Universe size"""
+        return {
+            "tickers": len(self.tickers),
+            "names": self.name_count,
+            "automaton_states": len(self._automaton)
+        }
+
+
+# Global instance
+symbol_extractor = SymbolExtractor.from_file(settings.SYMBOL_UNIVERSE_PATH)
\ No newline at end of file
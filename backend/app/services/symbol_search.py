@@ -0,0 +1,272 @@
+"""
+In-memory symbol search index: symbol prefix, name-token prefix and
+typo-tolerant matching with ranking
+"""
+from bisect import bisect_left
+from typing import Any, Dict, List, Tuple
+import heapq
+import re
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.services.listings import load_listings_or_builtin
+
+# Ranking weights
+SYMBOL_EXACT = 10.0
+SYMBOL_PREFIX = 6.0
+TOKEN_EXACT = 3.0
+TOKEN_PREFIX = 2.0
+TOKEN_FUZZY = 1.0
+LEADING_TOKEN_BONUS = 1.0
+
+# Upper bound on vocabulary entries a prefix expands to (keeps 1-2 letter
+# prefixes cheap)
+MAX_PREFIX_EXPANSIONS = 64
+
+# Shorter terms are too ambiguous to correct
+FUZZY_MIN_LENGTH = 4
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_SYMBOL_CHARS = re.compile(r"[^a-z0-9.\-^=]")
+
+
+def _tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+def _deletes(word: str) -> List[str]:
+    """Every string one deletion away from word"""
+    return [word[:i] + word[i + 1:] for i in range(len(word))]
+
+
+def _within_one_edit(a: str, b: str) -> bool:
+    """Whether a and b differ by at most one insertion, deletion, substitution or adjacent swap"""
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    
+    prefix = 0
+    while prefix < min(len(a), len(b)) and a[prefix] == b[prefix]:
+        prefix += 1
+    
+    if len(a) == len(b):
+        return (
+            a[prefix + 1:] == b[prefix + 1:] or
+            (a[prefix + 2:] == b[prefix + 2:] and a[prefix:prefix + 2] == b[prefix:prefix + 2][::-1])
+        )
+    shorter, longer = (a, b) if len(a) < len(b) else (b, a)
+    return shorter[prefix:] == longer[prefix + 1:]
+
+
+class SymbolSearchIndex:
+    """
+    Search index over a listing universe, built once at startup.
+    
+    A query matches listings whose symbol equals or starts with it, or whose
+    name contains every query term: earlier terms as whole tokens, the last
+    one (still being typed) as a token prefix. Terms with no such match fall
+    back to tokens one edit away, found through a deletion-neighbourhood
+    lookup rather than a vocabulary scan.
+    
+    Posting lists are kept in rank order (shorter names first, the same
+    tie-break the results use), so a single-term query only reads the head
+    of each list it touches; multi-term queries intersect per-term matches
+    starting from the rarest term. Results for
+    repeated queries come from an LRU cache, since autocomplete sends the
+    same prefixes over and over.
+    """
+    
+    def __init__(self, listings: List[Dict[str, Any]], cache_size: int = 2048):
+        self.listings = listings
+        self._symbol_ids: Dict[str, int] = {}
+        self._listing_tokens: List[Tuple[str, ...]] = []
+        self._leading_ids: Dict[str, List[int]] = {}  # token -> listings whose name starts with it
+        self._other_ids: Dict[str, List[int]] = {}  # token -> listings with it elsewhere in the name
+        
+        for listing_id, listing in enumerate(listings):
+            self._symbol_ids.setdefault(listing['symbol'].lower(), listing_id)
+            self._listing_tokens.append(tuple(dict.fromkeys(_tokenize(listing['name']))))
+        
+        order = sorted(range(len(listings)), key=lambda i: (len(listings[i]['name']), listings[i]['symbol']))
+        self._rank = [0] * len(listings)
+        for rank, listing_id in enumerate(order):
+            self._rank[listing_id] = rank
+            tokens = self._listing_tokens[listing_id]
+            for position, token in enumerate(tokens):
+                postings = self._leading_ids if position == 0 else self._other_ids
+                postings.setdefault(token, []).append(listing_id)
+        
+        self._symbols = sorted(self._symbol_ids)
+        self._vocabulary = sorted(set(self._leading_ids) | set(self._other_ids))
+        
+        self._neighbours: Dict[str, List[str]] = {}
+        for token in self._vocabulary:
+            if len(token) >= FUZZY_MIN_LENGTH:
+                for variant in {token, *_deletes(token)}:
+                    self._neighbours.setdefault(variant, []).append(token)
+        
+        self.cache = LRUCache(cache_size)
+        self.hits = 0
+        self.misses = 0
+    
+    @classmethod
+    def from_file(cls, path: str) -> "SymbolSearchIndex":
+        """Build from a listing file (see app.services.listings)"""
+        return cls(load_listings_or_builtin(path), settings.SYMBOL_SEARCH_CACHE_SIZE)
+    
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Top matches for query, best first"""
+        terms = _tokenize(query)
+        if not terms:
+            return []
+        
+        key = f"{limit}:{query.strip().lower()}"
+        entry = self.cache.get(key)
+        if entry is not None:
+            self.hits += 1
+            return entry[0]
+        
+        self.misses += 1
+        results = self._search(query, terms, limit)
+        self.cache.set(key, results)
+        return results
+    
+    def _search(self, query: str, terms: List[str], limit: int) -> List[Dict[str, Any]]:
+        scores = self._match_symbols(query, limit)
+        
+        if len(terms) == 1:
+            name_scores = self._match_single_term(terms[0], limit)
+        else:
+            name_scores = self._match_terms(terms)
+        for listing_id, score in name_scores.items():
+            scores[listing_id] = scores.get(listing_id, 0.0) + score
+        
+        best = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], self._rank[item[0]]))
+        return [
+            {
+                'symbol': self.listings[listing_id]['symbol'],
+                'name': self.listings[listing_id]['name'],
+                'exchange': self.listings[listing_id].get('exchange')
+            }
+            for listing_id, _ in best
+        ]
+    
+    def _match_symbols(self, query: str, limit: int) -> Dict[int, float]:
+        """Listings whose symbol equals or starts with the query"""
+        scores: Dict[int, float] = {}
+        compact = _SYMBOL_CHARS.sub('', query.lower())
+        if not compact:
+            return scores
+        
+        start = bisect_left(self._symbols, compact)
+        for symbol in self._symbols[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not symbol.startswith(compact):
+                break
+            if symbol == compact:
+                scores[self._symbol_ids[symbol]] = SYMBOL_EXACT
+            else:
+                scores[self._symbol_ids[symbol]] = max(SYMBOL_PREFIX - 0.5 * (len(symbol) - len(compact)), TOKEN_PREFIX)
+        return scores
+    
+    def _match_single_term(self, term: str, limit: int) -> Dict[int, float]:
+        """
+        Name matches for a one-term query.
+        
+        Every listing in one posting list gets the same score, so only the
+        first limit entries of each list can make the top results.
+        """
+        scores: Dict[int, float] = {}
+        
+        def add(token: str, score: float):
+            for postings, bonus in ((self._leading_ids, LEADING_TOKEN_BONUS), (self._other_ids, 0.0)):
+                for listing_id in postings.get(token, ())[:limit]:
+                    if scores.get(listing_id, 0.0) < score + bonus:
+                        scores[listing_id] = score + bonus
+        
+        start = bisect_left(self._vocabulary, term)
+        for token in self._vocabulary[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not token.startswith(term):
+                break
+            add(token, TOKEN_EXACT if token == term else TOKEN_PREFIX)
+        
+        if not scores:
+            for token in self._fuzzy_tokens(term):
+                add(token, TOKEN_FUZZY)
+        return scores
+    
+    def _match_terms(self, terms: List[str]) -> Dict[int, float]:
+        """Name matches for a multi-term query: every term must match"""
+        per_term = sorted(
+            (self._match_term(term, prefix=position == len(terms) - 1) for position, term in enumerate(terms)),
+            key=len
+        )
+        
+        # Intersect starting from the rarest term
+        candidates = per_term[0]
+        for term_scores in per_term[1:]:
+            if not candidates:
+                break
+            candidates = {
+                listing_id: score + term_scores[listing_id]
+                for listing_id, score in candidates.items()
+                if listing_id in term_scores
+            }
+        
+        for listing_id in candidates:
+            tokens = self._listing_tokens[listing_id]
+            if tokens and tokens[0].startswith(terms[0]):
+                candidates[listing_id] += LEADING_TOKEN_BONUS
+        return candidates
+    
+    def _match_term(self, term: str, prefix: bool) -> Dict[int, float]:
+        """Every listing whose name matches term, with the term's score"""
+        scores: Dict[int, float] = {}
+        
+        if prefix:
+            start = bisect_left(self._vocabulary, term)
+            tokens = [
+                token for token in self._vocabulary[start:start + MAX_PREFIX_EXPANSIONS]
+                if token.startswith(term)
+            ]
+        else:
+            tokens = [term]
+        
+        for token in tokens:
+            score = TOKEN_EXACT if token == term else TOKEN_PREFIX
+            for postings in (self._leading_ids, self._other_ids):
+                for listing_id in postings.get(token, ()):
+                    if scores.get(listing_id, 0.0) < score:
+                        scores[listing_id] = score
+        
+        if not scores:
+            for token in self._fuzzy_tokens(term):
+                for postings in (self._leading_ids, self._other_ids):
+                    scores.update(dict.fromkeys(postings.get(token, ()), TOKEN_FUZZY))
+        return scores
+    
+    def _fuzzy_tokens(self, term: str) -> List[str]:
+        """Vocabulary tokens one edit away from term"""
+        if len(term) < FUZZY_MIN_LENGTH:
+            return []
+        candidates = set()
+        for variant in (term, *_deletes(term)):
+            candidates.update(self._neighbours.get(variant, ()))
+        return [token for token in candidates if _within_one_edit(term, token)]
+    
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """Index size and query cache counters"""
+        lookups = self.hits + self.misses
+        return {
+            "listings": len(self.listings),
+            "tokens": len(self._vocabulary),
+            "cache_size": len(self.cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+
+# Global instance
+symbol_index = SymbolSearchIndex.from_file(settings.SYMBOL_UNIVERSE_PATH)
\ No newline at end of file
@@ -0,0 +1,3 @@
+"""
+Performance benchmarks (run as scripts, e.g. python -m benchmarks.bench_historical)
+"""
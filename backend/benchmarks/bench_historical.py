@@ -0,0 +1,69 @@
+"""
+Benchmark historical-data serialization: iterrows vs vectorized layouts
+
+Usage: python -m benchmarks.bench_historical [rows]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.services.market_data import history_to_columns, history_to_records
+
+
+def make_history(rows: int) -> pd.DataFrame:
+    """Synthetic daily OHLCV frame shaped like yfinance history()"""
+    index = pd.date_range("1980-01-01", periods=rows, freq="D", tz="America/New_York")
+    close = 100 + np.random.randn(rows).cumsum()
+    return pd.DataFrame(
+        {
+            "Open": close + np.random.rand(rows),
+            "High": close + 1,
+            "Low": close - 1,
+            "Close": close,
+            "Volume": np.random.randint(1_000, 1_000_000, rows),
+        },
+        index=index,
+    )
+
+
+def iterrows_records(hist: pd.DataFrame) -> list:
+    """Previous per-row implementation, kept for comparison"""
+    data = []
+    for date, row in hist.iterrows():
+        data.append({
+            'date': date.isoformat(),
+            'open': row['Open'],
+            'high': row['High'],
+            'low': row['Low'],
+            'close': row['Close'],
+            'volume': row['Volume']
+        })
+    return data
+
+
+def timed(func, hist: pd.DataFrame, repeat: int = 5) -> float:
+    """Best-of-N wall time in milliseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(hist)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 11_000
+    hist = make_history(rows)
+    
+    baseline = timed(iterrows_records, hist, repeat=1)
+    print(f"rows={rows}")
+    print(f"iterrows records:   {baseline:8.2f} ms")
+    for name, func in (("vectorized records", history_to_records), ("columns", history_to_columns)):
+        elapsed = timed(func, hist)
+        print(f"{name + ':':<19} {elapsed:8.2f} ms  ({baseline / elapsed:5.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
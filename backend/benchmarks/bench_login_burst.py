@@ -0,0 +1,65 @@
+"""
+Benchmark event-loop stalls caused by a burst of bcrypt logins
+
+A probe coroutine stands in for market endpoints served by the same worker:
+it sleeps 10ms in a loop and records how late each wake-up is. The burst is
+run twice, once verifying passwords inline on the loop (the old behaviour)
+and once through the password worker pool.
+
+Usage: python -m benchmarks.bench_login_burst [logins]
+"""
+import asyncio
+import sys
+import time
+
+from app.core.security import get_password_hash, password_pool, verify_password, verify_password_async
+
+PROBE_INTERVAL = 0.01
+
+
+async def probe(lags: list, stop: asyncio.Event):
+    """Record how late each PROBE_INTERVAL sleep wakes up"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(time.perf_counter() - start - PROBE_INTERVAL)
+
+
+async def inline_login(hashed: str):
+    verify_password("correct horse battery staple", hashed)
+
+
+async def pooled_login(hashed: str):
+    await verify_password_async("correct horse battery staple", hashed)
+
+
+async def burst(login, logins: int, hashed: str):
+    lags = []
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(lags, stop))
+    
+    start = time.perf_counter()
+    await asyncio.gather(*[login(hashed) for _ in range(logins)])
+    elapsed = time.perf_counter() - start
+    
+    stop.set()
+    await probe_task
+    lags.sort()
+    p99 = lags[min(len(lags) - 1, int(len(lags) * 0.99))] if lags else 0.0
+    max_lag = lags[-1] if lags else 0.0
+    print(f"{login.__name__:<13} {logins} logins in {elapsed:6.2f}s  "
+          f"probe wake-ups={len(lags):4d}  loop lag p99={p99 * 1000:7.1f}ms max={max_lag * 1000:7.1f}ms")
+
+
+async def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    hashed = get_password_hash("correct horse battery staple")
+    
+    await burst(inline_login, logins, hashed)
+    await burst(pooled_login, logins, hashed)
+    print(f"pool: {password_pool.stats}")
+    password_pool.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,76 @@
+"""
+Benchmark database sessions per request with and without connection pooling
+
+Each simulated request does what an authenticated endpoint does on a user
+cache miss: open a session via the session factory, load the user by email
+and close the session. It runs once on a NullPool engine (the old
+behaviour, a new connection per request) and once on the configured
+InstrumentedPool, against DATABASE_URL, without needing an API server.
+
+Usage: python -m benchmarks.bench_pool [requests] [concurrency]
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+import app.models.chat  # noqa: F401 (register every table for create_all)
+import app.models.market  # noqa: F401
+import app.models.portfolio  # noqa: F401
+from app.core.database import Base, database_url, engine, get_pool_stats
+from app.crud import user as crud_user
+from app.models.user import User
+
+EMAIL = "bench-pool@example.com"
+
+
+async def ensure_user():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_sessionmaker(engine, class_=AsyncSession)() as db:
+        if await crud_user.get_user_by_email(db, EMAIL) is None:
+            db.add(User(email=EMAIL, first_name="Bench", last_name="Pool", hashed_password="x"))
+            await db.commit()
+
+
+async def run(label: str, session_factory, requests: int, concurrency: int):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def request():
+        async with semaphore:
+            start = time.perf_counter()
+            async with session_factory() as db:
+                await crud_user.get_user_by_email(db, EMAIL)
+            latencies.append(time.perf_counter() - start)
+    
+    start = time.perf_counter()
+    await asyncio.gather(*[request() for _ in range(requests)])
+    elapsed = time.perf_counter() - start
+    
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{label:<9} {requests / elapsed:8.0f} req/s  "
+          f"p50={statistics.median(latencies) * 1000:6.2f}ms  p95={p95 * 1000:6.2f}ms")
+
+
+async def main(requests: int, concurrency: int):
+    await ensure_user()
+    
+    unpooled = create_async_engine(database_url, poolclass=NullPool)
+    await run("NullPool", async_sessionmaker(unpooled, class_=AsyncSession), requests, concurrency)
+    await unpooled.dispose()
+    
+    await run("pooled", async_sessionmaker(engine, class_=AsyncSession), requests, concurrency)
+    print(f"pool: {get_pool_stats()}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 2000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    ))
\ No newline at end of file
@@ -0,0 +1,79 @@
+"""
+Benchmark batch portfolio scoring
+
+Scores synthetic portfolios drawn from a symbol universe with a year of
+simulated daily returns, through the vectorized PortfolioAnalytics and
+through a per-portfolio loop computing the same covariance risk. Checks
+that both agree.
+
+Usage: python -m benchmarks.bench_portfolio_analytics [portfolios] [universe_size] [holdings]
+"""
+import random
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.services.portfolio_analytics import TRADING_DAYS, PortfolioAnalytics
+
+SECTORS = ['Technology', 'Financial', 'Healthcare', 'Energy', 'Industrial', 'Utilities']
+
+
+def make_universe(size: int):
+    rng = np.random.default_rng(3)
+    symbols = [f"SYM{i}" for i in range(size)]
+    market = rng.normal(0.0004, 0.01, TRADING_DAYS)
+    betas = rng.uniform(0.5, 1.5, size)
+    noise = rng.normal(0.0, 0.015, (TRADING_DAYS, size))
+    dates = pd.bdate_range("2024-01-01", periods=TRADING_DAYS)
+    returns = pd.DataFrame(market[:, None] * betas + noise, index=dates, columns=symbols)
+    sectors = {symbol: SECTORS[i % len(SECTORS)] for i, symbol in enumerate(symbols)}
+    return returns, pd.Series(market, index=dates), sectors
+
+
+def make_portfolios(count: int, holdings: int, symbols: list, sectors: dict) -> list:
+    rng = random.Random(5)
+    return [
+        [
+            {'symbol': symbol, 'sector': sectors[symbol], 'total_value': rng.uniform(100, 10000)}
+            for symbol in rng.sample(symbols, rng.randint(1, holdings))
+        ]
+        for _ in range(count)
+    ]
+
+
+def loop_volatility(holdings: list, returns: pd.DataFrame) -> float:
+    """One portfolio at a time: weights, covariance submatrix, w Σ wᵀ"""
+    total = sum(holding['total_value'] for holding in holdings)
+    weights = np.array([holding['total_value'] / total for holding in holdings])
+    covariance = returns[[holding['symbol'] for holding in holdings]].cov().to_numpy() * TRADING_DAYS
+    return float(np.sqrt(weights @ covariance @ weights))
+
+
+def main(count: int, size: int, holdings: int):
+    returns, market_returns, sectors = make_universe(size)
+    portfolios = make_portfolios(count, holdings, list(returns.columns), sectors)
+    analytics = PortfolioAnalytics()
+    
+    start = time.perf_counter()
+    results = analytics.score(portfolios, returns, market_returns)
+    elapsed = time.perf_counter() - start
+    print(f"vectorized: {count / elapsed:10.0f} portfolios/s  ({elapsed * 1000:.0f} ms for {count})")
+    
+    sample = portfolios[:max(count // 20, 1)]
+    start = time.perf_counter()
+    expected = [loop_volatility(holdings, returns) for holdings in sample]
+    elapsed = time.perf_counter() - start
+    print(f"loop:       {len(sample) / elapsed:10.0f} portfolios/s  (sampled {len(sample)})")
+    
+    error = max(abs(result['volatility'] - volatility) for result, volatility in zip(results, expected))
+    print(f"max volatility difference: {error:.2e}")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 5000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 500,
+        int(sys.argv[3]) if len(sys.argv) > 3 else 30
+    )
\ No newline at end of file
@@ -0,0 +1,135 @@
+"""
+Benchmark holding revaluation throughput
+
+Seeds a scratch database with holdings spread over a set of symbols, then
+reprices them twice: row by row through update_holding_price (the old
+path, timed on a sample and extrapolated) and in bulk through
+revalue_holdings. Portfolio totals are rebuilt from the holdings first,
+so both paths also maintain them. Finally times get_portfolio_summary,
+which reads the stored totals, against the SUM/COUNT aggregate it used
+to run.
+
+Usage:
+    python -m benchmarks.bench_revaluation [holdings] [symbols] \
+        [--database-url sqlite+aiosqlite:///bench_revaluation.db]
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.database import Base
+from app.crud import portfolio as crud_portfolio
+from app.models import chat, market, user  # noqa: F401 (register tables)
+from app.models.portfolio import Holding, Portfolio
+from app.models.user import User
+
+ROW_SAMPLE = 500
+HOLDINGS_PER_PORTFOLIO = 20
+SUMMARY_SAMPLE = 2000
+
+
+async def seed(session_factory, holdings: int, symbols: list):
+    rng = random.Random(1)
+    rows = []
+    for i in range(holdings):
+        shares = rng.uniform(1, 500)
+        price = rng.uniform(5, 500)
+        rows.append({
+            'portfolio_id': i // HOLDINGS_PER_PORTFOLIO + 1,
+            'symbol': rng.choice(symbols),
+            'asset_type': 'stock',
+            'name': 'Bench',
+            'shares': shares,
+            'average_price': price,
+            'current_price': price,
+            'total_value': shares * price,
+            'gain_loss': 0.0,
+            'gain_loss_percent': 0.0
+        })
+    portfolios = [
+        {'id': portfolio_id, 'user_id': 1, 'name': 'Bench'}
+        for portfolio_id in range(1, (holdings - 1) // HOLDINGS_PER_PORTFOLIO + 2)
+    ]
+    async with session_factory() as db:
+        await db.execute(insert(User.__table__), [{
+            'id': 1, 'email': 'bench@example.com', 'hashed_password': '-',
+            'first_name': 'Bench', 'last_name': 'User'
+        }])
+        await db.execute(insert(Portfolio.__table__), portfolios)
+        for start in range(0, len(rows), 10000):
+            await db.execute(insert(Holding.__table__), rows[start:start + 10000])
+        await db.commit()
+        await crud_portfolio.check_portfolio_totals(db, repair=True)
+    return len(portfolios)
+
+
+async def aggregate_summary(db, portfolio_id: int):
+    """The SUM/COUNT query get_portfolio_summary ran before totals were stored"""
+    result = await db.execute(
+        select(
+            func.sum(Holding.total_value),
+            func.sum(Holding.shares * Holding.average_price),
+            func.sum(Holding.gain_loss),
+            func.count(Holding.id)
+        )
+        .where(Holding.portfolio_id == portfolio_id)
+    )
+    return result.first()
+
+
+async def run(args: argparse.Namespace):
+    engine = create_async_engine(args.database_url)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    
+    symbols = [f"SYM{i}" for i in range(args.symbols)]
+    portfolios = await seed(session_factory, args.holdings, symbols)
+    prices = {symbol: random.uniform(5, 500) for symbol in symbols}
+    
+    async with session_factory() as db:
+        start = time.perf_counter()
+        for holding_id in range(1, ROW_SAMPLE + 1):
+            await crud_portfolio.update_holding_price(db, holding_id, 123.45)
+        per_row = (time.perf_counter() - start) / ROW_SAMPLE
+    print(f"row by row: {1 / per_row:10.0f} holdings/s  "
+          f"(~{per_row * args.holdings:.1f} s for {args.holdings} holdings, sampled {ROW_SAMPLE})")
+    
+    async with session_factory() as db:
+        start = time.perf_counter()
+        updated = await crud_portfolio.revalue_holdings(db, prices)
+        elapsed = time.perf_counter() - start
+    print(f"bulk:       {updated / elapsed:10.0f} holdings/s  "
+          f"({elapsed:.2f} s for {updated} holdings over {len(prices)} symbols)")
+    
+    async with session_factory() as db:
+        drifted = await crud_portfolio.check_portfolio_totals(db)
+    print(f"drifted portfolios after revaluation: {len(drifted)}")
+    
+    sample = [random.randint(1, portfolios) for _ in range(SUMMARY_SAMPLE)]
+    async with session_factory() as db:
+        for label, read in (("aggregate", aggregate_summary), ("stored", crud_portfolio.get_portfolio_summary)):
+            start = time.perf_counter()
+            for portfolio_id in sample:
+                await read(db, portfolio_id)
+            elapsed = time.perf_counter() - start
+            print(f"summary ({label}): {elapsed / SUMMARY_SAMPLE * 1e6:8.0f} us/read")
+    
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("holdings", type=int, nargs="?", default=100000)
+    parser.add_argument("symbols", type=int, nargs="?", default=2000)
+    parser.add_argument("--database-url", default="sqlite+aiosqlite:///bench_revaluation.db")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
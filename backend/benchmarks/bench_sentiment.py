@@ -0,0 +1,70 @@
+"""
+Benchmark news sentiment scoring throughput (articles/sec)
+
+Scores a synthetic page of headlines four ways: inline one at a time (the
+old per-article path), and through the sentiment worker pool, each with and
+without TextBlob. The pooled pass starts from an empty cache; a second
+pooled pass over the same page shows the memoized rate.
+
+Usage: python -m benchmarks.bench_sentiment [articles]
+"""
+import asyncio
+import random
+import sys
+import time
+
+from app.services.sentiment import score_text, sentiment_engine
+
+SUBJECTS = ["Apple", "Tesla", "The Fed", "Oil prices", "Nvidia", "Treasury yields", "Bitcoin", "Retail sales"]
+EVENTS = [
+    "surge after record quarterly earnings beat expectations",
+    "slump as investors fear a slowdown in consumer demand",
+    "hold steady ahead of the central bank decision",
+    "rally on strong guidance and upbeat analyst upgrades",
+    "tumble after regulators open an antitrust investigation",
+    "edge lower in quiet trading before the holiday"
+]
+
+
+def make_articles(count: int) -> list:
+    rng = random.Random(42)
+    return [
+        f"{rng.choice(SUBJECTS)} {rng.choice(EVENTS)}, moving {rng.uniform(0.1, 9.9):.2f}%. "
+        f"Analysts said the move reflects {rng.choice(EVENTS)} across the sector."
+        for _ in range(count)
+    ]
+
+
+def report(label: str, count: int, elapsed: float):
+    print(f"{label:<28} {count / elapsed:10.1f} articles/s  ({elapsed * 1000:.1f} ms)")
+
+
+async def main(count: int):
+    articles = make_articles(count)
+    
+    # Start the worker processes before timing
+    await sentiment_engine.score(articles[:sentiment_engine.pool.max_workers])
+    
+    for use_textblob in (True, False):
+        suffix = "vader+textblob" if use_textblob else "vader only"
+        
+        start = time.perf_counter()
+        for text in articles:
+            score_text(text, use_textblob)
+        report(f"inline ({suffix})", count, time.perf_counter() - start)
+        
+        sentiment_engine.clear_cache()
+        start = time.perf_counter()
+        await sentiment_engine.score(articles, use_textblob=use_textblob)
+        report(f"pooled ({suffix})", count, time.perf_counter() - start)
+        
+        start = time.perf_counter()
+        await sentiment_engine.score(articles, use_textblob=use_textblob)
+        report(f"cached ({suffix})", count, time.perf_counter() - start)
+    
+    print(f"cache: {sentiment_engine.stats}")
+    sentiment_engine.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
\ No newline at end of file
@@ -0,0 +1,56 @@
+"""
+Benchmark symbol search latency for autocomplete
+
+Replays every keystroke prefix of a set of company names and tickers
+against the search index, cold (cache cleared before each query) and warm.
+Uses the configured listing file when present.
+
+Usage: python -m benchmarks.bench_symbol_search [queries]
+"""
+import random
+import sys
+import time
+
+from app.services.symbol_search import symbol_index
+
+
+def keystrokes(count: int) -> list:
+    rng = random.Random(5)
+    listings = rng.sample(symbol_index.listings, min(count, len(symbol_index.listings)))
+    queries = []
+    for listing in listings:
+        text = rng.choice([listing['symbol'], listing['name'].lower()])
+        queries.extend(text[:i] for i in range(1, min(len(text), 12) + 1))
+    return queries
+
+
+def run(queries: list, cold: bool) -> list:
+    latencies = []
+    for query in queries:
+        if cold:
+            symbol_index.cache.clear()
+        start = time.perf_counter()
+        symbol_index.search(query)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return latencies
+
+
+def report(label: str, latencies: list):
+    def percentile(p: float) -> float:
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1e6
+    
+    print(f"{label:<5} n={len(latencies)} p50={percentile(0.50):.0f}us "
+          f"p95={percentile(0.95):.0f}us p99={percentile(0.99):.0f}us max={latencies[-1] * 1e6:.0f}us")
+
+
+def main(count: int):
+    print(symbol_index.stats)
+    queries = keystrokes(count)
+    report("cold", run(queries, cold=True))
+    run(queries, cold=False)
+    report("warm", run(queries, cold=False))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
\ No newline at end of file
@@ -0,0 +1,118 @@
+"""
+Benchmark symbol extraction per article
+
+Compares the shared Aho-Corasick extractor against the old per-keyword
+substring scan over the same name list. Uses the configured universe file
+when present, otherwise a synthetic universe of the requested size.
+Known extraction regressions are checked first.
+
+Usage: python -m benchmarks.bench_symbols [universe_size] [articles]
+"""
+import os
+import random
+import sys
+import time
+
+from app.core.config import settings
+from app.services.listings import load_listings
+from app.services.symbol_extractor import SymbolExtractor, normalize_name
+
+WORDS = [
+    "north", "global", "pacific", "energy", "bio", "systems", "capital", "digital",
+    "river", "summit", "therapeutics", "networks", "silver", "harbor", "micro", "solar"
+]
+
+
+# (text, expected symbols) checked against a small fixed universe before timing
+REGRESSION_CASES = [
+    ("The startup closed its Series C funding round", []),
+    ("Citigroup ($C) and Ford ($F) reported earnings", ["C", "F"]),
+    ("NVDA and BRK.B led the S&P higher", ["NVDA", "BRK.B"]),
+    ("The CAT is out of the bag", []),
+    ("Caterpillar (NYSE: CAT) and Deere (DE) fell", ["CAT", "DE"]),
+    ("Ford raised its outlook", ["F"]),
+    ("General Electric and General Motors rallied", ["GE", "GM"]),
+]
+
+REGRESSION_UNIVERSE = [
+    ("C", "Citigroup Inc."),
+    ("F", "Ford Motor Company"),
+    ("NVDA", "NVIDIA Corporation"),
+    ("BRK.B", "Berkshire Hathaway Inc. Class B"),
+    ("CAT", "Caterpillar Inc."),
+    ("DE", "Deere & Company"),
+    ("GE", "General Electric Company"),
+    ("GM", "General Motors Company"),
+]
+
+
+def check_regressions():
+    extractor = SymbolExtractor(REGRESSION_UNIVERSE, aliases={})
+    for text, expected in REGRESSION_CASES:
+        found = extractor.extract(text)
+        assert found == expected, f"{text!r}: expected {expected}, got {found}"
+    print(f"regressions: {len(REGRESSION_CASES)} cases ok")
+
+
+def synthetic_universe(size: int) -> list:
+    rng = random.Random(7)
+    universe = []
+    for i in range(size):
+        symbol = "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(4)) + str(i % 10)
+        name = " ".join(rng.sample(WORDS, 2)).title() + f" {i} Inc."
+        universe.append((symbol, name))
+    return universe
+
+
+def make_articles(universe: list, count: int) -> list:
+    rng = random.Random(11)
+    articles = []
+    for _ in range(count):
+        symbol, name = rng.choice(universe)
+        articles.append(
+            f"Shares of {normalize_name(name).title()} jumped after the company raised guidance, "
+            f"while ${symbol} options saw heavy volume. Apple and Microsoft were little changed "
+            f"as investors weighed the outlook for interest rates and consumer spending."
+        )
+    return articles
+
+
+def substring_scan(names: dict, text: str) -> list:
+    text_lower = text.lower()
+    return list({symbol for keyword, symbol in names.items() if keyword in text_lower})
+
+
+def main(size: int, count: int):
+    check_regressions()
+    
+    if os.path.exists(settings.SYMBOL_UNIVERSE_PATH):
+        universe = [(listing['symbol'], listing['name']) for listing in load_listings(settings.SYMBOL_UNIVERSE_PATH)]
+    else:
+        universe = synthetic_universe(size)
+    
+    start = time.perf_counter()
+    extractor = SymbolExtractor(universe)
+    print(f"build: {(time.perf_counter() - start) * 1000:.0f} ms  {extractor.stats}")
+    
+    articles = make_articles(universe, count)
+    
+    start = time.perf_counter()
+    for text in articles:
+        extractor.extract(text)
+    elapsed = time.perf_counter() - start
+    print(f"automaton:      {elapsed / count * 1e6:8.1f} us/article")
+    
+    names = {normalize_name(name): symbol for symbol, name in universe}
+    sample = articles[:max(count // 20, 1)]
+    start = time.perf_counter()
+    for text in sample:
+        substring_scan(names, text)
+    elapsed = time.perf_counter() - start
+    print(f"substring scan: {elapsed / len(sample) * 1e6:8.1f} us/article")
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 30000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    )
\ No newline at end of file
@@ -0,0 +1,82 @@
+"""
+Load test for authenticated endpoints against a running API server
+
+Every request passes through get_current_user, so this measures the cost of
+token validation plus the database session/pool under concurrency.
+
+Usage:
+    python -m benchmarks.load_auth --base-url http://localhost:8000 \
+        --email user@example.com --password secret \
+        --path /api/v1/auth/me --concurrency 50 --requests 2000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+async def login(client: httpx.AsyncClient, email: str, password: str) -> str:
+    """Obtain a bearer token via the JSON login endpoint"""
+    response = await client.post(
+        "/api/v1/auth/login-json",
+        json={"email": email, "password": password}
+    )
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def run(args: argparse.Namespace):
+    async with httpx.AsyncClient(
+        base_url=args.base_url,
+        limits=httpx.Limits(max_connections=args.concurrency),
+        timeout=30.0
+    ) as client:
+        token = await login(client, args.email, args.password)
+        headers = {"Authorization": f"Bearer {token}"}
+        latencies = []
+        errors = 0
+        remaining = args.requests
+        
+        async def worker():
+            nonlocal remaining, errors
+            while remaining > 0:
+                remaining -= 1
+                start = time.perf_counter()
+                response = await client.get(args.path, headers=headers)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    errors += 1
+        
+        started = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(args.concurrency)])
+        elapsed = time.perf_counter() - started
+        
+        pool = (await client.get("/metrics")).json().get("database", {})
+    
+    latencies.sort()
+    
+    def percentile(p: float) -> float:
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+    
+    print(f"path={args.path} concurrency={args.concurrency} requests={len(latencies)} errors={errors}")
+    print(f"throughput: {len(latencies) / elapsed:8.1f} req/s")
+    print(f"latency ms: mean={statistics.mean(latencies) * 1000:.1f} "
+          f"p50={percentile(0.50):.1f} p95={percentile(0.95):.1f} p99={percentile(0.99):.1f}")
+    print(f"pool: {pool}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--path", default="/api/v1/auth/me")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()